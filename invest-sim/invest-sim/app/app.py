@@ -2,12 +2,35 @@ import streamlit as st  # pyright: ignore[reportMissingImports]
 import pandas as pd  # pyright: ignore[reportMissingImports]
 import numpy as np  # pyright: ignore[reportMissingImports]
 import plotly.graph_objects as go  # pyright: ignore[reportMissingImports]
+import importlib.util
+import io
+import math
+import time
+import traceback
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from functools import lru_cache
 from statistics import NormalDist
 from typing import Optional
 
+try:
+    from scipy import stats as scipy_stats  # pyright: ignore[reportMissingImports]
+    from scipy.stats import gaussian_kde  # pyright: ignore[reportMissingImports]
+except ImportError:
+    scipy_stats = None
+    gaussian_kde = None
+
+try:
+    import xlsxwriter  # pyright: ignore[reportMissingImports]
+except ImportError:
+    xlsxwriter = None
+
 # 引入后端桥接 (保持原有引用)
 from bridge import InvestSimBridge
+import help_texts
 from invest_sim.backend.input_modeling.fitting import fit_normal
 from invest_sim.option_simulator import (
     OptionLeg,
@@ -42,6 +65,232 @@ COLORS = {
     "grid": "#21262D"
 }
 
+# 会话内列表容量上限（超出时按先进先出淘汰最早的记录）
+MAX_HISTORY = 200
+MAX_COMPARISON = 50
+
+# 回测历史行结构：定长结构化数组作环形缓冲，每行只存展示用的数值指标
+HIST_DTYPE = np.dtype([
+    ("ts", "datetime64[s]"),
+    ("strategy", "U32"),
+    ("total_return", "f4"),
+    ("sharpe", "f4"),
+    ("max_drawdown", "f4"),
+    ("volatility", "f4"),
+])
+
+# 策略一句话说明（侧边栏策略选择处）
+STRATEGY_DESCRIPTIONS = {
+    "Fixed Weights": "保持固定权重分配，定期再平衡",
+    "Target Risk": "根据目标波动率动态调整权重",
+    "Adaptive Rebalance": "仅在权重偏离阈值时再平衡",
+    "Equal Weight": "所有资产等权重分配（1/N策略）",
+    "Risk Parity": "风险平价，各资产风险贡献相等",
+    "Minimum Variance": "最小方差组合，优化波动率",
+    "Momentum": "动量策略，增持表现好的资产",
+    "Mean Reversion": "均值回归，反向调整偏离资产",
+}
+
+# 策略快速说明（回测页「当前策略说明」展开区）
+STRATEGY_QUICK_GUIDE = {
+    "Fixed Weights": "始终保持预设权重，定期再平衡。适合长期投资者，简单可预测。",
+    "Target Risk": "动态调整权重以保持目标波动率。适合风险敏感型投资者。",
+    "Adaptive Rebalance": "仅在权重偏离阈值时再平衡。适合希望降低交易成本的投资者。",
+    "Equal Weight": "所有资产等权重分配（1/N策略）。适合不确定如何分配权重的投资者。",
+    "Risk Parity": "根据波动率分配权重，使风险贡献相等。适合追求风险均衡的投资者。",
+    "Minimum Variance": "优化协方差矩阵，最小化波动率。适合风险厌恶型投资者。",
+    "Momentum": "增持表现好的资产，减持表现差的资产。适合相信趋势延续的投资者。",
+    "Mean Reversion": "当资产偏离目标时反向调整。适合相信均值回归的投资者。",
+}
+
+# 设置面板"策略详细说明"展开区的各策略正文
+STRATEGY_DETAILS = {
+    "Fixed Weights": """
+### 📌 固定权重策略
+
+**工作原理：**
+- 始终保持预设的目标权重分配
+- 定期再平衡，无论市场如何变化
+- 例如：60%股票 + 30%债券 + 10%现金，始终保持这个比例
+
+**适用场景：**
+- ✅ 长期投资者，相信资产配置的重要性
+- ✅ 希望策略简单可预测
+- ✅ 不追求市场择时
+
+**优点：**
+- 简单易懂，执行方便
+- 可预测性强
+- 交易成本相对较低
+
+**缺点：**
+- 不随市场变化调整
+- 可能错过市场机会
+- 风险控制能力有限
+""",
+    "Target Risk": """
+### 🎯 目标风险策略
+
+**工作原理：**
+- 根据市场波动动态调整资产权重
+- 保持组合整体风险（波动率）在目标水平
+- 市场波动大时降低风险资产，波动小时增加风险资产
+
+**适用场景：**
+- ✅ 风险敏感型投资者
+- ✅ 希望风险水平可控
+- ✅ 需要自动风险调整
+
+**优点：**
+- 风险可控，波动率稳定
+- 自动适应市场变化
+- 适合风险厌恶者
+
+**缺点：**
+- 可能降低收益潜力
+- 需要频繁调整
+- 参数设置影响大
+""",
+    "Adaptive Rebalance": """
+### 🔄 自适应再平衡策略
+
+**工作原理：**
+- 只在权重偏离目标超过阈值时才再平衡
+- 允许权重在一定范围内自然波动
+- 减少不必要的交易和成本
+
+**适用场景：**
+- ✅ 希望降低交易成本的投资者
+- ✅ 允许权重适度偏离
+- ✅ 长期持有策略
+
+**优点：**
+- 交易成本低
+- 允许权重自然波动（可能带来收益）
+- 减少过度交易
+
+**缺点：**
+- 权重可能长期偏离目标
+- 风险控制不如固定权重严格
+- 需要设置合适的阈值
+""",
+    "Equal Weight": """
+### ⚖️ 等权重策略（1/N策略）
+
+**工作原理：**
+- 所有资产分配相同权重（1/N，N为资产数量）
+- 例如：3个资产各占33.33%
+- 定期再平衡保持等权重
+
+**适用场景：**
+- ✅ 不确定如何分配权重的投资者
+- ✅ 追求简单有效的分散化
+- ✅ 不想做复杂的权重优化
+
+**优点：**
+- 极其简单，无需预测
+- 分散化效果好
+- 学术研究显示表现不错
+
+**缺点：**
+- 忽略资产特性差异
+- 可能不是最优配置
+- 对资产数量敏感
+""",
+    "Risk Parity": """
+### ⚡ 风险平价策略
+
+**工作原理：**
+- 根据资产波动率分配权重
+- 波动率低的资产权重更高，波动率高的权重更低
+- 使各资产的风险贡献相等
+
+**适用场景：**
+- ✅ 追求风险均衡的投资者
+- ✅ 希望真正分散风险
+- ✅ 不只看收益，更看风险
+
+**优点：**
+- 风险分散效果好
+- 波动率低的资产权重更高（如债券）
+- 风险贡献均衡
+
+**缺点：**
+- 可能降低收益潜力
+- 需要准确估计波动率
+- 计算相对复杂
+""",
+    "Minimum Variance": """
+### 📉 最小方差策略
+
+**工作原理：**
+- 基于资产间的协方差矩阵优化
+- 最小化组合整体波动率
+- 使用数学优化方法求解最优权重
+
+**适用场景：**
+- ✅ 风险厌恶型投资者
+- ✅ 追求最低波动率
+- ✅ 愿意牺牲部分收益换取稳定
+
+**优点：**
+- 波动率最低，风险最小
+- 基于数学优化，理论最优
+- 考虑资产相关性
+
+**缺点：**
+- 收益可能较低
+- 需要准确的协方差矩阵
+- 对数据质量要求高
+""",
+    "Momentum": """
+### 🚀 动量策略
+
+**工作原理：**
+- 增持近期表现好的资产（上涨趋势）
+- 减持近期表现差的资产（下跌趋势）
+- 相信"趋势会延续"的假设
+
+**适用场景：**
+- ✅ 相信趋势延续的投资者
+- ✅ 愿意跟随市场趋势
+- ✅ 追求超额收益
+
+**优点：**
+- 可能捕捉到趋势，获得超额收益
+- 顺应市场力量
+- 在趋势市场中表现好
+
+**缺点：**
+- 在震荡市场中可能表现差
+- 可能追涨杀跌
+- 需要设置合适的回看期
+""",
+    "Mean Reversion": """
+### 🔁 均值回归策略
+
+**工作原理：**
+- 当资产偏离目标权重时反向调整
+- 相信价格会回归均值
+- 低买高卖，反向操作
+
+**适用场景：**
+- ✅ 相信均值回归的投资者
+- ✅ 愿意逆势操作
+- ✅ 追求低买高卖
+
+**优点：**
+- 可能降低波动
+- 低买高卖，成本优势
+- 在震荡市场表现好
+
+**缺点：**
+- 在趋势市场中可能表现差
+- 需要设置合适的回归速度
+- 可能过早买入/卖出
+""",
+}
+
 # Session State 初始化
 if "bootstrap_returns" not in st.session_state:
     st.session_state["bootstrap_returns"] = None
@@ -59,10 +308,14 @@ if "show_settings_dialog" not in st.session_state:
     st.session_state["show_settings_dialog"] = False
 if "show_input_modeling_dialog" not in st.session_state:
     st.session_state["show_input_modeling_dialog"] = False
+# 历史记录为预分配的环形缓冲（写入计数取模定位），对比列表为定长deque，长会话内存有上界
 if "backtest_history" not in st.session_state:
-    st.session_state["backtest_history"] = []
+    st.session_state["backtest_history"] = np.zeros(MAX_HISTORY, dtype=HIST_DTYPE)
+    st.session_state["backtest_history_count"] = 0
 if "strategy_comparison" not in st.session_state:
-    st.session_state["strategy_comparison"] = []
+    st.session_state["strategy_comparison"] = deque(maxlen=MAX_COMPARISON)
+if "_cmp_version" not in st.session_state:
+    st.session_state["_cmp_version"] = 0  # 对比列表每次增/删/清空时递增
 if "transaction_cost_rate" not in st.session_state:
     st.session_state["transaction_cost_rate"] = 0.001  # 默认0.1%交易成本
 if "slippage_rate" not in st.session_state:
@@ -207,6 +460,66 @@ st.markdown(f"""
     </style>
 """, unsafe_allow_html=True)
 
+# ==========================================
+# 行情数据加载与回测（缓存）
+# ==========================================
+
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=4)
+def load_market_data_cached(file_bytes: Optional[bytes]) -> pd.DataFrame:
+    """按文件内容缓存行情数据，避免每次点击都重新解析CSV；未上传文件时示例数据同样缓存，各处使用同一份数据"""
+    return InvestSimBridge.load_market_data(io.BytesIO(file_bytes) if file_bytes is not None else None)
+
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=4)
+def market_returns_cached(file_bytes: Optional[bytes]) -> pd.DataFrame:
+    """按文件内容缓存的各资产日收益率（结果页相关性分析等使用），切换标签页/拖动滑块时不再重算"""
+    return load_market_data_cached(file_bytes).pct_change(fill_method=None).dropna()
+
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=4)
+def pooled_returns_cached(file_bytes: Optional[bytes]) -> np.ndarray:
+    """按文件内容缓存的混合收益率样本：各资产日收益率展平为一维并去掉NaN（预测页的分布预览与Bootstrap共用）"""
+    flat = market_returns_cached(file_bytes).to_numpy(dtype=np.float64).ravel()
+    return flat[~np.isnan(flat)]
+
+def as_return_samples(values) -> np.ndarray:
+    """Bootstrap 收益率样本的统一存储形式：连续的一维 float32 数组（每样本4字节，抽样时直接按下标取值）"""
+    return np.ascontiguousarray(np.asarray(values, dtype=np.float32).ravel())
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def returns_histogram(returns: np.ndarray, bins: int = 50) -> tuple:
+    """收益率样本的服务端等宽分箱 (counts, edges)，按样本内容缓存；同一份样本在多个预览图间只分箱一次"""
+    return np.histogram(returns, bins=bins)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def returns_moments(returns: np.ndarray) -> dict:
+    """收益率样本的 mean / std（总体）/ skew / kurt（与 pandas 相同的样本偏度、超额峰度），按样本内容缓存，
+    正态与 Bootstrap 预览、输入建模共用
+
+    先去均值得到离差，二、三、四阶矩都在这一份离差上算出，不再分别调用 np.mean / np.std / Series.skew / Series.kurt 各遍历一次。
+    """
+    x = np.asarray(returns, dtype=np.float64)
+    n = x.size
+    mean = float(x.mean())
+    dev = x - mean
+    sq = dev * dev
+    m2 = float(sq.mean())
+    skew = float("nan")
+    if n >= 3:
+        m3 = float(np.dot(sq, dev)) / n
+        # 与 pandas 一致：方差小于 1e-14 视为常数序列，偏度记 0
+        skew = 0.0 if m2 < 1e-14 else float(m3 / m2 ** 1.5 * np.sqrt(n * (n - 1)) / (n - 2))
+    kurt = float("nan")
+    if n >= 4:
+        m4 = float(np.dot(sq, sq)) / n
+        kurt = 0.0 if m2 < 1e-14 else float(
+            (n + 1) * (n - 1) * m4 / ((n - 2) * (n - 3) * m2 * m2) - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+        )
+    return {"n": n, "mean": mean, "std": float(np.sqrt(m2)), "skew": skew, "kurt": kurt}
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def run_backtest_cached(params: dict, market_data: pd.DataFrame):
+    """按 (参数, 行情数据) 缓存的单次回测，同时返回界面摘要和完整结果（含权重历史）"""
+    return InvestSimBridge.run_backtest_with_result(params, market_data)
+
 # ==========================================
 # 2. 高级绘图函数 (Plotly Refined)
 # ==========================================
@@ -217,18 +530,19 @@ st.markdown(f"""
 
 def calculate_sortino_ratio(returns: pd.Series, risk_free_rate: float = 0.0, periods_per_year: int = 252) -> float:
     """计算 Sortino 比率（只考虑下行波动率）"""
-    excess_returns = returns - risk_free_rate / periods_per_year
+    rets = np.asarray(returns, dtype=np.float64)
+    excess_returns = rets - risk_free_rate / periods_per_year
     downside_returns = excess_returns[excess_returns < 0]
     
-    if len(downside_returns) == 0:
+    if downside_returns.size < 2:
         return 0.0
     
-    downside_std = downside_returns.std() * np.sqrt(periods_per_year)
+    downside_std = downside_returns.std(ddof=1) * math.sqrt(periods_per_year)
     if downside_std == 0:
         return 0.0
     
-    annualized_return = returns.mean() * periods_per_year
-    return (annualized_return - risk_free_rate) / downside_std
+    annualized_return = rets.mean() * periods_per_year
+    return float((annualized_return - risk_free_rate) / downside_std)
 
 def calculate_calmar_ratio(annualized_return: float, max_drawdown: float) -> float:
     """计算 Calmar 比率（年化收益 / 最大回撤）"""
@@ -238,20 +552,694 @@ def calculate_calmar_ratio(annualized_return: float, max_drawdown: float) -> flo
 
 def calculate_max_drawdown_duration(portfolio_values: pd.Series) -> int:
     """计算最大回撤持续时间（天数）"""
-    cumulative_peaks = portfolio_values.expanding().max()
-    drawdowns = (portfolio_values - cumulative_peaks) / cumulative_peaks
-    
-    max_dd = drawdowns.min()
-    max_dd_date = drawdowns.idxmin()
+    values = np.asarray(portfolio_values, dtype=np.float64)
+    cumulative_peaks = np.maximum.accumulate(values)
+    drawdowns = (values - cumulative_peaks) / cumulative_peaks
     
-    # 找到回撤开始日期（峰值日期）
-    peak_date = portfolio_values[:max_dd_date].idxmax()
+    # 最大回撤谷底位置，及其之前的峰值位置（回撤开始日期）
+    trough_pos = int(np.argmin(drawdowns))
+    peak_pos = int(np.argmax(values[:trough_pos + 1]))
     
     # 计算持续时间
-    duration = (max_dd_date - peak_date).days
+    index = portfolio_values.index
+    duration = (index[trough_pos] - index[peak_pos]).days
     return max(0, duration)
 
+@st.cache_data(show_spinner=False, max_entries=32)
+def rolling_metrics(returns: np.ndarray, window: int) -> tuple:
+    """滚动年化 Sharpe / 波动率 / 收益，返回 (sharpe, vol, ret) 三个ndarray
+
+    已去掉前 window-1 个窗口不足的位置；按收益率数组内容与窗口缓存，无关控件触发的重跑直接命中。
+    """
+    x = np.ascontiguousarray(returns, dtype=np.float64)
+    # 前缀和一次扫描得到所有窗口的和与平方和（O(N)）；先减去全局均值，避免平方和相减时的精度损失
+    center = x.mean()
+    z = x - center
+    csum = np.concatenate(([0.0], np.cumsum(z)))
+    csum2 = np.concatenate(([0.0], np.cumsum(z * z)))
+    win_sum = csum[window:] - csum[:-window]
+    win_sum2 = csum2[window:] - csum2[:-window]
+    mean = win_sum / window + center
+    var = np.maximum(win_sum2 - win_sum * win_sum / window, 0.0) / (window - 1)
+    ann_ret = mean * 252
+    ann_vol = np.sqrt(var * 252)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = ann_ret / ann_vol
+    return sharpe, ann_vol, ann_ret
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def var_cvar(returns: np.ndarray, pct: float = 5) -> tuple:
+    """历史模拟法 VaR / CVaR（默认95%置信度），返回 (var, cvar)
+
+    一次 np.partition 取出分位点两侧的次序统计量：VaR 按线性插值与 np.percentile 一致，
+    CVaR 为不高于 VaR 的全部收益的均值（最小的 lo+1 个，加上分位点之后与 VaR 相等的并列值），无需整表排序。
+    """
+    arr = np.asarray(returns, dtype=np.float64)
+    pos = pct / 100 * (arr.size - 1)
+    lo = int(pos)
+    hi = min(lo + 1, arr.size - 1)
+    part = np.partition(arr, (lo, hi))
+    var = part[lo] + (pos - lo) * (part[hi] - part[lo])
+    ties = part[lo + 1:][part[lo + 1:] <= var]
+    return float(var), float((part[:lo + 1].sum() + ties.sum()) / (lo + 1 + ties.size))
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def correlation_matrix(returns: np.ndarray, columns: tuple) -> pd.DataFrame:
+    """资产收益相关系数矩阵（returns 为 N×K）
+
+    由 XᵀX 与均值外积一次得到协方差，不生成去均值后的整表副本；按数组内容缓存。
+    含缺失值时退回 DataFrame.corr（按列对逐对剔除缺失行）；常数列的相关系数为 NaN，与 pandas 一致。
+    """
+    if not np.isfinite(returns).all():
+        return pd.DataFrame(returns, columns=list(columns)).corr()
+    n = returns.shape[0]
+    mu = returns.mean(axis=0)
+    cov = (returns.T @ returns) / (n - 1) - (n / (n - 1)) * np.outer(mu, mu)
+    # 常数列的方差由 XᵀX 相减得到的是舍入残差而非0，按极差直接识别
+    constant = np.ptp(returns, axis=0) == 0
+    std = np.sqrt(np.where(constant, 1.0, np.diag(cov)))
+    corr = np.clip(cov / np.outer(std, std), -1.0, 1.0)
+    corr[:, constant] = np.nan
+    corr[constant, :] = np.nan
+    return pd.DataFrame(corr, index=list(columns), columns=list(columns))
+
+# ==========================================
+# 分布拟合辅助函数
+# ==========================================
+
+# 样本量超过阈值时，分布参数拟合与KS/AD诊断改用固定种子子样本
+FIT_SUBSAMPLE_THRESHOLD = 20000
+FIT_SUBSAMPLE_SIZE = 10000
+
+def ks_test_sorted(cdf_vals: np.ndarray, ecdf_lo: np.ndarray, ecdf_hi: np.ndarray):
+    """基于已排序样本的CDF值及预先算好的经验分布阶梯计算双侧KS检验（统计量, p值），避免kstest内部重复排序和逐点回调"""
+    n = len(cdf_vals)
+    ks_stat = float(max(np.max(ecdf_hi - cdf_vals), np.max(cdf_vals - ecdf_lo)))
+    ks_pvalue = float(np.clip(scipy_stats.kstwo.sf(ks_stat, n), 0.0, 1.0))
+    return ks_stat, ks_pvalue
+
+def anderson_darling_sorted(cdf_vals: np.ndarray, log_cdf_vals: Optional[np.ndarray] = None, log_sf_vals: Optional[np.ndarray] = None) -> float:
+    """基于已排序样本的CDF值计算Anderson-Darling统计量A²（向量化闭式）
+
+    尾部项用log1p(-F)而非log(1-F)；若分布提供logcdf/logsf，可直接传入，避免F≈1时1-F下溢为0。
+    """
+    n = len(cdf_vals)
+    if log_cdf_vals is None:
+        log_cdf_vals = np.log(np.clip(cdf_vals, 1e-300, None))
+    if log_sf_vals is None:
+        log_sf_vals = np.log1p(-np.clip(cdf_vals, None, 1 - 1e-15))
+    weights = 2 * np.arange(1, n + 1) - 1
+    return float(-n - np.sum(weights * (log_cdf_vals + log_sf_vals[::-1])) / n)
+
+def kde_log_likelihood(data: np.ndarray) -> float:
+    """高斯核密度估计下样本自身的对数似然（Scott带宽）
+
+    用公开接口 gaussian_kde.evaluate（Cython 核逐点累加，不构造 N×N 距离矩阵）。每个样本点都落在
+    自身的核上，密度不会下溢，直接取对数即可，比 logpdf 的对数域累加快数倍。
+    """
+    points = np.asarray(data, dtype=np.float64)
+    return float(np.sum(np.log(gaussian_kde(points).evaluate(points))))
+
+# 闭式对数似然（纯numpy向量化），用于Normal/Student-t/Laplace/Cauchy，绕开scipy逐次分发开销
+def normal_log_likelihood(data: np.ndarray, mean: float, vol: float) -> float:
+    z = (data - mean) / vol
+    return float(-len(data) * (0.5 * np.log(2 * np.pi) + np.log(vol)) - 0.5 * np.dot(z, z))
+
+def student_t_log_likelihood(data: np.ndarray, df: float, loc: float, scale: float) -> float:
+    z = (data - loc) / scale
+    log_norm_const = math.lgamma((df + 1) / 2) - math.lgamma(df / 2) - 0.5 * np.log(df * np.pi) - np.log(scale)
+    return float(len(data) * log_norm_const - (df + 1) / 2 * np.sum(np.log1p(z * z / df)))
+
+def laplace_log_likelihood(data: np.ndarray, loc: float, scale: float) -> float:
+    return float(-len(data) * np.log(2 * scale) - np.sum(np.abs(data - loc)) / scale)
+
+def cauchy_log_likelihood(data: np.ndarray, loc: float, scale: float) -> float:
+    z = (data - loc) / scale
+    return float(-len(data) * np.log(np.pi * scale) - np.sum(np.log1p(z * z)))
+
+def fit_student_t(data: np.ndarray, mean: float, std: float) -> tuple:
+    """Student-t MLE拟合，返回 (df, loc, scale)
+
+    矩估计热启动：由超额峰度 6/(df-4) 反推自由度，再按 Var = scale²·df/(df-2) 换算尺度，
+    优化器从接近最优的位置出发，迭代次数明显减少。
+    """
+    excess_kurt = float(scipy_stats.kurtosis(data))
+    df0 = 4 + 6 / excess_kurt if excess_kurt > 0 else 30.0
+    scale0 = std * math.sqrt((df0 - 2) / df0)
+    return scipy_stats.t.fit(data, df0, loc=mean, scale=scale0)
+
+# 各拟合分布在原始收益率尺度上的概率密度函数（x为收益率网格，p为拟合参数字典）
+PDF_FNS = {
+    "Normal": lambda x, p: np.exp(-0.5 * ((x - p["mean"]) / p["vol"]) ** 2) / (p["vol"] * np.sqrt(2 * np.pi)),
+    "Student-t": lambda x, p: scipy_stats.t.pdf(x, p["df"], loc=p["mean"], scale=p["scale"]),
+    "Lognormal": lambda x, p: scipy_stats.lognorm.pdf(x + p.get("shift", 1.0), p["s"], loc=p["loc"], scale=p["scale"]),
+    "Gamma": lambda x, p: scipy_stats.gamma.pdf(x + p.get("shift", 1.0), p["a"], loc=p["loc"], scale=p["scale"]),
+    # Beta在[0,1]归一化尺度上拟合，需转换回原始尺度
+    "Beta": lambda x, p: scipy_stats.beta.pdf((x - p["min"]) / (p["max"] - p["min"]), p["a"], p["b"], loc=p["loc"], scale=p["scale"]) / (p["max"] - p["min"]),
+    "Weibull": lambda x, p: scipy_stats.weibull_min.pdf(x + p.get("shift", 1.0), p["c"], loc=p["loc"], scale=p["scale"]),
+    "Gumbel": lambda x, p: scipy_stats.gumbel_l.pdf(x, loc=p["loc"], scale=p["scale"]),
+    "Laplace": lambda x, p: scipy_stats.laplace.pdf(x, loc=p["loc"], scale=p["scale"]),
+    "Cauchy": lambda x, p: scipy_stats.cauchy.pdf(x, loc=p["loc"], scale=p["scale"]),
+}
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def fit_all_distributions(available_returns: np.ndarray):
+    """拟合全部候选分布并计算拟合优度与综合评分，返回 (fit_results, metrics_df, best_dist, pdf_x, pdfs)
+
+    纯计算函数（不调用任何st.*渲染），按收益率数组内容缓存，选择框切换等无关重跑直接命中缓存。
+    """
+    # 回测结果的 bootstrap_returns 为 float32，拟合与诊断统一在 float64 上进行
+    available_returns = np.asarray(available_returns, dtype=np.float64)
+    mean_ret = np.mean(available_returns)
+    std_ret = np.std(available_returns)
+    scipy_available = scipy_stats is not None
+    
+    # 存储所有分布的拟合结果
+    fit_results = {}
+    
+    # 大样本时.fit优化器与KS/AD诊断使用固定种子子样本；对数似然/AIC/BIC仍基于全量数据
+    fit_data = available_returns
+    if len(available_returns) > FIT_SUBSAMPLE_THRESHOLD:
+        fit_data = np.random.default_rng(0).choice(available_returns, FIT_SUBSAMPLE_SIZE, replace=False)
+    
+    # 样本只排序一次，经验分布函数的上下阶梯也只算一次，供各分布的KS检验共用
+    sorted_returns = np.sort(fit_data)
+    n_obs = len(sorted_returns)
+    rank_arr = np.arange(1, n_obs + 1)
+    ecdf_lo = (rank_arr - 1) / n_obs
+    ecdf_hi = rank_arr / n_obs
+    
+    # 全量样本极值只求一次：未抽样时直接取排序数组首尾元素
+    if fit_data is available_returns:
+        data_min, data_max = float(sorted_returns[0]), float(sorted_returns[-1])
+    else:
+        data_min, data_max = float(np.min(available_returns)), float(np.max(available_returns))
+    
+    # 1. Normal分布
+    try:
+        # 正态分布MLE为闭式解：样本均值与总体标准差（ddof=0），无需数值优化
+        normal_mean = mean_ret
+        normal_vol = std_ret
+        normal_params = {"mean": normal_mean, "vol": normal_vol}
+        
+        # 计算拟合优度指标
+        if scipy_available:
+            cdf_vals = scipy_stats.norm.cdf(sorted_returns, normal_mean, normal_vol)
+            ks_stat, ks_pvalue = ks_test_sorted(cdf_vals, ecdf_lo, ecdf_hi)
+            log_likelihood = normal_log_likelihood(available_returns, normal_mean, normal_vol)
+            n_params = 2
+            aic = 2 * n_params - 2 * log_likelihood
+            bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
+            # 正态尾部很薄，极端样本处F≈1，直接用logcdf/logsf保证精度
+            ad_stat = anderson_darling_sorted(
+                cdf_vals,
+                scipy_stats.norm.logcdf(sorted_returns, normal_mean, normal_vol),
+                scipy_stats.norm.logsf(sorted_returns, normal_mean, normal_vol),
+            )
+        else:
+            ks_stat, ks_pvalue, log_likelihood, aic, bic, ad_stat = None, None, None, None, None, None
+        
+        fit_results["Normal"] = {
+            "params": normal_params,
+            "ks_stat": ks_stat,
+            "ks_pvalue": ks_pvalue,
+            "log_likelihood": log_likelihood,
+            "aic": aic,
+            "bic": bic,
+            "ad_stat": ad_stat,
+            "success": True
+        }
+    except Exception as e:
+        fit_results["Normal"] = {"success": False, "error": str(e)}
+    
+    # 2. Student-t分布
+    try:
+        if scipy_available:
+            df_fitted, loc_fitted, scale_fitted = fit_student_t(fit_data, mean_ret, std_ret)
+            t_params = {"df": float(df_fitted), "mean": float(loc_fitted), "scale": float(scale_fitted)}
+            
+            cdf_vals = scipy_stats.t.cdf(sorted_returns, df_fitted, loc=loc_fitted, scale=scale_fitted)
+            ks_stat, ks_pvalue = ks_test_sorted(cdf_vals, ecdf_lo, ecdf_hi)
+            log_likelihood = student_t_log_likelihood(available_returns, df_fitted, loc_fitted, scale_fitted)
+            n_params = 3
+            aic = 2 * n_params - 2 * log_likelihood
+            bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
+            ad_stat = anderson_darling_sorted(cdf_vals)
+            
+            fit_results["Student-t"] = {
+                "params": t_params,
+                "ks_stat": ks_stat,
+                "ks_pvalue": ks_pvalue,
+                "log_likelihood": log_likelihood,
+                "aic": aic,
+                "bic": bic,
+                "ad_stat": ad_stat,
+                "success": True
+            }
+        else:
+            fit_results["Student-t"] = {"success": False, "error": "scipy不可用"}
+    except Exception as e:
+        fit_results["Student-t"] = {"success": False, "error": str(e)}
+    
+    # 3. Lognormal分布（需要数据为正）
+    try:
+        if scipy_available and np.all(available_returns > -1):  # 收益率需要 > -100%
+            shifted_returns = available_returns + 1  # 平移使数据为正
+            s_fitted, loc_fitted, scale_fitted = scipy_stats.lognorm.fit(fit_data + 1)
+            lognormal_params = {"s": float(s_fitted), "loc": float(loc_fitted), "scale": float(scale_fitted), "shift": 1.0}
+            
+            cdf_vals = scipy_stats.lognorm.cdf(sorted_returns + 1, s_fitted, loc=loc_fitted, scale=scale_fitted)
+            ks_stat, ks_pvalue = ks_test_sorted(cdf_vals, ecdf_lo, ecdf_hi)
+            log_likelihood = np.sum(scipy_stats.lognorm.logpdf(shifted_returns, s_fitted, loc=loc_fitted, scale=scale_fitted))
+            n_params = 3
+            aic = 2 * n_params - 2 * log_likelihood
+            bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
+            ad_stat = anderson_darling_sorted(cdf_vals)
+            
+            fit_results["Lognormal"] = {
+                "params": lognormal_params,
+                "ks_stat": ks_stat,
+                "ks_pvalue": ks_pvalue,
+                "log_likelihood": log_likelihood,
+                "aic": aic,
+                "bic": bic,
+                "ad_stat": ad_stat,
+                "success": True
+            }
+        else:
+            fit_results["Lognormal"] = {"success": False, "error": "数据不满足lognormal要求或scipy不可用"}
+    except Exception as e:
+        fit_results["Lognormal"] = {"success": False, "error": str(e)}
+    
+    # 4. Gamma分布（需要数据为正）
+    try:
+        if scipy_available and np.all(available_returns > -1):
+            shifted_returns = available_returns + 1
+            # 矩估计热启动（loc=0）：形状 a0=(均值/标准差)²，尺度 = 方差/均值
+            shifted_mean, shifted_std = 1 + mean_ret, std_ret
+            a_fitted, loc_fitted, scale_fitted = scipy_stats.gamma.fit(
+                fit_data + 1, (shifted_mean / shifted_std) ** 2, loc=0, scale=shifted_std ** 2 / shifted_mean
+            )
+            gamma_params = {"a": float(a_fitted), "loc": float(loc_fitted), "scale": float(scale_fitted), "shift": 1.0}
+            
+            cdf_vals = scipy_stats.gamma.cdf(sorted_returns + 1, a_fitted, loc=loc_fitted, scale=scale_fitted)
+            ks_stat, ks_pvalue = ks_test_sorted(cdf_vals, ecdf_lo, ecdf_hi)
+            log_likelihood = np.sum(scipy_stats.gamma.logpdf(shifted_returns, a_fitted, loc=loc_fitted, scale=scale_fitted))
+            n_params = 3
+            aic = 2 * n_params - 2 * log_likelihood
+            bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
+            ad_stat = anderson_darling_sorted(cdf_vals)
+            
+            fit_results["Gamma"] = {
+                "params": gamma_params,
+                "ks_stat": ks_stat,
+                "ks_pvalue": ks_pvalue,
+                "log_likelihood": log_likelihood,
+                "aic": aic,
+                "bic": bic,
+                "ad_stat": ad_stat,
+                "success": True
+            }
+        else:
+            fit_results["Gamma"] = {"success": False, "error": "数据不满足gamma要求或scipy不可用"}
+    except Exception as e:
+        fit_results["Gamma"] = {"success": False, "error": str(e)}
+    
+    # 5. Beta分布（需要数据在[0,1]范围内）
+    try:
+        if scipy_available:
+            # 将数据标准化到[0,1]
+            min_val, max_val = data_min, data_max
+            if max_val > min_val:
+                normalized = (available_returns - min_val) / (max_val - min_val)
+                a_fitted, b_fitted, loc_fitted, scale_fitted = scipy_stats.beta.fit((fit_data - min_val) / (max_val - min_val))
+                beta_params = {"a": float(a_fitted), "b": float(b_fitted), "loc": float(loc_fitted), "scale": float(scale_fitted), "min": float(min_val), "max": float(max_val)}
+                
+                cdf_vals = scipy_stats.beta.cdf((sorted_returns - min_val) / (max_val - min_val), a_fitted, b_fitted, loc=loc_fitted, scale=scale_fitted)
+                ks_stat, ks_pvalue = ks_test_sorted(cdf_vals, ecdf_lo, ecdf_hi)
+                log_likelihood = np.sum(scipy_stats.beta.logpdf(normalized, a_fitted, b_fitted, loc=loc_fitted, scale=scale_fitted))
+                n_params = 4
+                aic = 2 * n_params - 2 * log_likelihood
+                bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
+                ad_stat = anderson_darling_sorted(cdf_vals)
+                
+                fit_results["Beta"] = {
+                    "params": beta_params,
+                    "ks_stat": ks_stat,
+                    "ks_pvalue": ks_pvalue,
+                    "log_likelihood": log_likelihood,
+                    "aic": aic,
+                    "bic": bic,
+                    "ad_stat": ad_stat,
+                    "success": True
+                }
+            else:
+                fit_results["Beta"] = {"success": False, "error": "数据范围无效"}
+        else:
+            fit_results["Beta"] = {"success": False, "error": "scipy不可用"}
+    except Exception as e:
+        fit_results["Beta"] = {"success": False, "error": str(e)}
+    
+    # 6. Weibull分布（需要数据为正）
+    try:
+        if scipy_available and np.all(available_returns > -1):
+            shifted_returns = available_returns + 1
+            c_fitted, loc_fitted, scale_fitted = scipy_stats.weibull_min.fit(fit_data + 1)
+            weibull_params = {"c": float(c_fitted), "loc": float(loc_fitted), "scale": float(scale_fitted), "shift": 1.0}
+            
+            cdf_vals = scipy_stats.weibull_min.cdf(sorted_returns + 1, c_fitted, loc=loc_fitted, scale=scale_fitted)
+            ks_stat, ks_pvalue = ks_test_sorted(cdf_vals, ecdf_lo, ecdf_hi)
+            log_likelihood = np.sum(scipy_stats.weibull_min.logpdf(shifted_returns, c_fitted, loc=loc_fitted, scale=scale_fitted))
+            n_params = 3
+            aic = 2 * n_params - 2 * log_likelihood
+            bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
+            ad_stat = anderson_darling_sorted(cdf_vals)
+            
+            fit_results["Weibull"] = {
+                "params": weibull_params,
+                "ks_stat": ks_stat,
+                "ks_pvalue": ks_pvalue,
+                "log_likelihood": log_likelihood,
+                "aic": aic,
+                "bic": bic,
+                "ad_stat": ad_stat,
+                "success": True
+            }
+        else:
+            fit_results["Weibull"] = {"success": False, "error": "数据不满足weibull要求或scipy不可用"}
+    except Exception as e:
+        fit_results["Weibull"] = {"success": False, "error": str(e)}
+    
+    # 7. Gumbel分布
+    try:
+        if scipy_available:
+            loc_fitted, scale_fitted = scipy_stats.gumbel_l.fit(fit_data)
+            gumbel_params = {"loc": float(loc_fitted), "scale": float(scale_fitted)}
+            
+            cdf_vals = scipy_stats.gumbel_l.cdf(sorted_returns, loc=loc_fitted, scale=scale_fitted)
+            ks_stat, ks_pvalue = ks_test_sorted(cdf_vals, ecdf_lo, ecdf_hi)
+            log_likelihood = np.sum(scipy_stats.gumbel_l.logpdf(available_returns, loc=loc_fitted, scale=scale_fitted))
+            n_params = 2
+            aic = 2 * n_params - 2 * log_likelihood
+            bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
+            ad_stat = anderson_darling_sorted(cdf_vals)
+            
+            fit_results["Gumbel"] = {
+                "params": gumbel_params,
+                "ks_stat": ks_stat,
+                "ks_pvalue": ks_pvalue,
+                "log_likelihood": log_likelihood,
+                "aic": aic,
+                "bic": bic,
+                "ad_stat": ad_stat,
+                "success": True
+            }
+        else:
+            fit_results["Gumbel"] = {"success": False, "error": "scipy不可用"}
+    except Exception as e:
+        fit_results["Gumbel"] = {"success": False, "error": str(e)}
+    
+    # 8. Laplace分布
+    try:
+        if scipy_available:
+            # Laplace分布MLE为闭式解：中位数与平均绝对偏差，无需调用laplace.fit
+            loc_fitted = float(sorted_returns[(n_obs - 1) // 2] + sorted_returns[n_obs // 2]) / 2
+            scale_fitted = float(np.mean(np.abs(fit_data - loc_fitted)))
+            laplace_params = {"loc": float(loc_fitted), "scale": float(scale_fitted)}
+            
+            cdf_vals = scipy_stats.laplace.cdf(sorted_returns, loc=loc_fitted, scale=scale_fitted)
+            ks_stat, ks_pvalue = ks_test_sorted(cdf_vals, ecdf_lo, ecdf_hi)
+            log_likelihood = laplace_log_likelihood(available_returns, loc_fitted, scale_fitted)
+            n_params = 2
+            aic = 2 * n_params - 2 * log_likelihood
+            bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
+            ad_stat = anderson_darling_sorted(cdf_vals)
+            
+            fit_results["Laplace"] = {
+                "params": laplace_params,
+                "ks_stat": ks_stat,
+                "ks_pvalue": ks_pvalue,
+                "log_likelihood": log_likelihood,
+                "aic": aic,
+                "bic": bic,
+                "ad_stat": ad_stat,
+                "success": True
+            }
+        else:
+            fit_results["Laplace"] = {"success": False, "error": "scipy不可用"}
+    except Exception as e:
+        fit_results["Laplace"] = {"success": False, "error": str(e)}
+    
+    # 9. Cauchy分布
+    try:
+        if scipy_available:
+            loc_fitted, scale_fitted = scipy_stats.cauchy.fit(fit_data)
+            cauchy_params = {"loc": float(loc_fitted), "scale": float(scale_fitted)}
+            
+            cdf_vals = scipy_stats.cauchy.cdf(sorted_returns, loc=loc_fitted, scale=scale_fitted)
+            ks_stat, ks_pvalue = ks_test_sorted(cdf_vals, ecdf_lo, ecdf_hi)
+            log_likelihood = cauchy_log_likelihood(available_returns, loc_fitted, scale_fitted)
+            n_params = 2
+            aic = 2 * n_params - 2 * log_likelihood
+            bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
+            ad_stat = anderson_darling_sorted(cdf_vals)
+            
+            fit_results["Cauchy"] = {
+                "params": cauchy_params,
+                "ks_stat": ks_stat,
+                "ks_pvalue": ks_pvalue,
+                "log_likelihood": log_likelihood,
+                "aic": aic,
+                "bic": bic,
+                "ad_stat": ad_stat,
+                "success": True
+            }
+        else:
+            fit_results["Cauchy"] = {"success": False, "error": "scipy不可用"}
+    except Exception as e:
+        fit_results["Cauchy"] = {"success": False, "error": str(e)}
+    
+    # 10. Bootstrap（经验分布，直接使用数据）
+    try:
+        # Bootstrap是经验分布，直接使用历史数据
+        # 计算经验分布函数（ECDF）
+        n_samples = len(available_returns)
+        # 经验均值/标准差与Normal拟合共用同一组统计量
+        empirical_mean = mean_ret
+        empirical_std = std_ret
+        
+        # KS统计量：经验分布与自身的KS统计量应该为0（完美拟合）
+        if scipy_available:
+            # 对于Bootstrap，经验分布与自身的KS统计量应该为0
+            # 但我们可以使用经验分布的概率密度来计算对数似然
+            # 使用核密度估计（KDE）来计算对数似然
+            # 大样本时KDE在子样本上估计，再按样本量折算到全量数据
+            try:
+                log_likelihood = kde_log_likelihood(fit_data) * n_samples / len(fit_data)
+            except:
+                # 如果KDE失败，使用经验分布的概率密度估计
+                # 对于经验分布，每个观测值的概率密度为 1/(n * bandwidth)
+                # 这里使用一个简化的估计
+                bandwidth = np.std(available_returns) * (4 / (3 * n_samples)) ** (1/5)  # Silverman's rule
+                log_likelihood = -n_samples * np.log(n_samples * bandwidth) - 0.5 * np.sum((available_returns - empirical_mean) ** 2) / (2 * bandwidth ** 2)
+            
+            # AIC和BIC：对于Bootstrap，参数数量可以认为是数据点数（或使用一个较小的值）
+            # 但通常Bootstrap的参数数量被认为是0（无参数模型）或数据点数
+            # 这里我们使用一个折中方案：参数数量 = log(n)（表示数据复杂度）
+            n_params_bootstrap = np.log(n_samples) if n_samples > 1 else 1
+            aic = 2 * n_params_bootstrap - 2 * log_likelihood
+            bic = n_params_bootstrap * np.log(n_samples) - 2 * log_likelihood
+            
+            # Bootstrap的KS统计量设为0（完美拟合自身）
+            ks_stat = 0.0
+            ks_pvalue = 1.0  # 完美拟合，p值为1
+            ad_stat = None  # Anderson-Darling不适用于经验分布
+        else:
+            ks_stat, ks_pvalue, log_likelihood, aic, bic, ad_stat = None, None, None, None, None, None
+        
+        fit_results["Bootstrap"] = {
+            "params": {
+                "samples": n_samples,
+                "mean": float(empirical_mean),
+                "std": float(empirical_std),
+                "min": data_min,
+                "max": data_max
+            },
+            "ks_stat": ks_stat,
+            "ks_pvalue": ks_pvalue,
+            "log_likelihood": log_likelihood,
+            "aic": aic,
+            "bic": bic,
+            "ad_stat": ad_stat,
+            "success": True
+        }
+    except Exception as e:
+        fit_results["Bootstrap"] = {"success": False, "error": str(e)}
+    
+    # 计算综合评分（基于多个指标）
+    # 拟合结果整理为以分布名为索引的DataFrame，各指标按列向量化归一化
+    metric_cols = ["ks_stat", "ks_pvalue", "log_likelihood", "aic", "bic", "ad_stat"]
+    metrics_df = pd.DataFrame.from_dict(fit_results, orient="index").reindex(columns=["success", "error"] + metric_cols)
+    metrics_df[metric_cols] = metrics_df[metric_cols].apply(pd.to_numeric, errors="coerce")
+    metrics_df["success"] = metrics_df["success"].fillna(False).astype(bool)
+    
+    succeeded = metrics_df[metrics_df["success"]]
+    scored = succeeded[succeeded.index != "Bootstrap"]
+    
+    def _minmax_norm(metric, higher_is_better=True):
+        # 归一化区间取全部成功拟合（含Bootstrap）的取值，Bootstrap本身不参与打分
+        # 缺失值及无穷值（如样本落在拟合支撑集外）记0分；所有值相同时记满分
+        ref = succeeded[metric].where(np.isfinite(succeeded[metric]))
+        col = scored[metric].where(np.isfinite(scored[metric]))
+        lo, hi = ref.min(), ref.max()
+        normed = (col - lo) / (hi - lo) if hi > lo else pd.Series(1.0, index=col.index)
+        if not higher_is_better:
+            normed = 1 - normed
+        return normed.where(col.notna(), 0.0)
+    
+    # KS p值、对数似然越高越好；AIC、BIC、AD统计量越低越好
+    # AD统计量只对参数分布有限（Bootstrap为空），其归一化区间即有限AD值的参数拟合
+    metrics_df["score"] = (
+        0.25 * scored["ks_pvalue"].fillna(0.0)
+        + 0.25 * _minmax_norm("aic", higher_is_better=False)
+        + 0.15 * _minmax_norm("bic", higher_is_better=False)
+        + 0.15 * _minmax_norm("log_likelihood")
+        + 0.2 * _minmax_norm("ad_stat", higher_is_better=False)
+    )
+    if fit_results.get("Bootstrap", {}).get("success", False):
+        # Bootstrap的特殊评分（基于数据量）
+        metrics_df.loc["Bootstrap", "score"] = min(1.0, len(available_returns) / 1000) * 0.5  # 数据量越多越好
+    
+    # 找出最佳拟合分布
+    scores = metrics_df["score"].dropna()
+    best_dist = scores.idxmax() if len(scores) > 0 else "Normal"
+    
+    # 在共享网格上一次性预计算所有成功拟合分布的PDF，切换分布时只需取用
+    pdf_x = np.linspace(data_min, data_max, 200)
+    pdfs = {}
+    for dist_name, result in fit_results.items():
+        pdf_fn = PDF_FNS.get(dist_name)
+        if pdf_fn is None or not result.get("success", False):
+            continue
+        try:
+            pdfs[dist_name] = pdf_fn(pdf_x, result["params"])
+        except Exception:
+            pass
+    return fit_results, metrics_df, best_dist, pdf_x, pdfs
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def fit_input_models(returns: np.ndarray) -> dict:
+    """回测后的自动输入建模：拟合 Normal / Student-t / Bootstrap，按综合评分选出最佳分布
+
+    返回 {"best": 最佳分布名（可能为None）, "fit_results": 各分布的拟合结果}；按收益率数组缓存，
+    相同数据重复回测时不再重新拟合。
+    """
+    # 只拟合支持的三种分布：Normal, Student-t, Bootstrap
+    fit_results = {}
+    # 回测收益率为 float32：拟合统一转成 float64，Bootstrap 仍直接保存原数组
+    samples = np.asarray(returns, dtype=np.float64)
+
+    # 1. Normal分布
+    scipy_available = scipy_stats is not None
+
+    # 均值/方差各一次归约
+    normal_mean = float(samples.mean())
+    normal_vol = math.sqrt(samples.var())
+    normal_params = {"mean": normal_mean, "vol": normal_vol}
+
+    if scipy_available:
+        ks_stat, ks_pvalue = scipy_stats.kstest(samples, scipy_stats.norm(loc=normal_mean, scale=normal_vol).cdf)
+        log_likelihood = normal_log_likelihood(samples, normal_mean, normal_vol)
+        n_params = 2
+        aic = 2 * n_params - 2 * log_likelihood
+        bic = n_params * np.log(len(samples)) - 2 * log_likelihood
+    else:
+        ks_stat, ks_pvalue, log_likelihood, aic, bic = None, None, None, None, None
+
+    fit_results["Normal"] = {
+        "params": normal_params,
+        "ks_stat": ks_stat,
+        "ks_pvalue": ks_pvalue,
+        "log_likelihood": log_likelihood,
+        "aic": aic,
+        "bic": bic,
+        "success": True
+    }
+
+    # 2. Student-t分布
+    if scipy_available:
+        try:
+            df, loc, scale = fit_student_t(samples, normal_mean, normal_vol)
+            student_t_params = {"df": float(df), "mean": float(loc), "scale": float(scale)}
+
+            # 计算拟合优度
+            ks_stat, ks_pvalue = scipy_stats.kstest(samples, "t", args=(df, loc, scale))
+            log_likelihood = student_t_log_likelihood(samples, df, loc, scale)
+            n_params = 3
+            aic = 2 * n_params - 2 * log_likelihood
+            bic = n_params * np.log(len(samples)) - 2 * log_likelihood
+
+            fit_results["Student-t"] = {
+                "params": student_t_params,
+                "ks_stat": ks_stat,
+                "ks_pvalue": ks_pvalue,
+                "log_likelihood": log_likelihood,
+                "aic": aic,
+                "bic": bic,
+                "success": True
+            }
+        except Exception as e:
+            fit_results["Student-t"] = {"success": False, "error": str(e)}
+    else:
+        fit_results["Student-t"] = {"success": False, "error": "scipy未安装"}
+
+    # 3. Bootstrap分布
+    fit_results["Bootstrap"] = {
+        "params": {"historical_returns": returns},  # 直接保存ndarray，不转成Python列表
+        "ks_stat": 0.0,
+        "ks_pvalue": 1.0,
+        "log_likelihood": None,  # Bootstrap没有解析式
+        "aic": None,
+        "bic": None,
+        "success": True
+    }
+
+    # 找到最佳分布（只从支持的三种中选择）
+    best_dist = None
+    best_score = -np.inf
+    for dist_name in ["Normal", "Student-t", "Bootstrap"]:
+        result = fit_results.get(dist_name, {})
+        if result.get("success", False):
+            # 使用综合评分
+            score = 0
+            if "ks_pvalue" in result and result["ks_pvalue"] is not None and not np.isnan(result["ks_pvalue"]):
+                score += result["ks_pvalue"] * 2  # p值越高越好
+            if "aic" in result and result["aic"] is not None and not np.isnan(result["aic"]):
+                score -= result["aic"] / 1000  # AIC越低越好
+            if dist_name == "Bootstrap":
+                score += 0.5  # Bootstrap有额外加分（保留完整历史特征）
+            if score > best_score:
+                best_score = score
+                best_dist = dist_name
+
+    return {"best": best_dist, "fit_results": fit_results}
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_returns_histogram(available_returns: np.ndarray) -> go.Figure:
+    """收益率50分箱直方图底图（按数据缓存，每次返回副本，调用方可直接追加曲线）"""
+    fig = go.Figure()
+    fig.add_trace(go.Histogram(
+        x=available_returns,
+        name="实际数据",
+        opacity=0.5,
+        nbinsx=50,
+        marker_color=COLORS["blue"]
+    ))
+    return fig
+
+@lru_cache(maxsize=None)
 def get_chart_layout(height=400):
+    """图表通用暗色布局；按高度缓存，同一高度复用同一个dict（只用于 **展开传给plotly，勿原地修改）"""
     return dict(
         template="plotly_dark",
         paper_bgcolor='rgba(0,0,0,0)',
@@ -282,12 +1270,31 @@ def get_chart_layout(height=400):
         hovermode="x unified"
     )
 
-def plot_monte_carlo_fan(dates, paths, median_path):
+@lru_cache(maxsize=1)
+def t_vs_normal_figure():
+    """正态 vs Student-t(df=5) 示意密度曲线；与用户输入无关，进程内只构建一次（只读，勿修改返回的图）"""
+    x = np.linspace(-0.1, 0.1, 200)
+    normal_y = (1 / (0.02 * np.sqrt(2 * np.pi))) * np.exp(-0.5 * (x / 0.02) ** 2)
+    t_y = (1 / (0.02 * np.sqrt(5 * np.pi))) * (1 + (x / 0.02) ** 2 / 5) ** (-3)
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=x, y=normal_y, name="正态分布", line=dict(color=COLORS["blue"])))
+    fig.add_trace(go.Scatter(x=x, y=t_y, name="Student-t分布 (df=5)", line=dict(color=COLORS["gold"])))
+    fig.update_layout(
+        title="正态分布 vs Student-t分布（厚尾对比）",
+        xaxis_title="收益率",
+        yaxis_title="概率密度",
+        template="plotly_dark",
+        height=300,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+    )
+    return fig
+
+def plot_monte_carlo_fan(dates, fan):
+    """扇形图：fan 为模拟结束时一次算好的 5/25/50/75/95 分位路径，重绘时不再对全部路径求分位数"""
     dates_arr = np.asarray(dates)
-    p95 = np.percentile(paths, 95, axis=1)
-    p05 = np.percentile(paths, 5, axis=1)
-    p75 = np.percentile(paths, 75, axis=1)
-    p25 = np.percentile(paths, 25, axis=1)
+    p05, p25, median_path, p75, p95 = fan
 
     fig = go.Figure()
     
@@ -318,10 +1325,49 @@ def plot_monte_carlo_fan(dates, paths, median_path):
     fig.update_layout(title="Projected Wealth Cone")
     return fig
 
+# 长序列图表显示点数上限（超过则用 LTTB 降采样）
+LTTB_MAX_POINTS = 1500
+# 权重历史超过该行数时，资产权重图改用热力图
+WEIGHTS_HEATMAP_THRESHOLD = 2000
+
+def lttb_indices(y: np.ndarray, n_out: int = LTTB_MAX_POINTS) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets 降采样，返回保留点的位置索引。
+
+    横轴按等间距位置处理（日频交易日近似等距），首尾点必保留；
+    序列不超过 n_out 时原样返回全部索引。
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    # 非有限值（如波动率为0时的Sharpe）只在选点时按0处理，不影响绘图数值
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64), nan=0.0, posinf=0.0, neginf=0.0)
+    # 中间 n-2 个点均分为 n_out-2 个桶，末尾补 n 便于取"下一个桶"
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(np.int64), n)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        nxt_start, nxt_end = edges[i + 1], edges[i + 2]
+        avg_x = (nxt_start + nxt_end - 1) / 2.0
+        avg_y = y[nxt_start:nxt_end].mean()
+        xs = np.arange(start, end)
+        area = np.abs((a - avg_x) * (y[start:end] - y[a]) - (a - xs) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+def plot_array(values, scale: float = 1.0) -> np.ndarray:
+    """图表用的 float32 数组：约7位有效数字足够显示，plotly 按类型化数组序列化时体积减半；统计量仍用 float64 计算"""
+    arr = np.asarray(values, dtype=np.float32)
+    return arr * np.float32(scale) if scale != 1.0 else arr
+
 def plot_nav_curve(df):
+    portfolio = df['Portfolio']
+    keep = lttb_indices(portfolio.to_numpy())
     fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df.index, y=df['Portfolio'],
+    fig.add_trace(go.Scattergl(
+        x=df.index[keep], y=plot_array(portfolio.to_numpy()[keep]),
         mode='lines', name='Strategy',
         line=dict(color=COLORS['gold'], width=2),
         fill='tozeroy', fillcolor='rgba(210, 153, 34, 0.05)'
@@ -330,6 +1376,35 @@ def plot_nav_curve(df):
     fig.update_layout(title="Net Asset Value")
     return fig
 
+# 操作步骤卡片样式
+STEP_STYLE_ACTIVE = "background-color: rgba(210, 153, 34, 0.2); border: 2px solid #D29922; padding: 10px; border-radius: 8px; text-align: center;"
+STEP_STYLE_DONE = "background-color: rgba(63, 185, 80, 0.1); border: 2px solid #3FB950; padding: 10px; border-radius: 8px; text-align: center;"
+STEP_STYLE_PENDING = "background-color: rgba(139, 148, 158, 0.1); border: 2px solid #8B949E; padding: 10px; border-radius: 8px; text-align: center; opacity: 0.6;"
+
+def render_step_indicator(current_step: int, steps_done: list, labels: list) -> None:
+    """渲染操作步骤指引：所有步骤卡片拼成一个flex容器，一次markdown输出"""
+    cells = []
+    last_step = len(labels)
+    for step_no, (done, label) in enumerate(zip(steps_done, labels), start=1):
+        if not done:
+            # 第一步未完成时即为当前步骤
+            style, icon = (STEP_STYLE_ACTIVE, "📍") if step_no == 1 else (STEP_STYLE_PENDING, "⏳")
+        elif step_no == last_step or current_step > step_no:
+            style, icon = STEP_STYLE_DONE, "✅"
+        elif current_step == step_no:
+            style, icon = STEP_STYLE_ACTIVE, "🔄"
+        else:
+            style, icon = STEP_STYLE_DONE, "✅"
+        cells.append(f'<div style="flex:1; {style}"><strong>{icon} 步骤 {step_no}</strong><br>{label}</div>')
+    st.markdown(f'<div style="display:flex; gap:1rem;">{"".join(cells)}</div>', unsafe_allow_html=True)
+
+def render_help_expander(label: str, body: str, key: str) -> None:
+    """说明性展开区：跟踪开合状态（on_change="rerun"），折叠时不输出正文"""
+    expander = st.expander(label, expanded=False, key=key, on_change="rerun")
+    if expander.open:
+        with expander:
+            st.markdown(body)
+
 def render_hud_card(label, value, sub_value=None, sub_color=COLORS['text_sub']):
     """渲染 HTML 风格的 HUD 卡片 (Deprecated in favor of st.metric for this version but kept for compatibility)"""
     st.metric(label, value, sub_value)
@@ -341,6 +1416,221 @@ def describe_input_model(model: Optional[dict]) -> str:
     params_text = ", ".join(f"{k}={v}" for k, v in params.items()) or "N/A"
     return f"Model: {model.get('dist_name', 'normal')} ({params_text})"
 
+# 回测综合评分阈值表（阈值升序；bisect 定位区间后同时索引分数与评语）
+# 收益 / Sharpe / 回撤为"大于阈值"判定（bisect_left），波动率与总分为"小于阈值"判定（bisect_right）
+RET_SCORE_TH = (0.0, 0.1, 0.2)
+RET_SCORE_TABLE = ((0, "亏损"), (10, "一般"), (20, "良好"), (30, "优秀"))
+SHARPE_COMMENT_TH = (0.5, 1.0, 1.5)
+SHARPE_COMMENTS = ("较差", "一般", "良好", "优秀")
+DD_SCORE_TH = (-0.3, -0.2, -0.1)
+DD_SCORE_TABLE = ((5, "较差"), (10, "一般"), (15, "良好"), (20, "优秀"))
+VOL_COMMENT_TH = (0.1, 0.15, 0.2)
+VOL_COMMENTS = ("非常稳定", "较稳定", "中等波动", "高波动")
+RATING_TH = (35, 50, 65, 80)
+RATING_TABLE = (
+    ("差 ⭐", "#F85149", "不推荐"),
+    ("较差 ⭐⭐", "#F85149", "需改进"),
+    ("一般 ⭐⭐⭐", "#D29922", "可考虑"),
+    ("良好 ⭐⭐⭐⭐", "#58A6FF", "推荐"),
+    ("优秀 ⭐⭐⭐⭐⭐", "#3FB950", "强烈推荐"),
+)
+
+# 回测最终结论：模板只解析一次，各档措辞同样用阈值表定位，渲染时 format_map 填入
+CONCLUSION_OVERALL_TH = (50, 65)
+CONCLUSION_OVERALL_WORDS = ("较差", "一般", "良好")
+CONCLUSION_RET_TH = (0.0, 0.05, 0.15)
+CONCLUSION_RET_WORDS = ("出现亏损", "表现一般", "表现良好", "表现优秀")
+CONCLUSION_SHARPE_TH = (1.0,)
+CONCLUSION_SHARPE_WORDS = ("低于市场平均水平", "优于市场平均水平")
+CONCLUSION_DD_TH = (-0.25, -0.15)
+CONCLUSION_DD_WORDS = ("风险较高", "风险控制一般", "风险控制良好")
+CONCLUSION_VOL_TH = (0.15, 0.25)
+CONCLUSION_VOL_WORDS = ("波动性较低", "波动性中等", "波动性较高")
+CONCLUSION_ADVICE_TH = (50, 65, 80)
+CONCLUSION_ADVICE = (
+    "❌ 该策略表现较差，建议重新评估或更换策略",
+    "⚠️ 该策略表现一般，建议优化参数或考虑其他策略",
+    "✅ 该策略表现良好，可以继续使用",
+    "✅ 该策略表现优秀，建议继续使用或适当增加配置",
+)
+CONCLUSION_TMPL = """
+**策略表现总结：**
+
+本次回测显示，{strategy}策略在测试期间取得了{overall_word}的表现。
+
+**核心发现：**
+- 总收益率为 **{total_return:.2%}**，{ret_word}
+- 风险调整后收益（Sharpe比率）为 **{sharpe:.2f}**，{sharpe_word}
+- 最大回撤为 **{max_dd:.2%}**，{dd_word}
+- 组合波动率为 **{volatility:.2%}**，{vol_word}
+
+**决策建议：**
+{advice}
+
+**风险提示：**
+- 历史表现不代表未来收益
+- 回测结果基于历史数据，实际投资可能面临不同市场环境
+- 建议结合个人风险承受能力做出最终决策
+"""
+
+# 下载报告第六节：与结果页同一套措辞（backtest_conclusion 的 words），但保留报告自己的小节标题与风险提示
+REPORT_CONCLUSION_TMPL = """### 6.1 策略表现总结
+
+本次回测显示，**{strategy}**策略在测试期间取得了{overall_word}的表现。
+
+**核心发现：**
+- 总收益率为 **{total_return:.2%}**，{ret_word}
+- 风险调整后收益（Sharpe比率）为 **{sharpe:.2f}**，{sharpe_word}
+- 最大回撤为 **{max_dd:.2%}**，{dd_word}
+- 组合波动率为 **{volatility:.2%}**，{vol_word}
+
+### 6.2 决策建议
+
+{advice}
+
+### 6.3 风险提示
+
+- ⚠️ **历史表现不代表未来收益** - 回测结果基于历史数据，实际投资可能面临不同市场环境
+- ⚠️ **市场环境变化** - 策略在不同市场环境下表现可能差异较大
+- ⚠️ **风险承受能力** - 建议结合个人风险承受能力做出最终决策
+- ⚠️ **分散投资** - 建议不要将所有资金投入单一策略"""
+
+def score_backtest(metrics: dict) -> dict:
+    """回测综合评分（0-100）：收益30 + 风险调整收益30 + 风险控制20 + 稳定性20
+
+    返回 score / details（评分明细文字）/ rating / color / recommendation，结果页与报告共用。
+    """
+    ret_score, ret_comment = RET_SCORE_TABLE[bisect_left(RET_SCORE_TH, metrics['total_return'])]
+    sharpe_score = min(30, max(0, int(metrics['sharpe'] * 10)))
+    sharpe_comment = SHARPE_COMMENTS[bisect_left(SHARPE_COMMENT_TH, metrics['sharpe'])]
+    risk_score, risk_comment = DD_SCORE_TABLE[bisect_left(DD_SCORE_TH, metrics['max_dd'])]
+    vol_score = max(0, 20 - int(metrics['volatility'] * 100))
+    vol_comment = VOL_COMMENTS[bisect_right(VOL_COMMENT_TH, metrics['volatility'])]
+
+    score = ret_score + sharpe_score + risk_score + vol_score
+    rating, color, recommendation = RATING_TABLE[bisect_right(RATING_TH, score)]
+    return {
+        "score": score,
+        "details": [
+            f"收益表现：{ret_comment} (+{ret_score}分)",
+            f"风险调整收益：{sharpe_comment} (+{sharpe_score}分)",
+            f"风险控制：{risk_comment} (+{risk_score}分)",
+            f"波动性：{vol_comment} (+{vol_score}分)",
+        ],
+        "rating": rating,
+        "color": color,
+        "recommendation": recommendation,
+    }
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def backtest_conclusion(total_return: float, sharpe: float, max_dd: float, volatility: float,
+                        sortino: float, calmar: float) -> dict:
+    """结论区内容：score_backtest 的评分结果再加上 advantages / concerns 清单与适用性评估三栏
+
+    按六个指标标量缓存，指标未变的重跑（切换标签页、展开说明等）直接命中。
+    """
+    conclusion = score_backtest({
+        'total_return': total_return, 'sharpe': sharpe, 'max_dd': max_dd, 'volatility': volatility,
+    })
+    conclusion["advantages"] = [msg for hit, msg in (
+        (sharpe > 1.5, "**风险调整后收益优秀** - Sharpe比率超过1.5，说明策略在控制风险的同时获得了良好收益"),
+        (1.0 < sharpe <= 1.5, "**风险调整后收益良好** - Sharpe比率超过1.0，策略表现优于市场平均水平"),
+        (max_dd > -0.15, "**回撤控制良好** - 最大回撤小于15%，风险控制能力较强"),
+        (sortino > 1.5, "**下行风险控制优秀** - Sortino比率较高，说明策略在下跌时表现更好"),
+        (calmar > 1.0, "**收益回撤比优秀** - Calmar比率超过1.0，说明收益能力远强于最大损失"),
+        (volatility < 0.15, "**波动率较低** - 组合波动性较小，适合稳健型投资者"),
+    ) if hit] or ["策略表现中规中矩，无明显突出优势"]
+    conclusion["concerns"] = [msg for hit, msg in (
+        (total_return < 0, "**出现亏损** - 总收益率为负，需要重新评估策略或市场环境"),
+        (0 <= total_return < 0.05, "**收益偏低** - 总收益率低于5%，可能不如无风险资产"),
+        (sharpe < 0.5, "**风险调整收益较差** - Sharpe比率低于0.5，风险收益比不理想"),
+        (max_dd < -0.3, "**回撤较大** - 最大回撤超过30%，风险较高，需要评估承受能力"),
+        (volatility > 0.25, "**波动率较高** - 组合波动性较大，可能不适合风险厌恶型投资者"),
+        (sortino < 0.5, "**下行风险控制不足** - Sortino比率较低，下跌时损失可能较大"),
+    ) if hit] or ["策略表现良好，无明显风险点"]
+    # 策略适用性评估三栏
+    conclusion["investor_types"] = [msg for hit, msg in (
+        (volatility < 0.12 and max_dd > -0.15, "✅ **风险厌恶型** - 低波动、低回撤"),
+        (sharpe > 1.0 and total_return > 0.1, "✅ **平衡型** - 收益风险平衡"),
+        (total_return > 0.15 and sharpe > 1.2, "✅ **成长型** - 追求较高收益"),
+    ) if hit] or ["⚠️ 需要根据个人风险偏好谨慎评估"]
+    conclusion["market_conditions"] = [msg for hit, msg in (
+        (sharpe > 1.0, "✅ **趋势市场** - 表现良好"),
+        (sortino > sharpe, "✅ **震荡市场** - 下行风险控制好"),
+        (volatility < 0.15, "✅ **波动市场** - 稳定性好"),
+    ) if hit] or ["⚠️ 需要结合具体市场环境分析"]
+    conclusion["optimizations"] = [msg for hit, msg in (
+        (sharpe < 1.0, "💡 考虑调整策略参数以提高风险调整收益"),
+        (max_dd < -0.2, "💡 增加风险控制措施，降低最大回撤"),
+        (volatility > 0.2, "💡 考虑增加低波动资产以降低组合波动"),
+        (calmar < 0.5, "💡 优化收益回撤比，提高策略效率"),
+    ) if hit] or ["✅ 策略表现良好，可继续使用"]
+    score = conclusion["score"]
+    # CONCLUSION_TMPL 的填充值（策略名由调用方补入）
+    conclusion["words"] = {
+        "overall_word": CONCLUSION_OVERALL_WORDS[bisect_right(CONCLUSION_OVERALL_TH, score)],
+        "total_return": total_return,
+        "ret_word": CONCLUSION_RET_WORDS[bisect_left(CONCLUSION_RET_TH, total_return)],
+        "sharpe": sharpe,
+        "sharpe_word": CONCLUSION_SHARPE_WORDS[bisect_left(CONCLUSION_SHARPE_TH, sharpe)],
+        "max_dd": max_dd,
+        "dd_word": CONCLUSION_DD_WORDS[bisect_left(CONCLUSION_DD_TH, max_dd)],
+        "volatility": volatility,
+        "vol_word": CONCLUSION_VOL_WORDS[bisect_right(CONCLUSION_VOL_TH, volatility)],
+        "advice": CONCLUSION_ADVICE[bisect_right(CONCLUSION_ADVICE_TH, score)],
+    }
+    return conclusion
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def nav_csv_bytes(dates: np.ndarray, nav: np.ndarray, drawdown: np.ndarray) -> bytes:
+    """回测净值/回撤CSV导出内容；浮点按10位有效数字输出，文件更小且亿元以内净值仍保留到分
+
+    日期以 datetime64 数组传入：带 freq 的 DatetimeIndex 无法被 st.cache_data 哈希。
+    """
+    csv_data = pd.DataFrame({
+        'Date': dates,
+        'Portfolio Value': nav,
+        'Drawdown': drawdown
+    })
+    return csv_data.to_csv(index=False, float_format='%.10g').encode('utf-8')
+
+def excel_cell(value):
+    """与 pandas.to_excel 的默认输出一致：NaN 写为空单元格，±inf 写为字符串 "inf" / "-inf"
+
+    xlsxwriter 的 nan_inf_to_errors 会把它们写成 #NUM! / #DIV/0! 错误单元格。
+    """
+    if isinstance(value, float) and not math.isfinite(value):
+        return None if math.isnan(value) else ("inf" if value > 0 else "-inf")
+    return value
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def build_excel_report(sheets: list) -> bytes:
+    """把若干 (表名, DataFrame, 是否写索引) 写成一个xlsx文件的字节串（按表内容缓存，重跑不再重复序列化）
+
+    装有 xlsxwriter 时用 constant_memory 模式逐行写出，写完的行即从内存释放；
+    pandas.to_excel 按列输出单元格，与该模式不兼容，因此这里直接逐行 write_row。
+    未安装 xlsxwriter 时回退 pandas + openpyxl。
+    """
+    output = io.BytesIO()
+    if xlsxwriter is None:
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            for sheet_name, frame, index in sheets:
+                frame.to_excel(writer, sheet_name=sheet_name, index=index)
+        return output.getvalue()
+    
+    workbook = xlsxwriter.Workbook(output, {
+        "constant_memory": True,
+        "default_date_format": "yyyy-mm-dd",
+    })
+    for sheet_name, frame, index in sheets:
+        worksheet = workbook.add_worksheet(sheet_name)
+        header = ([frame.index.name or ""] if index else []) + [str(col) for col in frame.columns]
+        worksheet.write_row(0, 0, header)
+        for row_idx, row in enumerate(frame.itertuples(index=index, name=None), start=1):
+            worksheet.write_row(row_idx, 0, [excel_cell(value) for value in row])
+    workbook.close()
+    return output.getvalue()
+
 def generate_backtest_report_markdown(
     strategy_name: str,
     initial_capital: float,
@@ -352,56 +1642,23 @@ def generate_backtest_report_markdown(
     max_dd_duration: int,
     portfolio_returns: Optional[np.ndarray],
     input_model_info: Optional[dict] = None,
-    conclusion_data: Optional[dict] = None
+    conclusion_data: Optional[dict] = None,
+    input_model_choice: str = "Normal"
 ) -> str:
-    """生成完整的回测报告Markdown文档"""
-    from datetime import datetime
-    
+    """生成完整的回测报告Markdown文档
+
+    不读取 st.session_state：下载按钮点击时由 Streamlit 在工作线程中调用，所需会话信息均经参数传入。
+    """
     report_time = datetime.now().strftime("%Y年%m月%d日 %H:%M:%S")
     
-    # 计算综合评分（与UI中相同的逻辑）
-    score = 0
-    if metrics['total_return'] > 0.2:
-        ret_score = 30
-    elif metrics['total_return'] > 0.1:
-        ret_score = 20
-    elif metrics['total_return'] > 0:
-        ret_score = 10
-    else:
-        ret_score = 0
-    score += ret_score
-    
-    sharpe_score = min(30, max(0, int(metrics['sharpe'] * 10)))
-    score += sharpe_score
-    
-    if metrics['max_dd'] > -0.1:
-        risk_score = 20
-    elif metrics['max_dd'] > -0.2:
-        risk_score = 15
-    elif metrics['max_dd'] > -0.3:
-        risk_score = 10
-    else:
-        risk_score = 5
-    score += risk_score
-    
-    vol_score = max(0, 20 - int(metrics['volatility'] * 100))
-    score += vol_score
-    
-    if score >= 80:
-        overall_rating = "优秀 ⭐⭐⭐⭐⭐"
-        recommendation = "强烈推荐"
-    elif score >= 65:
-        overall_rating = "良好 ⭐⭐⭐⭐"
-        recommendation = "推荐"
-    elif score >= 50:
-        overall_rating = "一般 ⭐⭐⭐"
-        recommendation = "可考虑"
-    elif score >= 35:
-        overall_rating = "较差 ⭐⭐"
-        recommendation = "需改进"
-    else:
-        overall_rating = "差 ⭐"
-        recommendation = "不推荐"
+    # 综合评分与优势/关注点清单（与结果页共用同一缓存）
+    scoring = backtest_conclusion(
+        float(metrics['total_return']), float(metrics['sharpe']), float(metrics['max_dd']),
+        float(metrics['volatility']), float(sortino), float(calmar)
+    )
+    score = scoring["score"]
+    overall_rating = scoring["rating"]
+    recommendation = scoring["recommendation"]
     
     # 生成报告内容
     report = f"""# 投资组合回测分析报告
@@ -430,7 +1687,6 @@ def generate_backtest_report_markdown(
             else:
                 report += f"- {key}: {value}\n"
     else:
-        input_model_choice = st.session_state.get("input_model_choice", "Normal")
         report += f"""
 **选择的分布模型**: {input_model_choice}
 
@@ -470,8 +1726,7 @@ def generate_backtest_report_markdown(
 """
     
     if portfolio_returns is not None and len(portfolio_returns) > 0:
-        var_95 = np.percentile(portfolio_returns, 5)
-        cvar_95 = portfolio_returns[portfolio_returns <= var_95].mean()
+        var_95, cvar_95 = var_cvar(np.asarray(portfolio_returns))
         report += f"""
 | 指标 | 数值 |
 |------|------|
@@ -496,55 +1751,13 @@ def generate_backtest_report_markdown(
 """
     
     # 策略优势
-    advantages = []
-    if metrics['sharpe'] > 1.5:
-        advantages.append("**风险调整后收益优秀** - Sharpe比率超过1.5，说明策略在控制风险的同时获得了良好收益")
-    elif metrics['sharpe'] > 1.0:
-        advantages.append("**风险调整后收益良好** - Sharpe比率超过1.0，策略表现优于市场平均水平")
-    
-    if metrics['max_dd'] > -0.15:
-        advantages.append("**回撤控制良好** - 最大回撤小于15%，风险控制能力较强")
-    
-    if sortino > 1.5:
-        advantages.append("**下行风险控制优秀** - Sortino比率较高，说明策略在下跌时表现更好")
-    
-    if calmar > 1.0:
-        advantages.append("**收益回撤比优秀** - Calmar比率超过1.0，说明收益能力远强于最大损失")
-    
-    if metrics['volatility'] < 0.15:
-        advantages.append("**波动率较低** - 组合波动性较小，适合稳健型投资者")
-    
-    if not advantages:
-        advantages.append("策略表现中规中矩，无明显突出优势")
-    
-    for adv in advantages:
+    for adv in scoring["advantages"]:
         report += f"- {adv}\n"
     
     report += "\n### 4.2 需要关注的风险点\n\n"
     
     # 风险关注点
-    concerns = []
-    if metrics['total_return'] < 0:
-        concerns.append("**出现亏损** - 总收益率为负，需要重新评估策略或市场环境")
-    elif metrics['total_return'] < 0.05:
-        concerns.append("**收益偏低** - 总收益率低于5%，可能不如无风险资产")
-    
-    if metrics['sharpe'] < 0.5:
-        concerns.append("**风险调整收益较差** - Sharpe比率低于0.5，风险收益比不理想")
-    
-    if metrics['max_dd'] < -0.3:
-        concerns.append("**回撤较大** - 最大回撤超过30%，风险较高，需要评估承受能力")
-    
-    if metrics['volatility'] > 0.25:
-        concerns.append("**波动率较高** - 组合波动性较大，可能不适合风险厌恶型投资者")
-    
-    if sortino < 0.5:
-        concerns.append("**下行风险控制不足** - Sortino比率较低，下跌时损失可能较大")
-    
-    if not concerns:
-        concerns.append("策略表现良好，无明显风险点")
-    
-    for concern in concerns:
+    for concern in scoring["concerns"]:
         report += f"- {concern}\n"
     
     report += f"""
@@ -557,59 +1770,18 @@ def generate_backtest_report_markdown(
 
 """
     
-    investor_types = []
-    if metrics['volatility'] < 0.12 and metrics['max_dd'] > -0.15:
-        investor_types.append("✅ **风险厌恶型** - 低波动、低回撤")
-    
-    if metrics['sharpe'] > 1.0 and metrics['total_return'] > 0.1:
-        investor_types.append("✅ **平衡型** - 收益风险平衡")
-    
-    if metrics['total_return'] > 0.15 and metrics['sharpe'] > 1.2:
-        investor_types.append("✅ **成长型** - 追求较高收益")
-    
-    if not investor_types:
-        investor_types.append("⚠️ 需要根据个人风险偏好谨慎评估")
-    
-    for it in investor_types:
+    # 适用性评估三栏同样取自 backtest_conclusion，与结果页一致
+    for it in scoring["investor_types"]:
         report += f"{it}\n"
     
     report += "\n### 5.2 市场环境适应性\n\n"
     
-    market_conditions = []
-    if metrics['sharpe'] > 1.0:
-        market_conditions.append("✅ **趋势市场** - 表现良好")
-    
-    if sortino > metrics['sharpe']:
-        market_conditions.append("✅ **震荡市场** - 下行风险控制好")
-    
-    if metrics['volatility'] < 0.15:
-        market_conditions.append("✅ **波动市场** - 稳定性好")
-    
-    if not market_conditions:
-        market_conditions.append("⚠️ 需要结合具体市场环境分析")
-    
-    for mc in market_conditions:
+    for mc in scoring["market_conditions"]:
         report += f"{mc}\n"
     
     report += "\n### 5.3 优化建议\n\n"
     
-    optimizations = []
-    if metrics['sharpe'] < 1.0:
-        optimizations.append("💡 考虑调整策略参数以提高风险调整收益")
-    
-    if metrics['max_dd'] < -0.2:
-        optimizations.append("💡 增加风险控制措施，降低最大回撤")
-    
-    if metrics['volatility'] > 0.2:
-        optimizations.append("💡 考虑增加低波动资产以降低组合波动")
-    
-    if calmar < 0.5:
-        optimizations.append("💡 优化收益回撤比，提高策略效率")
-    
-    if not optimizations:
-        optimizations.append("✅ 策略表现良好，可继续使用")
-    
-    for opt in optimizations:
+    for opt in scoring["optimizations"]:
         report += f"{opt}\n"
     
     report += f"""
@@ -618,26 +1790,7 @@ def generate_backtest_report_markdown(
 
 ## 六、最终结论与决策建议
 
-### 6.1 策略表现总结
-
-本次回测显示，**{strategy_name}**策略在测试期间取得了{'良好' if score >= 65 else '一般' if score >= 50 else '较差'}的表现。
-
-**核心发现：**
-- 总收益率为 **{metrics['total_return']:.2%}**，{'表现优秀' if metrics['total_return'] > 0.15 else '表现良好' if metrics['total_return'] > 0.05 else '表现一般' if metrics['total_return'] > 0 else '出现亏损'}
-- 风险调整后收益（Sharpe比率）为 **{metrics['sharpe']:.2f}**，{'优于市场平均水平' if metrics['sharpe'] > 1.0 else '低于市场平均水平'}
-- 最大回撤为 **{metrics['max_dd']:.2%}**，{'风险控制良好' if metrics['max_dd'] > -0.15 else '风险控制一般' if metrics['max_dd'] > -0.25 else '风险较高'}
-- 组合波动率为 **{metrics['volatility']:.2%}**，{'波动性较低' if metrics['volatility'] < 0.15 else '波动性中等' if metrics['volatility'] < 0.25 else '波动性较高'}
-
-### 6.2 决策建议
-
-{'✅ 该策略表现优秀，建议继续使用或适当增加配置' if score >= 80 else '✅ 该策略表现良好，可以继续使用' if score >= 65 else '⚠️ 该策略表现一般，建议优化参数或考虑其他策略' if score >= 50 else '❌ 该策略表现较差，建议重新评估或更换策略'}
-
-### 6.3 风险提示
-
-- ⚠️ **历史表现不代表未来收益** - 回测结果基于历史数据，实际投资可能面临不同市场环境
-- ⚠️ **市场环境变化** - 策略在不同市场环境下表现可能差异较大
-- ⚠️ **风险承受能力** - 建议结合个人风险承受能力做出最终决策
-- ⚠️ **分散投资** - 建议不要将所有资金投入单一策略
+{REPORT_CONCLUSION_TMPL.format_map({**scoring["words"], "strategy": strategy_name})}
 
 ---
 
@@ -994,8 +2147,7 @@ def render_derivatives_lab() -> None:
                     st.plotly_chart(
                         plot_monte_carlo_fan(
                             np.arange(mc_days_input+1), 
-                            mc_res['equity_paths'], 
-                            np.median(mc_res['equity_paths'], axis=0)
+                            InvestSimBridge.fan_bands(mc_res['equity_paths'])
                         ), 
                         use_container_width=True
                     )
@@ -1073,18 +2225,6 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
         st.session_state["show_input_modeling_dialog"] = True
         st.rerun()
     
-    # 策略说明
-    strategy_descriptions = {
-        "Fixed Weights": "保持固定权重分配，定期再平衡",
-        "Target Risk": "根据目标波动率动态调整权重",
-        "Adaptive Rebalance": "仅在权重偏离阈值时再平衡",
-        "Equal Weight": "所有资产等权重分配（1/N策略）",
-        "Risk Parity": "风险平价，各资产风险贡献相等",
-        "Minimum Variance": "最小方差组合，优化波动率",
-        "Momentum": "动量策略，增持表现好的资产",
-        "Mean Reversion": "均值回归，反向调整偏离资产",
-    }
-    
     available_strategies = InvestSimBridge.get_available_strategies()
     
     # 使用session state中的值
@@ -1110,210 +2250,13 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
         )
         
         # 显示策略说明
-        if strategy_name_global in strategy_descriptions:
-            strategy_colors = {
-                "Fixed Weights": "#58A6FF",
-                "Target Risk": "#D29922",
-                "Adaptive Rebalance": "#3FB950",
-                "Equal Weight": "#58A6FF",
-                "Risk Parity": "#D29922",
-                "Minimum Variance": "#F85149",
-                "Momentum": "#A371F7",
-                "Mean Reversion": "#79C0FF",
-            }
-            color = strategy_colors.get(strategy_name_global, "#8B949E")
-            st.info(f"💡 **{strategy_name_global}**: {strategy_descriptions[strategy_name_global]}")
+        if strategy_name_global in STRATEGY_DESCRIPTIONS:
+            st.info(f"💡 **{strategy_name_global}**: {STRATEGY_DESCRIPTIONS[strategy_name_global]}")
         
         # 策略详细说明
         with st.expander("📚 策略详细说明", expanded=False):
-            strategy_details = {
-                "Fixed Weights": """
-                ### 📌 固定权重策略
-            
-            **工作原理：**
-            - 始终保持预设的目标权重分配
-            - 定期再平衡，无论市场如何变化
-            - 例如：60%股票 + 30%债券 + 10%现金，始终保持这个比例
-            
-            **适用场景：**
-            - ✅ 长期投资者，相信资产配置的重要性
-            - ✅ 希望策略简单可预测
-            - ✅ 不追求市场择时
-            
-            **优点：**
-            - 简单易懂，执行方便
-            - 可预测性强
-            - 交易成本相对较低
-            
-            **缺点：**
-            - 不随市场变化调整
-            - 可能错过市场机会
-            - 风险控制能力有限
-            """,
-                "Target Risk": """
-                ### 🎯 目标风险策略
-            
-            **工作原理：**
-            - 根据市场波动动态调整资产权重
-            - 保持组合整体风险（波动率）在目标水平
-            - 市场波动大时降低风险资产，波动小时增加风险资产
-            
-            **适用场景：**
-            - ✅ 风险敏感型投资者
-            - ✅ 希望风险水平可控
-            - ✅ 需要自动风险调整
-            
-            **优点：**
-            - 风险可控，波动率稳定
-            - 自动适应市场变化
-            - 适合风险厌恶者
-            
-            **缺点：**
-            - 可能降低收益潜力
-            - 需要频繁调整
-            - 参数设置影响大
-            """,
-                "Adaptive Rebalance": """
-                ### 🔄 自适应再平衡策略
-            
-            **工作原理：**
-            - 只在权重偏离目标超过阈值时才再平衡
-            - 允许权重在一定范围内自然波动
-            - 减少不必要的交易和成本
-            
-            **适用场景：**
-            - ✅ 希望降低交易成本的投资者
-            - ✅ 允许权重适度偏离
-            - ✅ 长期持有策略
-            
-            **优点：**
-            - 交易成本低
-            - 允许权重自然波动（可能带来收益）
-            - 减少过度交易
-            
-            **缺点：**
-            - 权重可能长期偏离目标
-            - 风险控制不如固定权重严格
-            - 需要设置合适的阈值
-            """,
-                "Equal Weight": """
-                ### ⚖️ 等权重策略（1/N策略）
-            
-            **工作原理：**
-            - 所有资产分配相同权重（1/N，N为资产数量）
-            - 例如：3个资产各占33.33%
-            - 定期再平衡保持等权重
-            
-            **适用场景：**
-            - ✅ 不确定如何分配权重的投资者
-            - ✅ 追求简单有效的分散化
-            - ✅ 不想做复杂的权重优化
-            
-            **优点：**
-            - 极其简单，无需预测
-            - 分散化效果好
-            - 学术研究显示表现不错
-            
-            **缺点：**
-            - 忽略资产特性差异
-            - 可能不是最优配置
-            - 对资产数量敏感
-            """,
-                "Risk Parity": """
-                ### ⚡ 风险平价策略
-            
-            **工作原理：**
-            - 根据资产波动率分配权重
-            - 波动率低的资产权重更高，波动率高的权重更低
-            - 使各资产的风险贡献相等
-            
-            **适用场景：**
-            - ✅ 追求风险均衡的投资者
-            - ✅ 希望真正分散风险
-            - ✅ 不只看收益，更看风险
-            
-            **优点：**
-            - 风险分散效果好
-            - 波动率低的资产权重更高（如债券）
-            - 风险贡献均衡
-            
-            **缺点：**
-            - 可能降低收益潜力
-            - 需要准确估计波动率
-            - 计算相对复杂
-            """,
-                "Minimum Variance": """
-                ### 📉 最小方差策略
-            
-            **工作原理：**
-            - 基于资产间的协方差矩阵优化
-            - 最小化组合整体波动率
-            - 使用数学优化方法求解最优权重
-            
-            **适用场景：**
-            - ✅ 风险厌恶型投资者
-            - ✅ 追求最低波动率
-            - ✅ 愿意牺牲部分收益换取稳定
-            
-            **优点：**
-            - 波动率最低，风险最小
-            - 基于数学优化，理论最优
-            - 考虑资产相关性
-            
-            **缺点：**
-            - 收益可能较低
-            - 需要准确的协方差矩阵
-            - 对数据质量要求高
-            """,
-                "Momentum": """
-                ### 🚀 动量策略
-            
-            **工作原理：**
-            - 增持近期表现好的资产（上涨趋势）
-            - 减持近期表现差的资产（下跌趋势）
-            - 相信"趋势会延续"的假设
-            
-            **适用场景：**
-            - ✅ 相信趋势延续的投资者
-            - ✅ 愿意跟随市场趋势
-            - ✅ 追求超额收益
-            
-            **优点：**
-            - 可能捕捉到趋势，获得超额收益
-            - 顺应市场力量
-            - 在趋势市场中表现好
-            
-            **缺点：**
-            - 在震荡市场中可能表现差
-            - 可能追涨杀跌
-            - 需要设置合适的回看期
-            """,
-                "Mean Reversion": """
-                ### 🔁 均值回归策略
-            
-            **工作原理：**
-            - 当资产偏离目标权重时反向调整
-            - 相信价格会回归均值
-            - 低买高卖，反向操作
-            
-            **适用场景：**
-            - ✅ 相信均值回归的投资者
-            - ✅ 愿意逆势操作
-            - ✅ 追求低买高卖
-            
-            **优点：**
-            - 可能降低波动
-            - 低买高卖，成本优势
-            - 在震荡市场表现好
-            
-            **缺点：**
-            - 在趋势市场中可能表现差
-            - 需要设置合适的回归速度
-            - 可能过早买入/卖出
-                """,
-            }
-            if strategy_name_global in strategy_details:
-                st.markdown(strategy_details[strategy_name_global])
+            if strategy_name_global in STRATEGY_DETAILS:
+                st.markdown(STRATEGY_DETAILS[strategy_name_global])
             
             # 策略选择指南
             st.markdown("---")
@@ -1531,10 +2474,7 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
         # 优先使用上传的文件数据
         if "uploaded_file_data" in st.session_state and st.session_state["uploaded_file_data"] is not None:
             try:
-                market_data = InvestSimBridge.load_market_data(st.session_state["uploaded_file_data"])
-                returns = market_data.pct_change().dropna()
-                available_returns = returns.values.flatten()
-                available_returns = available_returns[~np.isnan(available_returns)]
+                available_returns = pooled_returns_cached(st.session_state["uploaded_file_data"].getvalue())
                 data_source = "上传文件"
             except:
                 pass
@@ -1548,10 +2488,9 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
             st.success(f"✅ 检测到数据：{len(available_returns):,} 个收益率样本（来源：{data_source}）")
             
             # 数据基本统计
-            mean_ret = np.mean(available_returns)
-            std_ret = np.std(available_returns)
-            skew_ret = float(pd.Series(available_returns).skew())
-            kurt_ret = float(pd.Series(available_returns).kurtosis())
+            moments = returns_moments(available_returns)
+            mean_ret, std_ret = moments["mean"], moments["std"]
+            skew_ret, kurt_ret = moments["skew"], moments["kurt"]
             
             st.markdown("#### 📈 数据特征分析")
             col_stat1, col_stat2, col_stat3, col_stat4 = st.columns(4)
@@ -1570,436 +2509,53 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
             # 定义所有可用的分布模型
             distribution_names = ["Normal", "Student-t", "Lognormal", "Gamma", "Beta", "Weibull", "Gumbel", "Laplace", "Cauchy", "Bootstrap"]
             
-            # 存储所有分布的拟合结果
-            fit_results = {}
-            
-            # 尝试拟合所有分布
-            try:
-                from scipy import stats as scipy_stats
-                scipy_available = True
-            except:
-                scipy_available = False
+            # 尝试拟合所有分布（结果按数据缓存）
+            scipy_available = scipy_stats is not None
+            if not scipy_available:
                 st.warning("⚠️ scipy未安装，部分分布拟合功能不可用")
+            fit_results, metrics_df, best_dist, pdf_x, pdfs = fit_all_distributions(available_returns)
+            scores = metrics_df["score"].dropna().to_dict()
+            best_score = scores.get(best_dist, 0)
+            if len(available_returns) > FIT_SUBSAMPLE_THRESHOLD:
+                st.caption(f"ℹ️ 样本量较大：分布参数与KS/AD检验基于 {FIT_SUBSAMPLE_SIZE:,} 个固定种子子样本拟合，对数似然/AIC/BIC基于全部 {len(available_returns):,} 个样本计算")
             
-            # 1. Normal分布
-            try:
-                normal_mean = mean_ret
-                normal_vol = std_ret
-                normal_params = {"mean": normal_mean, "vol": normal_vol}
-                
-                # 计算拟合优度指标
-                if scipy_available:
-                    ks_stat, ks_pvalue = scipy_stats.kstest(available_returns, lambda x: scipy_stats.norm.cdf(x, normal_mean, normal_vol))
-                    log_likelihood = np.sum(scipy_stats.norm.logpdf(available_returns, normal_mean, normal_vol))
-                    n_params = 2
-                    aic = 2 * n_params - 2 * log_likelihood
-                    bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
-                    
-                    # Anderson-Darling检验（需要标准化）
-                    standardized = (available_returns - normal_mean) / normal_vol
-                    ad_result = scipy_stats.anderson(standardized, dist='norm')
-                    ad_stat = ad_result.statistic
-                else:
-                    ks_stat, ks_pvalue, log_likelihood, aic, bic, ad_stat = None, None, None, None, None, None
-                
-                fit_results["Normal"] = {
-                    "params": normal_params,
-                    "ks_stat": ks_stat,
-                    "ks_pvalue": ks_pvalue,
-                    "log_likelihood": log_likelihood,
-                    "aic": aic,
-                    "bic": bic,
-                    "ad_stat": ad_stat,
-                    "success": True
-                }
-            except Exception as e:
-                fit_results["Normal"] = {"success": False, "error": str(e)}
+            # 显示拟合结果汇总表
+            st.markdown("#### 📊 拟合结果汇总")
             
-            # 2. Student-t分布
-            try:
-                if scipy_available:
-                    df_fitted, loc_fitted, scale_fitted = scipy_stats.t.fit(available_returns)
-                    t_params = {"df": float(df_fitted), "mean": float(loc_fitted), "scale": float(scale_fitted)}
-                    
-                    ks_stat, ks_pvalue = scipy_stats.kstest(available_returns, lambda x: scipy_stats.t.cdf(x, df_fitted, loc=loc_fitted, scale=scale_fitted))
-                    log_likelihood = np.sum(scipy_stats.t.logpdf(available_returns, df_fitted, loc=loc_fitted, scale=scale_fitted))
-                    n_params = 3
-                    aic = 2 * n_params - 2 * log_likelihood
-                    bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
-                    ad_stat = None  # Student-t没有标准的AD检验
-                    
-                    fit_results["Student-t"] = {
-                        "params": t_params,
-                        "ks_stat": ks_stat,
-                        "ks_pvalue": ks_pvalue,
-                        "log_likelihood": log_likelihood,
-                        "aic": aic,
-                        "bic": bic,
-                        "ad_stat": ad_stat,
-                        "success": True
-                    }
-                else:
-                    fit_results["Student-t"] = {"success": False, "error": "scipy不可用"}
-            except Exception as e:
-                fit_results["Student-t"] = {"success": False, "error": str(e)}
+            # 创建结果表格（直接由指标DataFrame生成，缺失值显示为N/A）
+            summary_src = metrics_df.reindex(distribution_names)
+            summary_df = pd.DataFrame({
+                "分布": summary_src.index,
+                "拟合状态": np.where(
+                    summary_src["success"].fillna(False).astype(bool),
+                    "✅ 成功",
+                    "❌ 失败 (" + summary_src["error"].fillna("未知错误").astype(str) + ")"
+                ),
+                "KS统计量": summary_src["ks_stat"],
+                "KS p值": summary_src["ks_pvalue"],
+                "AIC": summary_src["aic"],
+                "BIC": summary_src["bic"],
+                "对数似然": summary_src["log_likelihood"],
+                "AD统计量": summary_src["ad_stat"],
+                "综合评分": summary_src["score"],
+            })
+            st.dataframe(
+                summary_df.style.format({
+                    "KS统计量": "{:.6f}",
+                    "KS p值": "{:.6f}",
+                    "AIC": "{:.2f}",
+                    "BIC": "{:.2f}",
+                    "对数似然": "{:.2f}",
+                    "AD统计量": "{:.4f}",
+                    "综合评分": "{:.4f}",
+                }, na_rep="N/A"),
+                use_container_width=True,
+                hide_index=True
+            )
             
-            # 3. Lognormal分布（需要数据为正）
-            try:
-                if scipy_available and np.all(available_returns > -1):  # 收益率需要 > -100%
-                    shifted_returns = available_returns + 1  # 平移使数据为正
-                    s_fitted, loc_fitted, scale_fitted = scipy_stats.lognorm.fit(shifted_returns)
-                    lognormal_params = {"s": float(s_fitted), "loc": float(loc_fitted), "scale": float(scale_fitted), "shift": 1.0}
-                    
-                    ks_stat, ks_pvalue = scipy_stats.kstest(shifted_returns, lambda x: scipy_stats.lognorm.cdf(x, s_fitted, loc=loc_fitted, scale=scale_fitted))
-                    log_likelihood = np.sum(scipy_stats.lognorm.logpdf(shifted_returns, s_fitted, loc=loc_fitted, scale=scale_fitted))
-                    n_params = 3
-                    aic = 2 * n_params - 2 * log_likelihood
-                    bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
-                    ad_stat = None
-                    
-                    fit_results["Lognormal"] = {
-                        "params": lognormal_params,
-                        "ks_stat": ks_stat,
-                        "ks_pvalue": ks_pvalue,
-                        "log_likelihood": log_likelihood,
-                        "aic": aic,
-                        "bic": bic,
-                        "ad_stat": ad_stat,
-                        "success": True
-                    }
-                else:
-                    fit_results["Lognormal"] = {"success": False, "error": "数据不满足lognormal要求或scipy不可用"}
-            except Exception as e:
-                fit_results["Lognormal"] = {"success": False, "error": str(e)}
-            
-            # 4. Gamma分布（需要数据为正）
-            try:
-                if scipy_available and np.all(available_returns > -1):
-                    shifted_returns = available_returns + 1
-                    a_fitted, loc_fitted, scale_fitted = scipy_stats.gamma.fit(shifted_returns)
-                    gamma_params = {"a": float(a_fitted), "loc": float(loc_fitted), "scale": float(scale_fitted), "shift": 1.0}
-                    
-                    ks_stat, ks_pvalue = scipy_stats.kstest(shifted_returns, lambda x: scipy_stats.gamma.cdf(x, a_fitted, loc=loc_fitted, scale=scale_fitted))
-                    log_likelihood = np.sum(scipy_stats.gamma.logpdf(shifted_returns, a_fitted, loc=loc_fitted, scale=scale_fitted))
-                    n_params = 3
-                    aic = 2 * n_params - 2 * log_likelihood
-                    bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
-                    ad_stat = None
-                    
-                    fit_results["Gamma"] = {
-                        "params": gamma_params,
-                        "ks_stat": ks_stat,
-                        "ks_pvalue": ks_pvalue,
-                        "log_likelihood": log_likelihood,
-                        "aic": aic,
-                        "bic": bic,
-                        "ad_stat": ad_stat,
-                        "success": True
-                    }
-                else:
-                    fit_results["Gamma"] = {"success": False, "error": "数据不满足gamma要求或scipy不可用"}
-            except Exception as e:
-                fit_results["Gamma"] = {"success": False, "error": str(e)}
-            
-            # 5. Beta分布（需要数据在[0,1]范围内）
-            try:
-                if scipy_available:
-                    # 将数据标准化到[0,1]
-                    min_val, max_val = available_returns.min(), available_returns.max()
-                    if max_val > min_val:
-                        normalized = (available_returns - min_val) / (max_val - min_val)
-                        a_fitted, b_fitted, loc_fitted, scale_fitted = scipy_stats.beta.fit(normalized)
-                        beta_params = {"a": float(a_fitted), "b": float(b_fitted), "loc": float(loc_fitted), "scale": float(scale_fitted), "min": float(min_val), "max": float(max_val)}
-                        
-                        ks_stat, ks_pvalue = scipy_stats.kstest(normalized, lambda x: scipy_stats.beta.cdf(x, a_fitted, b_fitted, loc=loc_fitted, scale=scale_fitted))
-                        log_likelihood = np.sum(scipy_stats.beta.logpdf(normalized, a_fitted, b_fitted, loc=loc_fitted, scale=scale_fitted))
-                        n_params = 4
-                        aic = 2 * n_params - 2 * log_likelihood
-                        bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
-                        ad_stat = None
-                        
-                        fit_results["Beta"] = {
-                            "params": beta_params,
-                            "ks_stat": ks_stat,
-                            "ks_pvalue": ks_pvalue,
-                            "log_likelihood": log_likelihood,
-                            "aic": aic,
-                            "bic": bic,
-                            "ad_stat": ad_stat,
-                            "success": True
-                        }
-                    else:
-                        fit_results["Beta"] = {"success": False, "error": "数据范围无效"}
-                else:
-                    fit_results["Beta"] = {"success": False, "error": "scipy不可用"}
-            except Exception as e:
-                fit_results["Beta"] = {"success": False, "error": str(e)}
-            
-            # 6. Weibull分布（需要数据为正）
-            try:
-                if scipy_available and np.all(available_returns > -1):
-                    shifted_returns = available_returns + 1
-                    c_fitted, loc_fitted, scale_fitted = scipy_stats.weibull_min.fit(shifted_returns)
-                    weibull_params = {"c": float(c_fitted), "loc": float(loc_fitted), "scale": float(scale_fitted), "shift": 1.0}
-                    
-                    ks_stat, ks_pvalue = scipy_stats.kstest(shifted_returns, lambda x: scipy_stats.weibull_min.cdf(x, c_fitted, loc=loc_fitted, scale=scale_fitted))
-                    log_likelihood = np.sum(scipy_stats.weibull_min.logpdf(shifted_returns, c_fitted, loc=loc_fitted, scale=scale_fitted))
-                    n_params = 3
-                    aic = 2 * n_params - 2 * log_likelihood
-                    bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
-                    ad_stat = None
-                    
-                    fit_results["Weibull"] = {
-                        "params": weibull_params,
-                        "ks_stat": ks_stat,
-                        "ks_pvalue": ks_pvalue,
-                        "log_likelihood": log_likelihood,
-                        "aic": aic,
-                        "bic": bic,
-                        "ad_stat": ad_stat,
-                        "success": True
-                    }
-                else:
-                    fit_results["Weibull"] = {"success": False, "error": "数据不满足weibull要求或scipy不可用"}
-            except Exception as e:
-                fit_results["Weibull"] = {"success": False, "error": str(e)}
-            
-            # 7. Gumbel分布
-            try:
-                if scipy_available:
-                    loc_fitted, scale_fitted = scipy_stats.gumbel_l.fit(available_returns)
-                    gumbel_params = {"loc": float(loc_fitted), "scale": float(scale_fitted)}
-                    
-                    ks_stat, ks_pvalue = scipy_stats.kstest(available_returns, lambda x: scipy_stats.gumbel_l.cdf(x, loc=loc_fitted, scale=scale_fitted))
-                    log_likelihood = np.sum(scipy_stats.gumbel_l.logpdf(available_returns, loc=loc_fitted, scale=scale_fitted))
-                    n_params = 2
-                    aic = 2 * n_params - 2 * log_likelihood
-                    bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
-                    ad_stat = None
-                    
-                    fit_results["Gumbel"] = {
-                        "params": gumbel_params,
-                        "ks_stat": ks_stat,
-                        "ks_pvalue": ks_pvalue,
-                        "log_likelihood": log_likelihood,
-                        "aic": aic,
-                        "bic": bic,
-                        "ad_stat": ad_stat,
-                        "success": True
-                    }
-                else:
-                    fit_results["Gumbel"] = {"success": False, "error": "scipy不可用"}
-            except Exception as e:
-                fit_results["Gumbel"] = {"success": False, "error": str(e)}
-            
-            # 8. Laplace分布
-            try:
-                if scipy_available:
-                    loc_fitted, scale_fitted = scipy_stats.laplace.fit(available_returns)
-                    laplace_params = {"loc": float(loc_fitted), "scale": float(scale_fitted)}
-                    
-                    ks_stat, ks_pvalue = scipy_stats.kstest(available_returns, lambda x: scipy_stats.laplace.cdf(x, loc=loc_fitted, scale=scale_fitted))
-                    log_likelihood = np.sum(scipy_stats.laplace.logpdf(available_returns, loc=loc_fitted, scale=scale_fitted))
-                    n_params = 2
-                    aic = 2 * n_params - 2 * log_likelihood
-                    bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
-                    ad_stat = None
-                    
-                    fit_results["Laplace"] = {
-                        "params": laplace_params,
-                        "ks_stat": ks_stat,
-                        "ks_pvalue": ks_pvalue,
-                        "log_likelihood": log_likelihood,
-                        "aic": aic,
-                        "bic": bic,
-                        "ad_stat": ad_stat,
-                        "success": True
-                    }
-                else:
-                    fit_results["Laplace"] = {"success": False, "error": "scipy不可用"}
-            except Exception as e:
-                fit_results["Laplace"] = {"success": False, "error": str(e)}
-            
-            # 9. Cauchy分布
-            try:
-                if scipy_available:
-                    loc_fitted, scale_fitted = scipy_stats.cauchy.fit(available_returns)
-                    cauchy_params = {"loc": float(loc_fitted), "scale": float(scale_fitted)}
-                    
-                    ks_stat, ks_pvalue = scipy_stats.kstest(available_returns, lambda x: scipy_stats.cauchy.cdf(x, loc=loc_fitted, scale=scale_fitted))
-                    log_likelihood = np.sum(scipy_stats.cauchy.logpdf(available_returns, loc=loc_fitted, scale=scale_fitted))
-                    n_params = 2
-                    aic = 2 * n_params - 2 * log_likelihood
-                    bic = n_params * np.log(len(available_returns)) - 2 * log_likelihood
-                    ad_stat = None
-                    
-                    fit_results["Cauchy"] = {
-                        "params": cauchy_params,
-                        "ks_stat": ks_stat,
-                        "ks_pvalue": ks_pvalue,
-                        "log_likelihood": log_likelihood,
-                        "aic": aic,
-                        "bic": bic,
-                        "ad_stat": ad_stat,
-                        "success": True
-                    }
-                else:
-                    fit_results["Cauchy"] = {"success": False, "error": "scipy不可用"}
-            except Exception as e:
-                fit_results["Cauchy"] = {"success": False, "error": str(e)}
-            
-            # 10. Bootstrap（经验分布，直接使用数据）
-            try:
-                # Bootstrap是经验分布，直接使用历史数据
-                # 计算经验分布函数（ECDF）
-                sorted_returns = np.sort(available_returns)
-                n_samples = len(available_returns)
-                
-                # KS统计量：经验分布与自身的KS统计量应该为0（完美拟合）
-                # 但我们可以计算经验分布与标准正态分布的KS统计量作为参考
-                if scipy_available:
-                    # 计算经验分布与标准正态分布的KS统计量（作为参考）
-                    # 注意：这不是真正的拟合，只是作为比较
-                    empirical_mean = np.mean(available_returns)
-                    empirical_std = np.std(available_returns)
-                    ks_stat_ref, ks_pvalue_ref = scipy_stats.kstest(
-                        available_returns, 
-                        lambda x: scipy_stats.norm.cdf(x, empirical_mean, empirical_std)
-                    )
-                    
-                    # 对于Bootstrap，经验分布与自身的KS统计量应该为0
-                    # 但我们可以使用经验分布的概率密度来计算对数似然
-                    # 使用核密度估计（KDE）来计算对数似然
-                    from scipy.stats import gaussian_kde
-                    try:
-                        kde = gaussian_kde(available_returns)
-                        log_likelihood = np.sum(kde.logpdf(available_returns))
-                    except:
-                        # 如果KDE失败，使用经验分布的概率密度估计
-                        # 对于经验分布，每个观测值的概率密度为 1/(n * bandwidth)
-                        # 这里使用一个简化的估计
-                        bandwidth = np.std(available_returns) * (4 / (3 * n_samples)) ** (1/5)  # Silverman's rule
-                        log_likelihood = -n_samples * np.log(n_samples * bandwidth) - 0.5 * np.sum((available_returns - empirical_mean) ** 2) / (2 * bandwidth ** 2)
-                    
-                    # AIC和BIC：对于Bootstrap，参数数量可以认为是数据点数（或使用一个较小的值）
-                    # 但通常Bootstrap的参数数量被认为是0（无参数模型）或数据点数
-                    # 这里我们使用一个折中方案：参数数量 = log(n)（表示数据复杂度）
-                    n_params_bootstrap = np.log(n_samples) if n_samples > 1 else 1
-                    aic = 2 * n_params_bootstrap - 2 * log_likelihood
-                    bic = n_params_bootstrap * np.log(n_samples) - 2 * log_likelihood
-                    
-                    # Bootstrap的KS统计量设为0（完美拟合自身）
-                    ks_stat = 0.0
-                    ks_pvalue = 1.0  # 完美拟合，p值为1
-                    ad_stat = None  # Anderson-Darling不适用于经验分布
-                else:
-                    ks_stat, ks_pvalue, log_likelihood, aic, bic, ad_stat = None, None, None, None, None, None
-                
-                fit_results["Bootstrap"] = {
-                    "params": {
-                        "samples": n_samples,
-                        "mean": float(empirical_mean),
-                        "std": float(empirical_std),
-                        "min": float(np.min(available_returns)),
-                        "max": float(np.max(available_returns))
-                    },
-                    "ks_stat": ks_stat,
-                    "ks_pvalue": ks_pvalue,
-                    "log_likelihood": log_likelihood,
-                    "aic": aic,
-                    "bic": bic,
-                    "ad_stat": ad_stat,
-                    "success": True
-                }
-            except Exception as e:
-                fit_results["Bootstrap"] = {"success": False, "error": str(e)}
-            
-            # 计算综合评分（基于多个指标）
-            scores = {}
-            for dist_name, result in fit_results.items():
-                if result.get("success", False) and dist_name != "Bootstrap":
-                    score = 0
-                    # KS p值越高越好（最大1分）
-                    if result.get("ks_pvalue") is not None:
-                        score += result["ks_pvalue"] * 0.3
-                    # AIC越低越好（归一化后最大1分）
-                    if result.get("aic") is not None:
-                        aic_values = [r.get("aic") for r in fit_results.values() if r.get("success") and r.get("aic") is not None]
-                        if len(aic_values) > 0:
-                            min_aic, max_aic = min(aic_values), max(aic_values)
-                            if max_aic > min_aic:
-                                score += (1 - (result["aic"] - min_aic) / (max_aic - min_aic)) * 0.3
-                            else:
-                                score += 0.3
-                    # BIC越低越好（归一化后最大1分）
-                    if result.get("bic") is not None:
-                        bic_values = [r.get("bic") for r in fit_results.values() if r.get("success") and r.get("bic") is not None]
-                        if len(bic_values) > 0:
-                            min_bic, max_bic = min(bic_values), max(bic_values)
-                            if max_bic > min_bic:
-                                score += (1 - (result["bic"] - min_bic) / (max_bic - min_bic)) * 0.2
-                            else:
-                                score += 0.2
-                    # 对数似然越高越好（归一化后最大0.2分）
-                    if result.get("log_likelihood") is not None:
-                        ll_values = [r.get("log_likelihood") for r in fit_results.values() if r.get("success") and r.get("log_likelihood") is not None]
-                        if len(ll_values) > 0:
-                            min_ll, max_ll = min(ll_values), max(ll_values)
-                            if max_ll > min_ll:
-                                score += ((result["log_likelihood"] - min_ll) / (max_ll - min_ll)) * 0.2
-                            else:
-                                score += 0.2
-                    scores[dist_name] = score
-                elif dist_name == "Bootstrap":
-                    # Bootstrap的特殊评分（基于数据量）
-                    scores[dist_name] = min(1.0, len(available_returns) / 1000) * 0.5  # 数据量越多越好
-            
-            # 找出最佳拟合分布
-            if scores:
-                best_dist = max(scores, key=scores.get)
-                best_score = scores[best_dist]
-            else:
-                best_dist = "Normal"
-                best_score = 0
-            
-            # 显示拟合结果汇总表
-            st.markdown("#### 📊 拟合结果汇总")
-            
-            # 创建结果表格
-            summary_data = []
-            for dist_name in distribution_names:
-                result = fit_results.get(dist_name, {})
-                if result.get("success", False):
-                    row = {
-                        "分布": dist_name,
-                        "拟合状态": "✅ 成功",
-                        "KS统计量": f"{result.get('ks_stat', 'N/A'):.6f}" if result.get('ks_stat') is not None else "N/A",
-                        "KS p值": f"{result.get('ks_pvalue', 'N/A'):.6f}" if result.get('ks_pvalue') is not None else "N/A",
-                        "AIC": f"{result.get('aic', 'N/A'):.2f}" if result.get('aic') is not None else "N/A",
-                        "BIC": f"{result.get('bic', 'N/A'):.2f}" if result.get('bic') is not None else "N/A",
-                        "对数似然": f"{result.get('log_likelihood', 'N/A'):.2f}" if result.get('log_likelihood') is not None else "N/A",
-                        "综合评分": f"{scores.get(dist_name, 0):.4f}" if dist_name in scores else "N/A"
-                    }
-                    summary_data.append(row)
-                else:
-                    row = {
-                        "分布": dist_name,
-                        "拟合状态": f"❌ 失败 ({result.get('error', '未知错误')})",
-                        "KS统计量": "N/A",
-                        "KS p值": "N/A",
-                        "AIC": "N/A",
-                        "BIC": "N/A",
-                        "对数似然": "N/A",
-                        "综合评分": "N/A"
-                    }
-                    summary_data.append(row)
-            
-            summary_df = pd.DataFrame(summary_data)
-            st.dataframe(summary_df, use_container_width=True, hide_index=True)
-            
-            # 显示最佳拟合分布
-            st.success(f"🏆 **最佳拟合分布**：**{best_dist}** (综合评分: {best_score:.4f})")
-            st.caption("💡 综合评分综合考虑了KS检验p值、AIC、BIC和对数似然值。评分越高，拟合效果越好。")
+            # 显示最佳拟合分布
+            st.success(f"🏆 **最佳拟合分布**：**{best_dist}** (综合评分: {best_score:.4f})")
+            st.caption("💡 综合评分综合考虑了KS检验p值、AIC、BIC、对数似然值和Anderson-Darling统计量。评分越高，拟合效果越好。")
             
             # 分布切换和可视化
             st.markdown("#### 🔄 分布切换与可视化")
@@ -2044,135 +2600,27 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
                         st.text(f"  • BIC: {result['bic']:.2f}")
                     if result.get("log_likelihood") is not None:
                         st.text(f"  • 对数似然: {result['log_likelihood']:.2f}")
+                    if result.get("ad_stat") is not None:
+                        st.text(f"  • AD统计量: {result['ad_stat']:.4f}")
                     if selected_dist in scores:
                         st.text(f"  • 综合评分: {scores[selected_dist]:.4f}")
                 
-                # 可视化
-                x = np.linspace(available_returns.min(), available_returns.max(), 200)
+                # 可视化：直方图底图与各分布PDF均已缓存，切换分布时只追加一条拟合曲线
+                x = pdf_x
+                dx = x[1] - x[0]
+                pdf_scale = len(available_returns) * dx  # 概率密度 → 直方图频数的换算系数
                 
-                fig_dist = go.Figure()
-                fig_dist.add_trace(go.Histogram(
-                    x=available_returns,
-                    name="实际数据",
-                    opacity=0.5,
-                    nbinsx=50,
-                    marker_color=COLORS["blue"]
-                ))
+                fig_dist = build_returns_histogram(available_returns)
                 
-                # 根据选中的分布绘制拟合曲线
-                if selected_dist == "Normal":
-                    normal_y = (1 / (params["vol"] * np.sqrt(2 * np.pi))) * np.exp(-0.5 * ((x - params["mean"]) / params["vol"]) ** 2)
+                # 根据选中的分布绘制拟合曲线（Bootstrap不需要绘制拟合曲线，只显示直方图）
+                fit_y = pdfs.get(selected_dist)
+                if fit_y is not None:
                     fig_dist.add_trace(go.Scatter(
                         x=x,
-                        y=normal_y * len(available_returns) * (x[1] - x[0]),
+                        y=fit_y * pdf_scale,
                         name=f"{selected_dist}拟合",
-                        line=dict(color=COLORS["gold"], width=2)
+                        line=dict(color=COLORS["gold"] if selected_dist == "Normal" else COLORS["green"], width=2)
                     ))
-                elif selected_dist == "Student-t" and scipy_available:
-                    try:
-                        from scipy import stats as scipy_stats
-                        t_y = scipy_stats.t.pdf(x, params["df"], loc=params["mean"], scale=params["scale"])
-                        fig_dist.add_trace(go.Scatter(
-                            x=x,
-                            y=t_y * len(available_returns) * (x[1] - x[0]),
-                            name=f"{selected_dist}拟合",
-                            line=dict(color=COLORS["green"], width=2)
-                        ))
-                    except:
-                        pass
-                elif selected_dist == "Lognormal" and scipy_available:
-                    try:
-                        from scipy import stats as scipy_stats
-                        shifted_x = x + params.get("shift", 1.0)
-                        lognormal_y = scipy_stats.lognorm.pdf(shifted_x, params["s"], loc=params["loc"], scale=params["scale"])
-                        fig_dist.add_trace(go.Scatter(
-                            x=x,
-                            y=lognormal_y * len(available_returns) * (x[1] - x[0]),
-                            name=f"{selected_dist}拟合",
-                            line=dict(color=COLORS["green"], width=2)
-                        ))
-                    except:
-                        pass
-                elif selected_dist == "Gamma" and scipy_available:
-                    try:
-                        from scipy import stats as scipy_stats
-                        shifted_x = x + params.get("shift", 1.0)
-                        gamma_y = scipy_stats.gamma.pdf(shifted_x, params["a"], loc=params["loc"], scale=params["scale"])
-                        fig_dist.add_trace(go.Scatter(
-                            x=x,
-                            y=gamma_y * len(available_returns) * (x[1] - x[0]),
-                            name=f"{selected_dist}拟合",
-                            line=dict(color=COLORS["green"], width=2)
-                        ))
-                    except:
-                        pass
-                elif selected_dist == "Beta" and scipy_available:
-                    try:
-                        from scipy import stats as scipy_stats
-                        normalized_x = (x - params["min"]) / (params["max"] - params["min"])
-                        beta_y = scipy_stats.beta.pdf(normalized_x, params["a"], params["b"], loc=params["loc"], scale=params["scale"])
-                        # 转换回原始尺度
-                        beta_y = beta_y / (params["max"] - params["min"])
-                        fig_dist.add_trace(go.Scatter(
-                            x=x,
-                            y=beta_y * len(available_returns) * (x[1] - x[0]),
-                            name=f"{selected_dist}拟合",
-                            line=dict(color=COLORS["green"], width=2)
-                        ))
-                    except:
-                        pass
-                elif selected_dist == "Weibull" and scipy_available:
-                    try:
-                        from scipy import stats as scipy_stats
-                        shifted_x = x + params.get("shift", 1.0)
-                        weibull_y = scipy_stats.weibull_min.pdf(shifted_x, params["c"], loc=params["loc"], scale=params["scale"])
-                        fig_dist.add_trace(go.Scatter(
-                            x=x,
-                            y=weibull_y * len(available_returns) * (x[1] - x[0]),
-                            name=f"{selected_dist}拟合",
-                            line=dict(color=COLORS["green"], width=2)
-                        ))
-                    except:
-                        pass
-                elif selected_dist == "Gumbel" and scipy_available:
-                    try:
-                        from scipy import stats as scipy_stats
-                        gumbel_y = scipy_stats.gumbel_l.pdf(x, loc=params["loc"], scale=params["scale"])
-                        fig_dist.add_trace(go.Scatter(
-                            x=x,
-                            y=gumbel_y * len(available_returns) * (x[1] - x[0]),
-                            name=f"{selected_dist}拟合",
-                            line=dict(color=COLORS["green"], width=2)
-                        ))
-                    except:
-                        pass
-                elif selected_dist == "Laplace" and scipy_available:
-                    try:
-                        from scipy import stats as scipy_stats
-                        laplace_y = scipy_stats.laplace.pdf(x, loc=params["loc"], scale=params["scale"])
-                        fig_dist.add_trace(go.Scatter(
-                            x=x,
-                            y=laplace_y * len(available_returns) * (x[1] - x[0]),
-                            name=f"{selected_dist}拟合",
-                            line=dict(color=COLORS["green"], width=2)
-                        ))
-                    except:
-                        pass
-                elif selected_dist == "Cauchy" and scipy_available:
-                    try:
-                        from scipy import stats as scipy_stats
-                        cauchy_y = scipy_stats.cauchy.pdf(x, loc=params["loc"], scale=params["scale"])
-                        fig_dist.add_trace(go.Scatter(
-                            x=x,
-                            y=cauchy_y * len(available_returns) * (x[1] - x[0]),
-                            name=f"{selected_dist}拟合",
-                            line=dict(color=COLORS["green"], width=2)
-                        ))
-                    except:
-                        pass
-                elif selected_dist == "Bootstrap":
-                    # Bootstrap不需要绘制拟合曲线，只显示直方图
-                    pass
                 
                 fig_dist.update_layout(
                     title=f"{selected_dist} 分布拟合效果",
@@ -2205,7 +2653,7 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
                     st.session_state["fitted_student_t_params"] = selected_result["params"]
                     st.caption(f"✅ Student-t参数已保存：自由度={selected_result['params']['df']:.2f}, 均值={selected_result['params']['mean']:.6f}, 尺度={selected_result['params']['scale']:.6f}")
                 elif input_model_type == "Bootstrap":
-                    st.session_state["bootstrap_returns"] = available_returns
+                    st.session_state["bootstrap_returns"] = as_return_samples(available_returns)
                     st.caption(f"✅ Bootstrap：已保存 {len(available_returns):,} 个历史收益率样本")
                 else:
                     # 保存其他分布的参数（如果将来需要支持）
@@ -2251,7 +2699,7 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
                                 elif input_model_type == "Student-t":
                                     st.session_state["fitted_student_t_params"] = selected_result["params"]
                                 elif input_model_type == "Bootstrap":
-                                    st.session_state["bootstrap_returns"] = available_returns
+                                    st.session_state["bootstrap_returns"] = as_return_samples(available_returns)
                                 else:
                                     # 保存其他分布的参数
                                     st.session_state[f"fitted_{input_model_type.lower().replace('-', '_')}_params"] = selected_result["params"]
@@ -2263,7 +2711,7 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
                             elif input_model_type == "Student-t" and "fitted_student_t_params" not in st.session_state:
                                 st.session_state["fitted_student_t_params"] = {"mean": 0.0, "df": 5.0, "scale": float(np.std(available_returns))}
                             elif input_model_type == "Bootstrap" and "bootstrap_returns" not in st.session_state:
-                                st.session_state["bootstrap_returns"] = available_returns
+                                st.session_state["bootstrap_returns"] = as_return_samples(available_returns)
                     except:
                         # 如果出错，至少保存基本参数
                         if input_model_type == "Normal":
@@ -2271,7 +2719,7 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
                                 st.session_state["fitted_normal_params"] = {"mean": float(np.mean(available_returns)), "vol": float(np.std(available_returns))}
                         elif input_model_type == "Bootstrap":
                             if "bootstrap_returns" not in st.session_state:
-                                st.session_state["bootstrap_returns"] = available_returns
+                                st.session_state["bootstrap_returns"] = as_return_samples(available_returns)
                 
                 st.session_state["show_input_modeling_dialog"] = False
                 st.success(f"✅ 输入建模配置已保存！已选择 {input_model_type} 分布。")
@@ -2298,74 +2746,207 @@ st.sidebar.markdown("---")
 # ==========================================
 # 新功能区域
 # ==========================================
-if mode != "DERIVATIVES LAB (Options / Margin)":
-    # 策略对比功能
-    with st.sidebar.expander("🔀 策略对比", expanded=False):
-        st.markdown("**同时对比多个策略的表现**")
-        
-        if st.button("➕ 添加当前策略到对比", use_container_width=True):
-            if 'bt_result' in st.session_state:
-                comparison_entry = {
-                    "strategy": strategy_name_global,
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "metrics": {
-                        "total_return": st.session_state.get("bt_metrics", {}).get("total_return", 0),
-                        "sharpe": st.session_state.get("bt_metrics", {}).get("sharpe", 0),
-                        "max_drawdown": st.session_state.get("bt_metrics", {}).get("max_drawdown", 0),
-                        "volatility": st.session_state.get("bt_metrics", {}).get("volatility", 0),
-                    },
-                    "params": {
-                        "initial_capital": initial_capital,
-                        "leverage": leverage,
-                        "risk_free": risk_free,
-                    }
-                }
-                st.session_state["strategy_comparison"].append(comparison_entry)
-                st.success(f"✅ 已添加 {strategy_name_global} 到对比列表")
+
+@dataclass(frozen=True, slots=True)
+class ComparisonEntry:
+    """策略对比列表中的一条记录（固定字段，避免每次添加时构建嵌套字典）"""
+    strategy: str
+    timestamp: str
+    total_return: float
+    sharpe: float
+    max_drawdown: float
+    volatility: float
+    initial_capital: float
+    leverage: float
+    risk_free: float
+    # 稳定标识：删除时按 id 定位，不依赖列表位置
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+@dataclass(frozen=True, slots=True)
+class BtMetrics:
+    """最近一次回测的核心指标（固定字段，按属性读取）"""
+    total_return: float = 0.0
+    sharpe: float = 0.0
+    max_drawdown: float = 0.0
+    volatility: float = 0.0
+
+    @classmethod
+    def from_metrics(cls, metrics: dict) -> "BtMetrics":
+        """从桥接层返回的指标字典构建（回撤字段在桥接层中名为 max_dd）"""
+        return cls(
+            total_return=metrics.get("total_return", 0.0),
+            sharpe=metrics.get("sharpe", 0.0),
+            max_drawdown=metrics.get("max_dd", 0.0),
+            volatility=metrics.get("volatility", 0.0),
+        )
+
+# 尚未回测时的空指标占位（不可变，可在会话间共享）
+_EMPTY_METRICS = BtMetrics()
+
+def comparison_table(comparison) -> pd.DataFrame:
+    """对比列表表格，按 _cmp_version 缓存在会话中，列表未变化时不重新生成"""
+    version = st.session_state["_cmp_version"]
+    cached = st.session_state.get("_cmp_table")
+    if cached is None or cached[0] != version:
+        cached = (version, pd.DataFrame({
+            "#": range(1, len(comparison) + 1),
+            "策略": [entry.strategy for entry in comparison],
+            "时间": [entry.timestamp for entry in comparison],
+        }))
+        st.session_state["_cmp_table"] = cached
+    return cached[1]
+
+def _remove_comparison_entry(entry_id: str):
+    comparison = st.session_state["strategy_comparison"]
+    for i, entry in enumerate(comparison):
+        if entry.id == entry_id:
+            del comparison[i]
+            st.session_state["_cmp_version"] += 1
+            break
+    # 主界面正在展示对比结果时需要整页刷新
+    if st.session_state.get("show_comparison", False):
+        st.session_state["_comparison_needs_app_rerun"] = True
+
+def _remove_selected_comparison(table_key: str):
+    rows = st.session_state[table_key].selection.rows
+    if rows:
+        _remove_comparison_entry(st.session_state["strategy_comparison"][rows[0]].id)
+
+def _clear_comparison():
+    st.session_state["strategy_comparison"].clear()
+    st.session_state["_cmp_version"] += 1
+    if st.session_state.get("show_comparison", False):
+        st.session_state["_comparison_needs_app_rerun"] = True
+
+# 历史记录展开区的正文模板（一次 markdown 调用输出三行）
+_HIST_ROW_TMPL = "**策略：** {strategy}\n\n**总收益：** {total_return:.2%}\n\n**Sharpe比率：** {sharpe:.2f}"
+
+def append_backtest_history(strategy: str, metrics: BtMetrics) -> bool:
+    """写入一条回测历史，返回是否覆盖了最早的记录"""
+    count = st.session_state["backtest_history_count"]
+    st.session_state["backtest_history"][count % MAX_HISTORY] = (
+        np.datetime64(datetime.now(), "s"),
+        strategy,
+        metrics.total_return,
+        metrics.sharpe,
+        metrics.max_drawdown,
+        metrics.volatility,
+    )
+    st.session_state["backtest_history_count"] = count + 1
+    return count >= MAX_HISTORY
+
+def _view_history_record(index: int):
+    st.session_state["load_history_index"] = index
+
+def render_comparison_rows():
+    """对比列表（单个表格，选中行后删除；删除在回调中完成，渲染时列表已是最新状态）"""
+    comparison = st.session_state["strategy_comparison"]
+    # key 带上版本号：列表变化后选中状态随之重置，不会指向错位的行
+    table_key = f"comparison_table_{st.session_state['_cmp_version']}"
+    event = st.dataframe(
+        comparison_table(comparison),
+        hide_index=True,
+        use_container_width=True,
+        selection_mode="single-row",
+        on_select="rerun",
+        key=table_key,
+    )
+    st.button(
+        "🗑️ 删除选中",
+        use_container_width=True,
+        disabled=not event.selection.rows,
+        on_click=_remove_selected_comparison,
+        args=(table_key,),
+    )
+
+# 侧边栏交互面板均为片段（fragment）：面板内的点击/输入只重跑该片段，不会触发回测主视图重算
+@st.fragment
+def render_strategy_comparison_panel(strategy_name: str, initial_capital: float, leverage: float, risk_free: float):
+    """策略对比面板"""
+    if st.session_state.pop("_comparison_needs_app_rerun", False):
+        st.rerun()
+    
+    st.markdown("**同时对比多个策略的表现**")
+    # 删除/清空均为原地修改，绑定一次即可
+    comparison = st.session_state["strategy_comparison"]
+    
+    if st.button("➕ 添加当前策略到对比", use_container_width=True):
+        if 'bt_result' in st.session_state:
+            bt_metrics = st.session_state.get("bt_metrics") or _EMPTY_METRICS
+            comparison_entry = ComparisonEntry(
+                strategy=strategy_name,
+                timestamp=time.strftime("%Y-%m-%d %H:%M:%S"),
+                total_return=bt_metrics.total_return,
+                sharpe=bt_metrics.sharpe,
+                max_drawdown=bt_metrics.max_drawdown,
+                volatility=bt_metrics.volatility,
+                initial_capital=initial_capital,
+                leverage=leverage,
+                risk_free=risk_free,
+            )
+            if len(comparison) >= MAX_COMPARISON:
+                st.toast(f"对比列表已满（{MAX_COMPARISON} 条），已移除最早的记录")
+            comparison.append(comparison_entry)
+            st.session_state["_cmp_version"] += 1
+            if st.session_state.get("show_comparison", False):
+                # 主界面正在展示对比结果，整页刷新让新条目出现在图表中
                 st.rerun()
-        
+            st.success(f"✅ 已添加 {strategy_name} 到对比列表")
+    
+    render_comparison_list(st.empty())
+
+def render_comparison_list(slot):
+    """把对比列表区域整体写入占位符，列表由有变空（或反之）时原位替换整个子树"""
+    with slot.container():
         if len(st.session_state["strategy_comparison"]) > 0:
             st.markdown("**对比列表：**")
-            for i, entry in enumerate(st.session_state["strategy_comparison"]):
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.caption(f"{i+1}. {entry['strategy']}")
-                with col2:
-                    if st.button("🗑️", key=f"remove_{i}", help="删除"):
-                        st.session_state["strategy_comparison"].pop(i)
-                        st.rerun()
+            render_comparison_rows()
             
             if st.button("📊 查看对比结果", use_container_width=True, type="primary"):
                 st.session_state["show_comparison"] = True
+                # 对比结果显示在主界面，需要整页刷新
                 st.rerun()
             
-            if st.button("🗑️ 清空对比列表", use_container_width=True):
-                st.session_state["strategy_comparison"] = []
-                st.rerun()
+            st.button("🗑️ 清空对比列表", use_container_width=True, on_click=_clear_comparison)
         else:
             st.info("💡 运行回测后，点击「添加当前策略到对比」来开始对比")
+
+@st.fragment
+def render_backtest_history_panel():
+    """回测历史面板"""
+    st.markdown("**查看历史回测结果**")
     
-    # 回测历史记录
-    with st.sidebar.expander("📚 回测历史", expanded=False):
-        st.markdown("**查看历史回测结果**")
-        
-        if len(st.session_state["backtest_history"]) > 0:
-            st.markdown(f"**共 {len(st.session_state['backtest_history'])} 条记录**")
-            for i, record in enumerate(reversed(st.session_state["backtest_history"][-10:])):  # 只显示最近10条
-                with st.expander(f"📅 {record['timestamp']} - {record['strategy']}", expanded=False):
-                    st.markdown(f"**策略：** {record['strategy']}")
-                    st.markdown(f"**总收益：** {record['metrics'].get('total_return', 0):.2%}")
-                    st.markdown(f"**Sharpe比率：** {record['metrics'].get('sharpe', 0):.2f}")
-                    if st.button("📊 查看详情", key=f"view_history_{i}"):
-                        st.session_state["load_history_index"] = len(st.session_state["backtest_history"]) - 1 - i
-                        st.rerun()
-        else:
-            st.info("💡 运行回测后，结果会自动保存到历史记录")
+    history = st.session_state["backtest_history"]
+    count = st.session_state["backtest_history_count"]
+    if count > 0:
+        st.markdown(f"**共 {min(count, MAX_HISTORY)} 条记录**")
+        # 从最新写入的槽位倒序取最近10条
+        for i in range(min(count, MAX_HISTORY, 10)):
+            slot = (count - 1 - i) % MAX_HISTORY
+            record = history[slot]
+            timestamp = np.datetime_as_string(record["ts"]).replace("T", " ")
+            with st.expander(f"📅 {timestamp} - {record['strategy']}", expanded=False):
+                st.markdown(_HIST_ROW_TMPL.format(
+                    strategy=record["strategy"],
+                    total_return=record["total_return"],
+                    sharpe=record["sharpe"],
+                ))
+                st.button(
+                    "📊 查看详情",
+                    key=f"view_history_{i}",
+                    on_click=_view_history_record,
+                    args=(slot,)
+                )
+    else:
+        st.info("💡 运行回测后，结果会自动保存到历史记录")
+
+@st.fragment
+def render_transaction_cost_panel():
+    """交易成本设置面板"""
+    st.markdown("**配置实际交易成本**")
     
-    # 交易成本设置
-    with st.sidebar.expander("💰 交易成本设置", expanded=False):
-        st.markdown("**配置实际交易成本**")
-        
+    # 两个输入放在同一表单中，提交时只触发一次重跑
+    with st.form("cost_form", clear_on_submit=False, border=False):
         transaction_cost = st.number_input(
             "交易费用率 (%)", 
             min_value=0.0, 
@@ -2374,7 +2955,6 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
             step=0.01,
             help="每次交易的费用率，例如0.1%输入0.1"
         )
-        st.session_state["transaction_cost_rate"] = transaction_cost / 100
         
         slippage = st.number_input(
             "滑点率 (%)", 
@@ -2384,60 +2964,53 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
             step=0.01,
             help="交易滑点率，例如0.05%输入0.05"
         )
-        st.session_state["slippage_rate"] = slippage / 100
-        
-        st.caption(f"💡 总成本：{(transaction_cost + slippage):.2f}%")
         
-        if st.button("💾 保存成本设置", use_container_width=True):
-            st.success("✅ 交易成本设置已保存")
-
-st.sidebar.markdown("---")
-st.sidebar.caption(f"System Status: ONLINE\nBackend: v2.4.0 (Bridge)")
-
-# 帮助说明
-with st.sidebar.expander("ℹ️ HELP & GUIDE", expanded=False):
-    st.markdown("""
-    **📊 BACKTEST MODE（回测模式）:**
-    - **目的**：分析历史数据，得到标的物价格的输入建模（Input Model）并选择策略
-    - 上传CSV文件（包含日期列和资产价格）
-    - 选择策略并配置参数
-    - **自动进行输入建模**：系统会从标的物价格数据中提取收益率分布特征
-    - 查看策略的历史表现指标
-    - 通过6个详细图表分析回测结果
+        submitted = st.form_submit_button("💾 保存成本设置", use_container_width=True)
     
-    **🔮 PROJECTION MODE（预测模式）:**
-    - **目的**：使用回测中得到的Input Model模拟未来价格走向，评估策略在未来表现
-    - **自动使用回测结果**：使用回测中选择的策略和Input Model
-    - 配置预测时间期限和模拟次数
-    - 查看未来收益的概率分布
-    - 获得策略在未来市场环境下的表现评估
+    if submitted:
+        st.session_state["transaction_cost_rate"] = transaction_cost / 100
+        st.session_state["slippage_rate"] = slippage / 100
+        st.session_state["_cost_caption"] = f"💡 总成本：{(transaction_cost + slippage):.2f}%"
+        st.success("✅ 交易成本设置已保存")
     
-    **💡 TIPS:**
-    - Use synthetic data if no file uploaded
-    - Adjust rebalance frequency for different strategies
-    - Export results to Excel for further analysis
+    # 总成本说明只在提交（或首次渲染）时格式化一次
+    if "_cost_caption" not in st.session_state:
+        st.session_state["_cost_caption"] = f"💡 总成本：{(st.session_state['transaction_cost_rate'] + st.session_state['slippage_rate']) * 100:.2f}%"
+    st.caption(st.session_state["_cost_caption"])
+
+if mode != "DERIVATIVES LAB (Options / Margin)":
+    # 策略对比功能
+    with st.sidebar.expander("🔀 策略对比", expanded=False):
+        render_strategy_comparison_panel(strategy_name_global, initial_capital, leverage, risk_free)
     
-    **📚 策略选择建议：**
-    - 新手：Equal Weight 或 Fixed Weights
-    - 风险厌恶：Minimum Variance 或 Risk Parity
-    - 追求收益：Momentum 或 Target Risk
-    - 降低成本：Adaptive Rebalance
-    """)
+    # 回测历史记录
+    with st.sidebar.expander("📚 回测历史", expanded=False):
+        render_backtest_history_panel()
     
-    # 策略快速对比
-    with st.expander("📊 策略快速对比", expanded=False):
-        st.markdown("""
-        | 策略 | 复杂度 | 风险控制 | 收益潜力 | 交易成本 |
-        |------|--------|----------|----------|----------|
-        | Fixed Weights | ⭐ 低 | ⭐⭐ 中 | ⭐⭐ 中 | ⭐⭐ 中 |
-        | Target Risk | ⭐⭐ 中 | ⭐⭐⭐ 高 | ⭐⭐ 中 | ⭐⭐ 中 |
-        | Adaptive Rebalance | ⭐ 低 | ⭐⭐ 中 | ⭐⭐ 中 | ⭐⭐⭐ 低 |
-        | Equal Weight | ⭐ 低 | ⭐⭐ 中 | ⭐⭐ 中 | ⭐⭐ 中 |
-        | Risk Parity | ⭐⭐ 中 | ⭐⭐⭐ 高 | ⭐⭐ 中 | ⭐⭐ 中 |
-        | Minimum Variance | ⭐⭐⭐ 高 | ⭐⭐⭐ 高 | ⭐ 低 | ⭐⭐ 中 |
-        | Momentum | ⭐⭐ 中 | ⭐ 低 | ⭐⭐⭐ 高 | ⭐⭐ 中 |
-        | Mean Reversion | ⭐⭐ 中 | ⭐⭐ 中 | ⭐⭐ 中 | ⭐⭐ 中 |
-        """)
+    # 交易成本设置
+    with st.sidebar.expander("💰 交易成本设置", expanded=False):
+        render_transaction_cost_panel()
+
+st.sidebar.markdown("---")
+st.sidebar.caption(f"System Status: ONLINE\nBackend: v2.4.0 (Bridge)")
+
+# 展开器跟踪开合状态（on_change="rerun"），折叠时跳过正文；放在片段中，开合只重跑本片段
+@st.fragment
+def render_help_panel():
+    """帮助说明面板"""
+    help_expander = st.expander("ℹ️ HELP & GUIDE", expanded=False, key="help_expander", on_change="rerun")
+    if help_expander.open:
+        with help_expander:
+            st.markdown(help_texts.HELP_MD)
+            
+            # 策略快速对比
+            compare_expander = st.expander("📊 策略快速对比", expanded=False, key="help_compare_expander", on_change="rerun")
+            if compare_expander.open:
+                with compare_expander:
+                    st.markdown(help_texts.COMPARE_MD)
+
+with st.sidebar:
+    render_help_panel()
 
 # ==========================================
 # 5. 主界面逻辑 (Main View)
@@ -2451,8 +3024,8 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
     col_title1, col_title2, col_title3 = st.columns([2, 1, 1])
     with col_title1:
         st.markdown(f"**Strategy:** <span style='color:{COLORS['gold']}'>{strategy_name_global}</span>", unsafe_allow_html=True)
-        if strategy_name_global in strategy_descriptions:
-            st.caption(f"💡 {strategy_descriptions[strategy_name_global]}")
+        if strategy_name_global in STRATEGY_DESCRIPTIONS:
+            st.caption(f"💡 {STRATEGY_DESCRIPTIONS[strategy_name_global]}")
     with col_title2:
         st.markdown(f"**Leverage:** <span style='color:{COLORS['text_main']}'>{leverage}x</span>", unsafe_allow_html=True)
     with col_title3:
@@ -2460,18 +3033,8 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
     
     # 策略快速说明展开区域
     with st.expander("📖 当前策略说明", expanded=False):
-        strategy_quick_guide = {
-            "Fixed Weights": "始终保持预设权重，定期再平衡。适合长期投资者，简单可预测。",
-            "Target Risk": "动态调整权重以保持目标波动率。适合风险敏感型投资者。",
-            "Adaptive Rebalance": "仅在权重偏离阈值时再平衡。适合希望降低交易成本的投资者。",
-            "Equal Weight": "所有资产等权重分配（1/N策略）。适合不确定如何分配权重的投资者。",
-            "Risk Parity": "根据波动率分配权重，使风险贡献相等。适合追求风险均衡的投资者。",
-            "Minimum Variance": "优化协方差矩阵，最小化波动率。适合风险厌恶型投资者。",
-            "Momentum": "增持表现好的资产，减持表现差的资产。适合相信趋势延续的投资者。",
-            "Mean Reversion": "当资产偏离目标时反向调整。适合相信均值回归的投资者。",
-        }
-        if strategy_name_global in strategy_quick_guide:
-            st.info(f"**{strategy_name_global}**: {strategy_quick_guide[strategy_name_global]}")
+        if strategy_name_global in STRATEGY_QUICK_GUIDE:
+            st.info(f"**{strategy_name_global}**: {STRATEGY_QUICK_GUIDE[strategy_name_global]}")
             st.markdown("💡 更多详细信息请查看左侧边栏的「📚 策略详细说明」")
     
     st.markdown("###") # Spacer
@@ -2480,9 +3043,12 @@ if mode != "DERIVATIVES LAB (Options / Margin)":
 # SCENARIO A: 历史回测 (Backtest)
 # ------------------------------------------
 if mode == "BACKTEST (Historical)":
+    # 页面状态只查一次，下方引导与步骤判断共用
+    has_bt_result = 'bt_result' in st.session_state
+    has_run_backtest = st.session_state.get("user_has_run_backtest", False)
     
     # 首次使用引导
-    if st.session_state.get("show_welcome", True) and not st.session_state.get("user_has_run_backtest", False):
+    if st.session_state.get("show_welcome", True) and not has_run_backtest:
         welcome_col1, welcome_col2 = st.columns([3, 1])
         with welcome_col1:
             st.info("""
@@ -2504,7 +3070,6 @@ if mode == "BACKTEST (Historical)":
     
     # 操作步骤指引
     st.markdown("### 📋 操作步骤")
-    step_col1, step_col2, step_col3, step_col4, step_col5 = st.columns(5)
     
     # 智能判断当前步骤（根据实际配置状态）
     # 步骤1：选择策略
@@ -2513,9 +3078,9 @@ if mode == "BACKTEST (Historical)":
     # 步骤4：运行回测
     # 步骤5：查看结果
     
-    if 'bt_result' in st.session_state:
+    if has_bt_result:
         current_step = 5  # 有结果，显示步骤5
-    elif st.session_state.get("user_has_run_backtest", False):
+    elif has_run_backtest:
         current_step = 4  # 正在运行回测
     elif initial_capital > 0 and strategy_name_global:
         current_step = 3  # 参数已配置，准备运行
@@ -2524,61 +3089,18 @@ if mode == "BACKTEST (Historical)":
     else:
         current_step = 1  # 初始状态，需要选择策略
     
-    step_style_active = "background-color: rgba(210, 153, 34, 0.2); border: 2px solid #D29922; padding: 10px; border-radius: 8px; text-align: center;"
-    step_style_done = "background-color: rgba(63, 185, 80, 0.1); border: 2px solid #3FB950; padding: 10px; border-radius: 8px; text-align: center;"
-    step_style_pending = "background-color: rgba(139, 148, 158, 0.1); border: 2px solid #8B949E; padding: 10px; border-radius: 8px; text-align: center; opacity: 0.6;"
-    
     # 步骤状态判断
     step1_done = strategy_name_global and strategy_name_global in InvestSimBridge.get_available_strategies()
     step2_done = initial_capital > 0
     step3_done = True  # 总是可以使用示例数据
-    step4_done = 'bt_result' in st.session_state or st.session_state.get("user_has_run_backtest", False)
-    step5_done = 'bt_result' in st.session_state
-    
-    with step_col1:
-        if step1_done:
-            style = step_style_done if current_step > 1 else step_style_active
-            icon = "✅" if current_step > 1 else "🔄"
-        else:
-            style = step_style_active
-            icon = "📍"
-        st.markdown(f'<div style="{style}"><strong>{icon} 步骤 1</strong><br>选择策略</div>', unsafe_allow_html=True)
-    
-    with step_col2:
-        if step2_done:
-            style = step_style_done if current_step > 2 else (step_style_active if current_step == 2 else step_style_done)
-            icon = "✅" if current_step > 2 else ("🔄" if current_step == 2 else "✅")
-        else:
-            style = step_style_pending
-            icon = "⏳"
-        st.markdown(f'<div style="{style}"><strong>{icon} 步骤 2</strong><br>配置参数</div>', unsafe_allow_html=True)
+    step4_done = has_bt_result or has_run_backtest
+    step5_done = has_bt_result
     
-    with step_col3:
-        if step3_done:
-            style = step_style_done if current_step > 3 else (step_style_active if current_step == 3 else step_style_done)
-            icon = "✅" if current_step > 3 else ("🔄" if current_step == 3 else "✅")
-        else:
-            style = step_style_pending
-            icon = "⏳"
-        st.markdown(f'<div style="{style}"><strong>{icon} 步骤 3</strong><br>准备数据</div>', unsafe_allow_html=True)
-    
-    with step_col4:
-        if step4_done:
-            style = step_style_done if current_step > 4 else (step_style_active if current_step == 4 else step_style_done)
-            icon = "✅" if current_step > 4 else ("🔄" if current_step == 4 else "✅")
-        else:
-            style = step_style_pending
-            icon = "⏳"
-        st.markdown(f'<div style="{style}"><strong>{icon} 步骤 4</strong><br>运行回测</div>', unsafe_allow_html=True)
-    
-    with step_col5:
-        if step5_done:
-            style = step_style_done
-            icon = "✅"
-        else:
-            style = step_style_pending
-            icon = "⏳"
-        st.markdown(f'<div style="{style}"><strong>{icon} 步骤 5</strong><br>查看结果</div>', unsafe_allow_html=True)
+    render_step_indicator(
+        current_step,
+        [step1_done, step2_done, step3_done, step4_done, step5_done],
+        ["选择策略", "配置参数", "准备数据", "运行回测", "查看结果"],
+    )
     
     st.markdown("---")
     
@@ -2600,6 +3122,8 @@ if mode == "BACKTEST (Historical)":
                 st.session_state["uploaded_file_data"] = uploaded_file
             elif "uploaded_file_data" not in st.session_state:
                 st.session_state["uploaded_file_data"] = None
+            # 文件内容只取一次，回测与结果页共用同一份字节（缓存键）
+            market_file_bytes = uploaded_file.getvalue() if uploaded_file is not None else None
             if not uploaded_file:
                 st.caption("💡 Using synthetic demonstration data stream.")
                 st.caption("📝 **提示**：首次使用建议先用示例数据体验，熟悉后再上传自己的数据")
@@ -2631,8 +3155,7 @@ if mode == "BACKTEST (Historical)":
             checklist_status.append(True)
         
         # 显示检查清单
-        for item in checklist_items:
-            st.markdown(f"- {item}")
+        st.markdown("\n".join(f"- {item}" for item in checklist_items))
         
         # 状态提示
         if all(checklist_status):
@@ -2647,7 +3170,7 @@ if mode == "BACKTEST (Historical)":
         st.session_state["user_has_run_backtest"] = True
         st.session_state["show_welcome"] = False
         with st.spinner("PROCESSING HISTORICAL DATA..."):
-            market_data = InvestSimBridge.load_market_data(uploaded_file)
+            market_data = load_market_data_cached(market_file_bytes)
             params = {
                 "strategy": strategy_name_global,
                 "leverage": leverage,
@@ -2656,23 +3179,21 @@ if mode == "BACKTEST (Historical)":
                 "rebalance_frequency": reb_freq,
                 **strategy_params
             }
-            bt_res = InvestSimBridge.run_backtest(params, market_data)
+            # 完整结果用于访问权重历史，与摘要来自同一次回测
+            bt_res, full_result = run_backtest_cached(params, market_data)
             st.session_state['bt_result'] = bt_res
-            
-            # 获取完整结果以访问权重历史
-            from invest_sim.backtester import Backtester
-            config = InvestSimBridge._build_backtest_config(params, market_data)
-            backtester = Backtester(config)
-            full_result = backtester.run(market_data)
             st.session_state['bt_full_result'] = full_result
+            # 组合日收益率只在回测时计算一次，结果区各标签页直接复用
+            st.session_state['bt_portfolio_returns'] = bt_res.df['Portfolio'].pct_change(fill_method=None).dropna()
             
             # 【关键改进】从标的物价格数据中提取收益率，用于输入建模
             # 这是回测的核心目的之一：得到过去一段时间标的物价格的input model
-            asset_returns = market_data.pct_change().dropna()
-            # 将所有资产的收益率展平，用于输入建模
-            asset_returns_flat = asset_returns.values.flatten()
-            asset_returns_flat = asset_returns_flat[~np.isnan(asset_returns_flat)]
-            st.session_state['bootstrap_returns'] = asset_returns_flat
+            # 不前向填充缺失价格；只丢弃全为空的行，单个资产的缺失值在展平后统一过滤
+            asset_returns = market_data.pct_change(fill_method=None).dropna(how='all')
+            # 将所有资产的收益率展平为连续float32数组，供下面所有拟合复用（带宽减半）
+            asset_returns_flat = np.ascontiguousarray(asset_returns.to_numpy(dtype=np.float32, na_value=np.nan)).ravel()
+            asset_returns_flat = asset_returns_flat[np.isfinite(asset_returns_flat)]
+            st.session_state['bootstrap_returns'] = as_return_samples(asset_returns_flat)
             st.session_state['backtest_market_data'] = market_data  # 保存原始价格数据
             
             # 保存回测中选择的策略，供预测使用
@@ -2688,94 +3209,9 @@ if mode == "BACKTEST (Historical)":
             # 自动进行输入建模（从标的物价格数据）
             with st.spinner("🔬 自动进行输入建模分析..."):
                 try:
-                    # 只拟合支持的三种分布：Normal, Student-t, Bootstrap
-                    fit_results = {}
-                    
-                    # 1. Normal分布
-                    try:
-                        from scipy import stats as scipy_stats
-                        scipy_available = True
-                    except:
-                        scipy_available = False
-                    
-                    normal_mean = float(np.mean(asset_returns_flat))
-                    normal_vol = float(np.std(asset_returns_flat))
-                    normal_params = {"mean": normal_mean, "vol": normal_vol}
-                    
-                    if scipy_available:
-                        ks_stat, ks_pvalue = scipy_stats.kstest(asset_returns_flat, lambda x: scipy_stats.norm.cdf(x, normal_mean, normal_vol))
-                        log_likelihood = np.sum(scipy_stats.norm.logpdf(asset_returns_flat, normal_mean, normal_vol))
-                        n_params = 2
-                        aic = 2 * n_params - 2 * log_likelihood
-                        bic = n_params * np.log(len(asset_returns_flat)) - 2 * log_likelihood
-                    else:
-                        ks_stat, ks_pvalue, log_likelihood, aic, bic = None, None, None, None, None
-                    
-                    fit_results["Normal"] = {
-                        "params": normal_params,
-                        "ks_stat": ks_stat,
-                        "ks_pvalue": ks_pvalue,
-                        "log_likelihood": log_likelihood,
-                        "aic": aic,
-                        "bic": bic,
-                        "success": True
-                    }
-                    
-                    # 2. Student-t分布
-                    if scipy_available:
-                        try:
-                            df, loc, scale = scipy_stats.t.fit(asset_returns_flat)
-                            student_t_params = {"df": float(df), "mean": float(loc), "scale": float(scale)}
-                            
-                            # 计算拟合优度
-                            ks_stat, ks_pvalue = scipy_stats.kstest(asset_returns_flat, lambda x: scipy_stats.t.cdf(x, df, loc, scale))
-                            log_likelihood = np.sum(scipy_stats.t.logpdf(asset_returns_flat, df, loc, scale))
-                            n_params = 3
-                            aic = 2 * n_params - 2 * log_likelihood
-                            bic = n_params * np.log(len(asset_returns_flat)) - 2 * log_likelihood
-                            
-                            fit_results["Student-t"] = {
-                                "params": student_t_params,
-                                "ks_stat": ks_stat,
-                                "ks_pvalue": ks_pvalue,
-                                "log_likelihood": log_likelihood,
-                                "aic": aic,
-                                "bic": bic,
-                                "success": True
-                            }
-                        except Exception as e:
-                            fit_results["Student-t"] = {"success": False, "error": str(e)}
-                    else:
-                        fit_results["Student-t"] = {"success": False, "error": "scipy未安装"}
-                    
-                    # 3. Bootstrap分布
-                    fit_results["Bootstrap"] = {
-                        "params": {"historical_returns": asset_returns_flat.tolist()},
-                        "ks_stat": 0.0,
-                        "ks_pvalue": 1.0,
-                        "log_likelihood": None,  # Bootstrap没有解析式
-                        "aic": None,
-                        "bic": None,
-                        "success": True
-                    }
-                    
-                    # 找到最佳分布（只从支持的三种中选择）
-                    best_dist = None
-                    best_score = -np.inf
-                    for dist_name in ["Normal", "Student-t", "Bootstrap"]:
-                        result = fit_results.get(dist_name, {})
-                        if result.get("success", False):
-                            # 使用综合评分
-                            score = 0
-                            if "ks_pvalue" in result and result["ks_pvalue"] is not None and not np.isnan(result["ks_pvalue"]):
-                                score += result["ks_pvalue"] * 2  # p值越高越好
-                            if "aic" in result and result["aic"] is not None and not np.isnan(result["aic"]):
-                                score -= result["aic"] / 1000  # AIC越低越好
-                            if dist_name == "Bootstrap":
-                                score += 0.5  # Bootstrap有额外加分（保留完整历史特征）
-                            if score > best_score:
-                                best_score = score
-                                best_dist = dist_name
+                    fitted = fit_input_models(asset_returns_flat)
+                    best_dist = fitted["best"]
+                    fit_results = fitted["fit_results"]
                     
                     if best_dist:
                         st.session_state["input_model_choice"] = best_dist
@@ -2784,42 +3220,26 @@ if mode == "BACKTEST (Historical)":
                             st.session_state["fitted_normal_params"] = selected_result["params"]
                         elif best_dist == "Student-t":
                             st.session_state["fitted_student_t_params"] = selected_result["params"]
-                        elif best_dist == "Bootstrap":
-                            st.session_state["bootstrap_returns"] = asset_returns_flat
+                        # Bootstrap 所需的 bootstrap_returns 已在上方写入
                         
                         st.success(f"✅ **输入建模完成**：基于标的物价格数据，推荐使用 **{best_dist}** 分布模型（将用于未来价格预测）")
                     else:
                         # 默认使用Normal
                         st.session_state["input_model_choice"] = "Normal"
-                        st.session_state["fitted_normal_params"] = normal_params
+                        st.session_state["fitted_normal_params"] = fit_results["Normal"]["params"]
                         st.warning("⚠️ 无法确定最佳分布，使用Normal分布作为默认")
                 except Exception as e:
-                    import traceback
                     st.warning(f"⚠️ 自动输入建模失败：{str(e)}，将在预测时使用默认参数")
                     st.caption(f"错误详情：{traceback.format_exc()}")
             
+            bt_metrics = BtMetrics.from_metrics(bt_res.metrics)
+            
             # 自动保存到历史记录
-            history_entry = {
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "strategy": strategy_name_global,
-                "metrics": {
-                    "total_return": bt_res.metrics.get("total_return", 0),
-                    "sharpe": bt_res.metrics.get("sharpe", 0),
-                    "max_drawdown": bt_res.metrics.get("max_drawdown", 0),
-                    "volatility": bt_res.metrics.get("volatility", 0),
-                },
-                "params": {
-                    "initial_capital": initial_capital,
-                    "leverage": leverage,
-                    "risk_free": risk_free,
-                    "rebalance_frequency": reb_freq,
-                },
-                "result": bt_res  # 保存完整结果对象
-            }
-            st.session_state["backtest_history"].append(history_entry)
+            if append_backtest_history(strategy_name_global, bt_metrics):
+                st.toast(f"回测历史已达 {MAX_HISTORY} 条上限，已覆盖最早的记录")
             
             # 保存指标到session state用于风险预警
-            st.session_state["bt_metrics"] = bt_res.metrics
+            st.session_state["bt_metrics"] = bt_metrics
 
     # 策略对比显示
     if st.session_state.get("show_comparison", False) and len(st.session_state["strategy_comparison"]) > 0:
@@ -2830,11 +3250,11 @@ if mode == "BACKTEST (Historical)":
         
         # 创建对比表格
         comparison_df = pd.DataFrame({
-            "策略": [entry["strategy"] for entry in comparison_data],
-            "总收益": [f"{entry['metrics'].get('total_return', 0):.2%}" for entry in comparison_data],
-            "Sharpe比率": [f"{entry['metrics'].get('sharpe', 0):.2f}" for entry in comparison_data],
-            "最大回撤": [f"{entry['metrics'].get('max_drawdown', 0):.2%}" for entry in comparison_data],
-            "波动率": [f"{entry['metrics'].get('volatility', 0):.2%}" for entry in comparison_data],
+            "策略": [entry.strategy for entry in comparison_data],
+            "总收益": [f"{entry.total_return:.2%}" for entry in comparison_data],
+            "Sharpe比率": [f"{entry.sharpe:.2f}" for entry in comparison_data],
+            "最大回撤": [f"{entry.max_drawdown:.2%}" for entry in comparison_data],
+            "波动率": [f"{entry.volatility:.2%}" for entry in comparison_data],
         })
         
         st.dataframe(comparison_df, use_container_width=True, hide_index=True)
@@ -2842,9 +3262,9 @@ if mode == "BACKTEST (Historical)":
         # 对比图表
         fig_comparison = go.Figure()
         
-        strategies = [entry["strategy"] for entry in comparison_data]
-        returns = [entry["metrics"].get("total_return", 0) * 100 for entry in comparison_data]
-        sharpe = [entry["metrics"].get("sharpe", 0) for entry in comparison_data]
+        strategies = [entry.strategy for entry in comparison_data]
+        returns = [entry.total_return * 100 for entry in comparison_data]
+        sharpe = [entry.sharpe for entry in comparison_data]
         
         fig_comparison.add_trace(go.Bar(
             x=strategies,
@@ -2871,33 +3291,159 @@ if mode == "BACKTEST (Historical)":
         
         st.markdown("---")
 
-    if 'bt_result' in st.session_state:
-        # 成功提示
-        st.success("✅ 回测完成！下方显示详细结果。你可以切换到不同标签页查看各种分析。")
-        
+    @st.fragment
+    def render_rolling_analysis(portfolio_returns):
+        """滚动分析标签页主体（滚动指标、VaR/CVaR、资产相关性）；嵌套片段，窗口滑块变化时不重跑整个结果区"""
+        if portfolio_returns is not None and len(portfolio_returns) > 0:
+            window_size = st.slider("Rolling Window (days)", 30, 252, 60, 10,
+                                   help="Number of days to include in rolling calculations. Smaller windows show more recent trends.")
+            
+            # 计算滚动指标（缓存；序列已对齐到第一个完整窗口，日期轴只切片一次，三条曲线共用）
+            returns_arr = portfolio_returns.to_numpy()
+            rolling_sharpe, rolling_vol, rolling_mean = rolling_metrics(returns_arr, window_size)
+            rolling_x = portfolio_returns.index[window_size-1:]
+            # 长序列按 LTTB 各自降采样后再送往前端
+            keep_sharpe = lttb_indices(rolling_sharpe)
+            keep_vol = lttb_indices(rolling_vol)
+            keep_ret = lttb_indices(rolling_mean)
+            
+            # 三条滚动曲线均为整段日频序列，用WebGL渲染
+            # 滚动Sharpe比率
+            fig_rolling_sharpe = go.Figure()
+            fig_rolling_sharpe.add_trace(go.Scattergl(
+                x=rolling_x[keep_sharpe],
+                y=plot_array(rolling_sharpe[keep_sharpe]),
+                mode='lines',
+                name='Rolling Sharpe',
+                line=dict(color=COLORS['gold'], width=2)
+            ))
+            fig_rolling_sharpe.add_hline(y=0, line_dash="dash", line_color=COLORS['text_sub'], opacity=0.5)
+            fig_rolling_sharpe.update_layout(**get_chart_layout(300))
+            fig_rolling_sharpe.update_layout(
+                title=f"Rolling Sharpe Ratio ({window_size}-day window)",
+                yaxis=dict(title="Sharpe Ratio")
+            )
+            st.plotly_chart(fig_rolling_sharpe, use_container_width=True)
+            
+            # 滚动波动率
+            fig_rolling_vol = go.Figure()
+            fig_rolling_vol.add_trace(go.Scattergl(
+                x=rolling_x[keep_vol],
+                y=plot_array(rolling_vol[keep_vol], 100),
+                mode='lines',
+                name='Rolling Volatility',
+                line=dict(color=COLORS['red'], width=2),
+                fill='tozeroy',
+                fillcolor='rgba(248, 81, 73, 0.1)'
+            ))
+            fig_rolling_vol.update_layout(**get_chart_layout(300))
+            fig_rolling_vol.update_layout(
+                title=f"Rolling Volatility ({window_size}-day window)",
+                yaxis=dict(title="Volatility (%)")
+            )
+            st.plotly_chart(fig_rolling_vol, use_container_width=True)
+            
+            # 滚动年化收益
+            fig_rolling_ret = go.Figure()
+            fig_rolling_ret.add_trace(go.Scattergl(
+                x=rolling_x[keep_ret],
+                y=plot_array(rolling_mean[keep_ret], 100),
+                mode='lines',
+                name='Rolling Annualized Return',
+                line=dict(color=COLORS['green'], width=2)
+            ))
+            fig_rolling_ret.add_hline(y=0, line_dash="dash", line_color=COLORS['text_sub'], opacity=0.5)
+            fig_rolling_ret.update_layout(**get_chart_layout(300))
+            fig_rolling_ret.update_layout(
+                title=f"Rolling Annualized Return ({window_size}-day window)",
+                yaxis=dict(title="Return (%)")
+            )
+            st.plotly_chart(fig_rolling_ret, use_container_width=True)
+            
+            # 滚动指标统计
+            col_r1, col_r2, col_r3, col_r4 = st.columns(4)
+            with col_r1:
+                st.metric("Avg Rolling Sharpe", f"{np.nanmean(rolling_sharpe):.2f}")
+            with col_r2:
+                st.metric("Avg Rolling Vol", f"{np.nanmean(rolling_vol):.2%}")
+            with col_r3:
+                st.metric("Avg Rolling Return", f"{np.nanmean(rolling_mean):.2%}")
+            with col_r4:
+                # VaR和CVaR
+                var_95, cvar_95 = var_cvar(returns_arr)
+                st.metric("VaR (95%)", f"{var_95:.2%}", 
+                         help="Value at Risk: Worst expected loss at 95% confidence")
+                st.caption(f"CVaR: {cvar_95:.2%}")
+                st.caption("💡 CVaR = average loss when VaR is exceeded")
+            
+            # 相关性分析（如果有多个资产）
+            if 'bt_full_result' in st.session_state:
+                full_result = st.session_state['bt_full_result']
+                if len(full_result.asset_names) > 1 and 'bt_result' in st.session_state:
+                    st.markdown("---")
+                    st.markdown("##### Asset Correlation Analysis")
+                    
+                    # 获取市场数据计算相关性
+                    try:
+                        asset_returns = market_returns_cached(market_file_bytes)
+                        
+                        if len(asset_returns.columns) > 1:
+                            corr_matrix = correlation_matrix(asset_returns.to_numpy(dtype=np.float64), tuple(asset_returns.columns))
+                            
+                            # 相关性热力图
+                            fig_corr = go.Figure(data=go.Heatmap(
+                                z=corr_matrix.values,
+                                x=corr_matrix.columns,
+                                y=corr_matrix.columns,
+                                colorscale='RdBu',
+                                zmid=0,
+                                text=corr_matrix.round(2).values,
+                                texttemplate='%{text}',
+                                textfont={"size":10},
+                                colorbar=dict(title="Correlation")
+                            ))
+                            fig_corr.update_layout(**get_chart_layout(400))
+                            fig_corr.update_layout(title="Asset Return Correlation Matrix")
+                            st.plotly_chart(fig_corr, use_container_width=True)
+                            st.caption("💡 **Correlation**: Values close to +1 indicate assets move together, -1 indicates opposite movements. Lower correlation = better diversification.")
+                    except:
+                        pass
+        else:
+            st.info("Returns data not available for rolling analysis.")
+
+    @st.fragment
+    def render_backtest_results():
+        """回测结果区（指标、预警、图表标签页、导出与报告）；作为片段，区内控件交互只重跑本区"""
         res = st.session_state['bt_result']
         metrics = res.metrics
+        # 结果表的列只取一次，下方各处共用
+        df = res.df
+        portfolio = df.get('Portfolio')
+        nav = portfolio if portfolio is not None else df.iloc[:, 0]
+        dd = df['Drawdown'].to_numpy()
+        dd_keep = lttb_indices(dd)  # 回撤图显示用的降采样索引
         
         # 风险预警系统
         risk_warnings = []
-        if abs(metrics.get("max_drawdown", 0)) > 0.3:  # 最大回撤超过30%
+        if abs(metrics.get("max_dd", 0)) > 0.3:  # 最大回撤超过30%
             risk_warnings.append("⚠️ **高风险**：最大回撤超过30%，建议降低杠杆或调整策略")
         if metrics.get("volatility", 0) > 0.4:  # 波动率超过40%
             risk_warnings.append("⚠️ **高波动**：年化波动率超过40%，组合风险较高")
         if metrics.get("sharpe", 0) < 0:  # Sharpe比率为负
             risk_warnings.append("⚠️ **负Sharpe比率**：策略表现低于无风险利率，建议重新评估")
-        if metrics.get("max_drawdown", 0) < -0.5:  # 最大回撤超过50%
+        if metrics.get("max_dd", 0) < -0.5:  # 最大回撤超过50%
             risk_warnings.append("🚨 **极高风险**：最大回撤超过50%，存在爆仓风险！")
         
         if risk_warnings:
             st.warning("### ⚠️ 风险预警\n\n" + "\n\n".join(risk_warnings))
         
         # 计算额外风险指标
-        portfolio_returns = None
-        if 'Returns' in res.df.columns:
-            portfolio_returns = res.df['Returns'].dropna()
-        elif 'Portfolio' in res.df.columns:
-            portfolio_returns = res.df['Portfolio'].pct_change().dropna()
+        portfolio_returns = st.session_state.get('bt_portfolio_returns')
+        if portfolio_returns is None:
+            if 'Returns' in df.columns:
+                portfolio_returns = df['Returns'].dropna()
+            elif portfolio is not None:
+                portfolio_returns = portfolio.pct_change(fill_method=None).dropna()
         
         sortino = 0.0
         calmar = 0.0
@@ -2906,104 +3452,74 @@ if mode == "BACKTEST (Historical)":
         if portfolio_returns is not None and len(portfolio_returns) > 0:
             sortino = calculate_sortino_ratio(portfolio_returns, risk_free, 252)
             calmar = calculate_calmar_ratio(metrics.get('annualized_return', 0), metrics['max_dd'])
-            if 'Portfolio' in res.df.columns:
-                max_dd_duration = calculate_max_drawdown_duration(res.df['Portfolio'])
-        
-        # 结果查看引导
-        st.success("✅ **回测完成！** 下方显示详细结果。你可以：")
-        guide_result_col1, guide_result_col2, guide_result_col3 = st.columns(3)
-        with guide_result_col1:
-            st.markdown("""
-            📊 **查看指标**
-            - 6个核心指标卡片
-            - 点击指标查看详细说明
-            """)
-        with guide_result_col2:
-            st.markdown("""
-            📈 **分析图表**
-            - 切换6个标签页
-            - 每个标签页有详细说明
-            """)
-        with guide_result_col3:
-            st.markdown("""
-            💾 **导出数据**
-            - Excel完整报告
-            - CSV原始数据
-            """)
+            if portfolio is not None:
+                max_dd_duration = calculate_max_drawdown_duration(portfolio)
+        
+        # 结果查看引导（收起时不渲染三栏内容）
+        st.success("✅ **回测完成！** 下方显示详细结果。")
+        results_guide = st.expander("💡 如何阅读结果", expanded=False, key="help_results_guide", on_change="rerun")
+        if results_guide.open:
+            with results_guide:
+                guide_result_col1, guide_result_col2, guide_result_col3 = st.columns(3)
+                with guide_result_col1:
+                    st.markdown("""
+                    📊 **查看指标**
+                    - 6个核心指标卡片
+                    - 点击指标查看详细说明
+                    """)
+                with guide_result_col2:
+                    st.markdown("""
+                    📈 **分析图表**
+                    - 切换6个标签页
+                    - 每个标签页有详细说明
+                    """)
+                with guide_result_col3:
+                    st.markdown("""
+                    💾 **导出数据**
+                    - Excel完整报告
+                    - CSV原始数据
+                    """)
         st.markdown("---")
         
         # 扩展的指标显示
         st.markdown("### Performance Metrics")
         
         # 指标说明展开区域
-        with st.expander("📖 Metric Definitions", expanded=False):
-            st.markdown("""
-            **Total Return**: Cumulative return over the entire backtest period  
-            **Sharpe Ratio**: Risk-adjusted return (higher is better, typically >1 is good)  
-            **Sortino Ratio**: Downside risk-adjusted return (only penalizes negative volatility)  
-            **Calmar Ratio**: Annual return divided by maximum drawdown (higher is better)  
-            **Max Drawdown**: Largest peak-to-trough decline (lower is better)  
-            **Volatility**: Annualized standard deviation of returns (measures risk)
-            """)
-        
-        c1, c2, c3, c4, c5, c6 = st.columns(6)
-        with c1: 
-            st.metric("Total Return", f"{metrics['total_return']:.2%}", f"CAGR: {metrics.get('annualized_return', 0):.2%}",
-                     help="Total return over the backtest period. Delta shows annualized return.")
-        with c2: 
-            st.metric("Sharpe Ratio", f"{metrics['sharpe']:.2f}",
-                     help="Measures excess return per unit of risk. >1 is good, >2 is excellent.")
-        with c3: 
-            st.metric("Sortino Ratio", f"{sortino:.2f}",
-                     help="Similar to Sharpe but only considers downside volatility. Better for asymmetric returns.")
-        with c4: 
-            st.metric("Calmar Ratio", f"{calmar:.2f}",
-                     help="Annual return / Max drawdown. Higher values indicate better risk-adjusted performance.")
-        with c5: 
-            st.metric("Max Drawdown", f"{metrics['max_dd']:.2%}", delta_color="inverse", delta=f"{max_dd_duration}d",
-                     help="Largest peak-to-trough decline. Delta shows duration in days.")
-        with c6: 
-            st.metric("Volatility", f"{metrics['volatility']:.2%}",
-                     help="Annualized standard deviation of returns. Measures portfolio risk.")
+        render_help_expander("📖 Metric Definitions", help_texts.METRIC_DEFINITIONS_MD, key="help_metric_definitions")
+        
+        # (标签, 数值, 变化值, 变化值配色, 说明)
+        metric_specs = (
+            ("Total Return", f"{metrics['total_return']:.2%}", f"CAGR: {metrics.get('annualized_return', 0):.2%}", "normal",
+             "Total return over the backtest period. Delta shows annualized return."),
+            ("Sharpe Ratio", f"{metrics['sharpe']:.2f}", None, "normal",
+             "Measures excess return per unit of risk. >1 is good, >2 is excellent."),
+            ("Sortino Ratio", f"{sortino:.2f}", None, "normal",
+             "Similar to Sharpe but only considers downside volatility. Better for asymmetric returns."),
+            ("Calmar Ratio", f"{calmar:.2f}", None, "normal",
+             "Annual return / Max drawdown. Higher values indicate better risk-adjusted performance."),
+            ("Max Drawdown", f"{metrics['max_dd']:.2%}", f"{max_dd_duration}d", "inverse",
+             "Largest peak-to-trough decline. Delta shows duration in days."),
+            ("Volatility", f"{metrics['volatility']:.2%}", None, "normal",
+             "Annualized standard deviation of returns. Measures portfolio risk."),
+        )
+        for col, (label, value, delta, delta_color, help_text) in zip(st.columns(6), metric_specs):
+            col.metric(label, value, delta=delta, delta_color=delta_color, help=help_text)
 
         # 多标签页图表展示
         chart_tabs = st.tabs(["📈 NAV Curve", "📊 Drawdown", "📉 Returns Distribution", "📊 Asset Weights", "📈 Rolling Analysis", "💾 Export"])
         
         with chart_tabs[0]:
             # 详细说明
-            with st.expander("📖 什么是净值曲线（NAV Curve）？", expanded=False):
-                st.markdown("""
-                **净值（Net Asset Value, NAV）** 是投资组合的总价值，反映你的投资表现。
-                
-                **这个图表展示什么？**
-                - 📈 **主图**：显示投资组合价值随时间的变化曲线
-                - 📉 **侧边小图**：显示回撤情况（从峰值下降的幅度）
-                
-                **如何解读？**
-                - **上升趋势**：组合价值增长，投资表现良好
-                - **下降趋势**：组合价值减少，可能处于市场下跌期
-                - **波动幅度**：曲线越平滑，风险越小；波动越大，风险越高
-                
-                **关键观察点：**
-                - ✅ **最终价值 vs 初始价值**：判断总体盈亏
-                - ✅ **增长趋势**：是否持续向上
-                - ✅ **波动特征**：是否频繁大幅波动
-                - ✅ **回撤幅度**：侧边图显示最大回撤
-                
-                **实际应用：**
-                - 评估策略的长期表现
-                - 识别最佳和最差表现时期
-                - 对比不同策略的效果
-                """)
+            render_help_expander("📖 什么是净值曲线（NAV Curve）？", help_texts.NAV_CURVE_MD, key="help_nav_curve")
             
             st.caption("💡 **NAV Curve**: Portfolio net asset value over time. Side panel shows drawdown visualization.")
         col_main, col_side = st.columns([3, 1])
         with col_main:
-            st.plotly_chart(plot_nav_curve(res.df), use_container_width=True)
+            st.plotly_chart(plot_nav_curve(df), use_container_width=True)
         with col_side:
             fig_dd = go.Figure()
-            fig_dd.add_trace(go.Scatter(
-                x=res.df.index, y=res.df['Drawdown'],
+            fig_dd.add_trace(go.Scattergl(
+                x=df.index[dd_keep], y=plot_array(dd[dd_keep]),
                 fill='tozeroy', line=dict(color=COLORS['red'], width=1),
                 fillcolor='rgba(248, 81, 73, 0.1)'
             ))
@@ -3013,42 +3529,15 @@ if mode == "BACKTEST (Historical)":
         
         with chart_tabs[1]:
             # 详细说明
-            with st.expander("📖 什么是回撤分析（Drawdown Analysis）？", expanded=False):
-                st.markdown("""
-                **回撤（Drawdown）** 是指投资组合价值从历史最高点下降的幅度，是衡量风险的重要指标。
-                
-                **回撤如何计算？**
-                - 找到每个时间点的历史最高净值（峰值）
-                - 计算当前净值相对于峰值的下降百分比
-                - 公式：回撤 = (当前净值 - 历史峰值) / 历史峰值
-                
-                **这个图表展示什么？**
-                - 📉 **红色填充区域**：显示回撤的深度和持续时间
-                - 📊 **回撤值**：负值表示下降，0%表示在历史高点
-                - ⏱️ **持续时间**：回撤持续的天数
-                
-                **如何解读？**
-                - **最大回撤**：整个回测期间的最大跌幅（越小越好）
-                - **回撤持续时间**：从峰值到恢复的时间（越短越好）
-                - **平均回撤**：所有回撤期的平均值
-                - **>5%回撤次数**：严重回撤发生的频率
-                
-                **为什么重要？**
-                - ⚠️ **风险控制**：了解最坏情况下的损失
-                - 📊 **心理承受**：评估能否承受最大回撤
-                - 🔄 **恢复能力**：观察组合从回撤中恢复的速度
-                - 📈 **策略优化**：通过回撤数据改进策略
-                
-                **实际例子：**
-                - 如果最大回撤是 -20%，意味着在最坏情况下，你的投资可能损失20%
-                - 如果回撤持续100天，意味着需要100天才能恢复到之前的峰值
-                """)
+            render_help_expander("📖 什么是回撤分析（Drawdown Analysis）？", help_texts.DRAWDOWN_MD, key="help_drawdown")
             
             st.caption("💡 **Drawdown Analysis**: Visualizes portfolio drawdowns (declines from peak). Monitor periods when portfolio value drops below previous highs.")
+            
             # 详细回撤分析
+            # 图表用降采样后的点（WebGL渲染），统计仍用完整序列
             fig_dd_detailed = go.Figure()
-            fig_dd_detailed.add_trace(go.Scatter(
-                x=res.df.index, y=res.df['Drawdown'] * 100,
+            fig_dd_detailed.add_trace(go.Scattergl(
+                x=df.index[dd_keep], y=plot_array(dd[dd_keep], 100),
                 fill='tozeroy', line=dict(color=COLORS['red'], width=2),
                 fillcolor='rgba(248, 81, 73, 0.15)',
                 name='Drawdown'
@@ -3065,70 +3554,42 @@ if mode == "BACKTEST (Historical)":
             with col_dd1: st.metric("Max Drawdown", f"{metrics['max_dd']:.2%}")
             with col_dd2: st.metric("Duration", f"{max_dd_duration} days")
             with col_dd3:
-                avg_dd = res.df['Drawdown'][res.df['Drawdown'] < 0].mean() if len(res.df['Drawdown'][res.df['Drawdown'] < 0]) > 0 else 0
+                neg_dd = dd[dd < 0]
+                avg_dd = neg_dd.mean() if neg_dd.size else 0.0
                 st.metric("Avg Drawdown", f"{avg_dd:.2%}")
             with col_dd4:
-                dd_count = (res.df['Drawdown'] < -0.05).sum()
+                dd_count = int(np.count_nonzero(dd < -0.05))
                 st.metric(">5% Drawdowns", f"{dd_count}")
         
         with chart_tabs[2]:
             # 详细说明
-            with st.expander("📖 什么是收益率分布（Returns Distribution）？", expanded=False):
-                st.markdown("""
-                **收益率分布** 显示投资组合每日收益率的统计特征，帮助理解收益的分布规律和风险特征。
-                
-                **这个图表展示什么？**
-                - 📊 **直方图（金色）**：显示不同收益率区间的出现频率
-                - 📈 **正态分布拟合线（蓝色虚线）**：理论上的正态分布曲线
-                - 📉 **对比分析**：实际分布 vs 理论分布
-                
-                **关键统计指标：**
-                - **平均日收益（Mean）**：所有日收益率的平均值
-                - **标准差（Std Dev）**：收益率的波动程度，越大风险越高
-                - **偏度（Skewness）**：
-                  - 接近0：分布对称
-                  - >0：右偏，有更多正收益（好）
-                  - <0：左偏，有更多负收益（风险）
-                - **峰度（Kurtosis）**：
-                  - 接近3：接近正态分布
-                  - >3：尖峰，极端收益更多（高风险）
-                  - <3：平峰，收益更分散
-                
-                **如何解读？**
-                - **理想分布**：接近正态分布，偏度接近0，峰度接近3
-                - **右偏分布**：更多正收益，但可能有极端负收益
-                - **左偏分布**：更多负收益，风险较高
-                - **尖峰分布**：极端收益（大涨大跌）较多
-                
-                **实际应用：**
-                - ✅ 评估收益的稳定性
-                - ✅ 识别异常收益模式
-                - ✅ 预测未来收益概率
-                - ✅ 优化风险管理策略
-                
-                **风险提示：**
-                - 如果分布严重左偏或峰度很高，说明策略可能存在极端风险
-                - 正态分布拟合可以帮助识别实际分布与理论的偏差
-                """)
+            render_help_expander("📖 什么是收益率分布（Returns Distribution）？", help_texts.RETURNS_DISTRIBUTION_MD, key="help_returns_distribution")
             
             st.caption("💡 **Returns Distribution**: Histogram of daily returns with normal distribution fit. Check skewness (asymmetry) and kurtosis (tail risk).")
             # 收益率分布
             if portfolio_returns is not None and len(portfolio_returns) > 0:
+                # 服务端分箱，只把50个柱子发给前端（不再传全部样本让浏览器分箱）
+                returns_pct = portfolio_returns.to_numpy() * 100
+                counts, edges = np.histogram(returns_pct, bins=50)
+                bin_width = edges[1] - edges[0]
                 fig_dist = go.Figure()
-                fig_dist.add_trace(go.Histogram(
-                    x=portfolio_returns * 100,
-                    nbinsx=50,
+                fig_dist.add_trace(go.Bar(
+                    x=edges[:-1] + bin_width / 2,
+                    y=counts,
+                    width=bin_width,
                     name='Returns Distribution',
                     marker_color=COLORS['gold'],
                     opacity=0.7
                 ))
                 
-                # 添加正态分布拟合
-                mean_ret = portfolio_returns.mean() * 100
-                std_ret = portfolio_returns.std() * 100
-                x_norm = np.linspace(portfolio_returns.min() * 100, portfolio_returns.max() * 100, 100)
-                y_norm = np.exp(-0.5 * ((x_norm - mean_ret) / std_ret) ** 2) / (std_ret * np.sqrt(2 * np.pi))
-                y_norm = y_norm * len(portfolio_returns) * (x_norm[1] - x_norm[0])
+                # 添加正态分布拟合（按箱宽换算成频数，与柱高同一尺度）
+                # 均值/标准差各归约一次，下方统计卡片共用；密度的常数因子合并为一个标量
+                mean_ret = returns_pct.mean()
+                std_ret = returns_pct.std(ddof=1)
+                x_norm = np.linspace(edges[0], edges[-1], 100)
+                z = (x_norm - mean_ret) / std_ret
+                y_norm = np.exp(-0.5 * z * z)
+                y_norm *= len(returns_pct) * bin_width / (std_ret * math.sqrt(2 * math.pi))
                 
                 fig_dist.add_trace(go.Scatter(
                     x=x_norm,
@@ -3148,8 +3609,8 @@ if mode == "BACKTEST (Historical)":
                 
                 # 统计信息
                 col_stat1, col_stat2, col_stat3, col_stat4 = st.columns(4)
-                with col_stat1: st.metric("Mean Daily Return", f"{portfolio_returns.mean():.4%}")
-                with col_stat2: st.metric("Std Dev", f"{portfolio_returns.std():.4%}")
+                with col_stat1: st.metric("Mean Daily Return", f"{mean_ret / 100:.4%}")
+                with col_stat2: st.metric("Std Dev", f"{std_ret / 100:.4%}")
                 with col_stat3: st.metric("Skewness", f"{portfolio_returns.skew():.2f}")
                 with col_stat4: st.metric("Kurtosis", f"{portfolio_returns.kurtosis():.2f}")
             else:
@@ -3157,26 +3618,7 @@ if mode == "BACKTEST (Historical)":
         
         with chart_tabs[3]:
             # 详细说明
-            with st.expander("📖 什么是资产权重分析？", expanded=False):
-                st.markdown("""
-                **资产权重（Asset Weights）** 表示你的投资组合中每个资产占总投资的比例。
-                
-                **这个图表展示什么？**
-                - 📊 **堆叠面积图**：显示每个资产在组合中的权重如何随时间变化
-                - 📈 **Y轴（0-100%）**：表示权重百分比，总和始终为100%
-                - 📅 **X轴**：时间轴，显示回测期间
-                
-                **如何解读？**
-                - **固定权重策略**：各资产权重应该保持相对稳定，线条平直
-                - **目标风险策略**：权重会根据市场波动自动调整，线条会有波动
-                - **自适应再平衡**：权重只在偏离目标时调整，会有阶梯状变化
-                
-                **为什么重要？**
-                - ✅ 检查策略是否按预期执行
-                - ✅ 监控再平衡频率是否合理
-                - ✅ 发现权重异常波动
-                - ✅ 评估策略的稳定性
-                """)
+            render_help_expander("📖 什么是资产权重分析？", help_texts.ASSET_WEIGHTS_MD, key="help_asset_weights")
             
             st.caption("💡 **Asset Weights**: Shows how portfolio allocation changes over time. Stacked area chart displays weight distribution across assets. Monitor rebalancing frequency and weight stability.")
             # 资产权重热力图
@@ -3184,49 +3626,74 @@ if mode == "BACKTEST (Historical)":
                 full_result = st.session_state['bt_full_result']
                 weights_df = full_result.weights_history
                 
-                # 权重堆叠面积图
-                fig_weights = go.Figure()
-                for asset in full_result.asset_names:
-                    fig_weights.add_trace(go.Scatter(
-                        x=weights_df.index,
-                        y=weights_df[asset] * 100,
-                        mode='lines',
-                        name=asset,
-                        stackgroup='one',
-                        hovertemplate=f'{asset}: %{{y:.1f}}%<extra></extra>'
+                weights_arr = weights_df[full_result.asset_names].to_numpy(dtype=np.float64)
+                if len(weights_arr) > WEIGHTS_HEATMAP_THRESHOLD:
+                    # 长历史：等步长抽行后画成一张热力图（单个栅格），代替逐资产的堆叠面积曲线
+                    step = -(-len(weights_arr) // LTTB_MAX_POINTS)
+                    fig_weights = go.Figure(go.Heatmap(
+                        z=plot_array(weights_arr[::step].T, 100),
+                        x=weights_df.index[::step],
+                        y=list(full_result.asset_names),
+                        colorscale='Viridis',
+                        zmin=0, zmax=100,
+                        colorbar=dict(title="Weight %"),
+                        hovertemplate='%{y}: %{z:.1f}%<extra>%{x}</extra>'
                     ))
-                
-                fig_weights.update_layout(**get_chart_layout(400))
-                fig_weights.update_layout(
-                    title="Asset Allocation Over Time",
-                    yaxis=dict(title="Weight (%)", range=[0, 100]),
-                    xaxis=dict(title="Date")
-                )
+                    fig_weights.update_layout(**get_chart_layout(400))
+                    fig_weights.update_layout(
+                        title="Asset Allocation Over Time",
+                        xaxis=dict(title="Date")
+                    )
+                else:
+                    # 权重堆叠面积图：各资产须共用同一组采样点才能正确堆叠，按波动最大的资产权重做 LTTB 选点
+                    keep_w = lttb_indices(weights_arr[:, int(np.argmax(weights_arr.std(axis=0)))])
+                    weights_x = weights_df.index[keep_w]
+                    fig_weights = go.Figure()
+                    for col_idx, asset in enumerate(full_result.asset_names):
+                        fig_weights.add_trace(go.Scatter(
+                            x=weights_x,
+                            y=plot_array(weights_arr[keep_w, col_idx], 100),
+                            mode='lines',
+                            name=asset,
+                            stackgroup='one',
+                            hovertemplate=f'{asset}: %{{y:.1f}}%<extra></extra>'
+                        ))
+                    
+                    fig_weights.update_layout(**get_chart_layout(400))
+                    fig_weights.update_layout(
+                        title="Asset Allocation Over Time",
+                        yaxis=dict(title="Weight (%)", range=[0, 100]),
+                        xaxis=dict(title="Date")
+                    )
                 st.plotly_chart(fig_weights, use_container_width=True)
                 
-                # 平均权重和权重统计
+                # 平均权重和权重统计：四个按列归约各算一次，下面按资产位置取值
+                asset_names = list(full_result.asset_names)
+                w_avg = weights_arr.mean(axis=0)
+                w_min = weights_arr.min(axis=0)
+                w_max = weights_arr.max(axis=0)
+                w_std = weights_arr.std(axis=0, ddof=1)
                 col_w1, col_w2, col_w3, col_w4 = st.columns(4)
                 with col_w1:
                     st.markdown("**Average Weights**")
-                    for asset in full_result.asset_names:
-                        avg_weight = weights_df[asset].mean()
-                        st.metric(asset, f"{avg_weight:.1%}")
+                    for i, asset in enumerate(asset_names):
+                        st.metric(asset, f"{w_avg[i]:.1%}")
                 
                 with col_w2:
                     st.markdown("**Weight Range**")
-                    for asset in full_result.asset_names:
-                        weight_range = f"{weights_df[asset].min():.1%} - {weights_df[asset].max():.1%}"
-                        st.caption(f"{asset}: {weight_range}")
+                    for i, asset in enumerate(asset_names):
+                        st.caption(f"{asset}: {w_min[i]:.1%} - {w_max[i]:.1%}")
                 
                 with col_w3:
                     st.markdown("**Weight Std Dev**")
-                    for asset in full_result.asset_names:
-                        weight_std = weights_df[asset].std()
-                        st.metric(asset, f"{weight_std:.2%}")
+                    for i, asset in enumerate(asset_names):
+                        st.metric(asset, f"{w_std[i]:.2%}")
                 
                 with col_w4:
                     st.markdown("**Rebalancing Frequency**")
-                    rebal_count = (weights_df.diff().abs().sum(axis=1) > 0.01).sum()
+                    # 相邻两期权重变化的绝对值之和，直接在ndarray上算，不生成中间DataFrame
+                    turnover = np.abs(np.diff(weights_arr, axis=0)).sum(axis=1)
+                    rebal_count = int(np.count_nonzero(turnover > 0.01))
                     st.metric("Rebalances", f"{rebal_count}")
                     st.caption(f"Out of {len(weights_df)} periods")
                     st.caption("💡 Counts periods where weights changed >1%")
@@ -3235,224 +3702,18 @@ if mode == "BACKTEST (Historical)":
         
         with chart_tabs[4]:
             # 详细说明
-            with st.expander("📖 什么是滚动分析（Rolling Analysis）？", expanded=False):
-                st.markdown("""
-                **滚动分析** 使用一个固定大小的"时间窗口"来计算指标，窗口随时间向前移动，展示指标的变化趋势。
-                
-                **滚动窗口是什么？**
-                - 假设窗口大小是60天
-                - 第1-60天：计算这60天的指标
-                - 第2-61天：窗口向前移动1天，重新计算
-                - 第3-62天：继续移动...
-                - 这样可以得到每个时间点的"最近N天"的指标值
-                
-                **这个图表展示什么？**
-                - 📈 **滚动Sharpe比率**：风险调整后收益的变化趋势
-                - 📊 **滚动波动率**：风险水平的变化
-                - 📉 **滚动年化收益**：收益能力的变化
-                - ⚠️ **VaR/CVaR**：风险价值指标
-                
-                **如何调整窗口大小？**
-                - **小窗口（30-60天）**：反映短期趋势，更敏感，波动大
-                - **中等窗口（60-120天）**：平衡短期和长期，推荐使用
-                - **大窗口（180-252天）**：反映长期趋势，更平滑，但滞后
-                
-                **关键指标解释：**
-                - **滚动Sharpe比率**：
-                  - >1：风险调整后表现良好
-                  - <0：表现不佳，甚至不如无风险资产
-                  - 趋势上升：策略表现改善
-                - **滚动波动率**：
-                  - 上升：风险增加
-                  - 下降：风险降低
-                  - 稳定：风险可控
-                - **VaR (95%)**：在95%置信度下，预期最大损失
-                - **CVaR (95%)**：当损失超过VaR时，平均损失是多少
-                
-                **实际应用：**
-                - ✅ 识别策略表现的周期性变化
-                - ✅ 发现风险水平的波动
-                - ✅ 评估策略在不同市场环境下的表现
-                - ✅ 优化再平衡时机
-                
-                **相关性分析：**
-                - 如果显示相关性矩阵，可以查看资产之间的关联程度
-                - 相关性接近+1：资产同向运动（分散化效果差）
-                - 相关性接近-1：资产反向运动（分散化效果好）
-                - 相关性接近0：资产独立运动（理想状态）
-                """)
+            render_help_expander("📖 什么是滚动分析（Rolling Analysis）？", help_texts.ROLLING_ANALYSIS_MD, key="help_rolling_analysis")
             
             st.caption("💡 **Rolling Analysis**: Time-varying metrics using a rolling window. Adjust window size to see short-term vs long-term trends. Includes VaR/CVaR risk measures.")
-            # 滚动窗口分析
-            if portfolio_returns is not None and len(portfolio_returns) > 0:
-                window_size = st.slider("Rolling Window (days)", 30, 252, 60, 10,
-                                       help="Number of days to include in rolling calculations. Smaller windows show more recent trends.")
-                
-                # 计算滚动指标
-                rolling_returns = portfolio_returns.rolling(window=window_size)
-                rolling_sharpe = (rolling_returns.mean() * 252) / (rolling_returns.std() * np.sqrt(252))
-                rolling_vol = rolling_returns.std() * np.sqrt(252)
-                rolling_mean = rolling_returns.mean() * 252
-                
-                # 滚动Sharpe比率
-                fig_rolling_sharpe = go.Figure()
-                fig_rolling_sharpe.add_trace(go.Scatter(
-                    x=res.df.index[window_size-1:],
-                    y=rolling_sharpe[window_size-1:],
-                    mode='lines',
-                    name='Rolling Sharpe',
-                    line=dict(color=COLORS['gold'], width=2)
-                ))
-                fig_rolling_sharpe.add_hline(y=0, line_dash="dash", line_color=COLORS['text_sub'], opacity=0.5)
-                fig_rolling_sharpe.update_layout(**get_chart_layout(300))
-                fig_rolling_sharpe.update_layout(
-                    title=f"Rolling Sharpe Ratio ({window_size}-day window)",
-                    yaxis=dict(title="Sharpe Ratio")
-                )
-                st.plotly_chart(fig_rolling_sharpe, use_container_width=True)
-                
-                # 滚动波动率
-                fig_rolling_vol = go.Figure()
-                fig_rolling_vol.add_trace(go.Scatter(
-                    x=res.df.index[window_size-1:],
-                    y=rolling_vol[window_size-1:] * 100,
-                    mode='lines',
-                    name='Rolling Volatility',
-                    line=dict(color=COLORS['red'], width=2),
-                    fill='tozeroy',
-                    fillcolor='rgba(248, 81, 73, 0.1)'
-                ))
-                fig_rolling_vol.update_layout(**get_chart_layout(300))
-                fig_rolling_vol.update_layout(
-                    title=f"Rolling Volatility ({window_size}-day window)",
-                    yaxis=dict(title="Volatility (%)")
-                )
-                st.plotly_chart(fig_rolling_vol, use_container_width=True)
-                
-                # 滚动年化收益
-                fig_rolling_ret = go.Figure()
-                fig_rolling_ret.add_trace(go.Scatter(
-                    x=res.df.index[window_size-1:],
-                    y=rolling_mean[window_size-1:] * 100,
-                    mode='lines',
-                    name='Rolling Annualized Return',
-                    line=dict(color=COLORS['green'], width=2)
-                ))
-                fig_rolling_ret.add_hline(y=0, line_dash="dash", line_color=COLORS['text_sub'], opacity=0.5)
-                fig_rolling_ret.update_layout(**get_chart_layout(300))
-                fig_rolling_ret.update_layout(
-                    title=f"Rolling Annualized Return ({window_size}-day window)",
-                    yaxis=dict(title="Return (%)")
-                )
-                st.plotly_chart(fig_rolling_ret, use_container_width=True)
-                
-                # 滚动指标统计
-                col_r1, col_r2, col_r3, col_r4 = st.columns(4)
-                with col_r1:
-                    st.metric("Avg Rolling Sharpe", f"{rolling_sharpe[window_size-1:].mean():.2f}")
-                with col_r2:
-                    st.metric("Avg Rolling Vol", f"{rolling_vol[window_size-1:].mean():.2%}")
-                with col_r3:
-                    st.metric("Avg Rolling Return", f"{rolling_mean[window_size-1:].mean():.2%}")
-                with col_r4:
-                    # VaR和CVaR
-                    var_95 = np.percentile(portfolio_returns, 5)
-                    cvar_95 = portfolio_returns[portfolio_returns <= var_95].mean()
-                    st.metric("VaR (95%)", f"{var_95:.2%}", 
-                             help="Value at Risk: Worst expected loss at 95% confidence")
-                    st.caption(f"CVaR: {cvar_95:.2%}")
-                    st.caption("💡 CVaR = average loss when VaR is exceeded")
-                
-                # 相关性分析（如果有多个资产）
-                if 'bt_full_result' in st.session_state:
-                    full_result = st.session_state['bt_full_result']
-                    if len(full_result.asset_names) > 1 and 'bt_result' in st.session_state:
-                        st.markdown("---")
-                        st.markdown("##### Asset Correlation Analysis")
-                        
-                        # 获取市场数据计算相关性
-                        try:
-                            market_data = InvestSimBridge.load_market_data(uploaded_file if 'uploaded_file' in locals() else None)
-                            asset_returns = market_data.pct_change().dropna()
-                            
-                            if len(asset_returns.columns) > 1:
-                                corr_matrix = asset_returns.corr()
-                                
-                                # 相关性热力图
-                                import plotly.graph_objects as go
-                                fig_corr = go.Figure(data=go.Heatmap(
-                                    z=corr_matrix.values,
-                                    x=corr_matrix.columns,
-                                    y=corr_matrix.columns,
-                                    colorscale='RdBu',
-                                    zmid=0,
-                                    text=corr_matrix.round(2).values,
-                                    texttemplate='%{text}',
-                                    textfont={"size":10},
-                                    colorbar=dict(title="Correlation")
-                                ))
-                                fig_corr.update_layout(**get_chart_layout(400))
-                                fig_corr.update_layout(title="Asset Return Correlation Matrix")
-                                st.plotly_chart(fig_corr, use_container_width=True)
-                                st.caption("💡 **Correlation**: Values close to +1 indicate assets move together, -1 indicates opposite movements. Lower correlation = better diversification.")
-                        except:
-                            pass
-            else:
-                st.info("Returns data not available for rolling analysis.")
+            # 滚动窗口分析（独立片段：拖动窗口滑块只重跑本区）
+            render_rolling_analysis(portfolio_returns)
         
         with chart_tabs[5]:
             # 导出功能
             st.markdown("### Export Backtest Results")
             
             # 详细说明
-            with st.expander("📖 如何使用导出功能？", expanded=False):
-                st.markdown("""
-                **导出功能** 允许你将回测结果保存到本地文件，方便进一步分析和报告。
-                
-                **📊 Excel 导出（推荐）**
-                
-                Excel文件包含多个工作表，数据更完整：
-                
-                1. **NAV Data（净值数据表）**
-                   - Date：日期
-                   - Portfolio Value：组合净值
-                   - Drawdown：回撤值
-                   - 用途：绘制净值曲线、计算自定义指标
-                
-                2. **Weights History（权重历史表）**
-                   - Date：日期
-                   - 各资产列：每个资产在不同时间的权重
-                   - 用途：分析资产配置变化、验证再平衡效果
-                
-                3. **Metrics（指标汇总表）**
-                   - Metric：指标名称
-                   - Value：指标数值
-                   - 包含：总收益率、年化收益、Sharpe、Sortino、Calmar、最大回撤、波动率、VaR、CVaR等
-                   - 用途：快速查看所有关键指标、制作报告
-                
-                **📄 CSV 导出（简单格式）**
-                
-                CSV文件格式简单，易于导入其他工具：
-                - 包含：日期、组合净值、回撤
-                - 格式：逗号分隔，可用Excel、Python、R等打开
-                - 用途：快速数据交换、简单分析
-                
-                **使用建议：**
-                - ✅ **制作报告**：使用Excel，包含完整数据
-                - ✅ **进一步分析**：使用Excel，可以处理多个工作表
-                - ✅ **数据共享**：使用CSV，兼容性好
-                - ✅ **程序处理**：使用CSV，易于读取
-                
-                **文件命名：**
-                - 自动包含时间戳，避免覆盖
-                - 格式：`backtest_report_YYYYMMDD_HHMMSS.xlsx`
-                - 格式：`backtest_data_YYYYMMDD_HHMMSS.csv`
-                
-                **注意事项：**
-                - Excel导出需要安装openpyxl库
-                - 如果导出失败，请检查是否有足够权限
-                - 大文件可能需要较长时间生成
-                """)
+            render_help_expander("📖 如何使用导出功能？", help_texts.EXPORT_MD, key="help_export")
             
             st.caption("💡 **Export Options**: Download comprehensive backtest results in Excel (with multiple sheets including NAV data, weights history, and metrics) or CSV format for further analysis.")
             
@@ -3466,73 +3727,62 @@ if mode == "BACKTEST (Historical)":
             </div>
             """, unsafe_allow_html=True)
             
-            import io
-            from datetime import datetime
-            
             col_exp1, col_exp2, col_exp3 = st.columns(3)
             
             with col_exp1:
-                # Excel 导出
-                try:
-                    output = io.BytesIO()
-                    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                        # 净值数据
-                        nav_df = pd.DataFrame({
-                            'Date': res.df.index,
-                            'Portfolio Value': res.df['Portfolio'] if 'Portfolio' in res.df.columns else res.df.iloc[:, 0],
-                            'Drawdown': res.df['Drawdown']
-                        })
-                        nav_df.to_excel(writer, sheet_name='NAV Data', index=False)
-                        
-                        # 权重历史（如果有）
-                        if 'bt_full_result' in st.session_state:
-                            full_result = st.session_state['bt_full_result']
-                            weights_export = full_result.weights_history.copy()
-                            weights_export.index.name = 'Date'
-                            weights_export.to_excel(writer, sheet_name='Weights History')
-                        
-                        # 指标汇总
-                        metrics_df = pd.DataFrame({
-                            'Metric': ['Total Return', 'Annualized Return', 'Sharpe Ratio', 'Sortino Ratio', 
-                                      'Calmar Ratio', 'Max Drawdown', 'Volatility', 'Max DD Duration (days)',
-                                      'VaR (95%)', 'CVaR (95%)'],
-                            'Value': [
-                                metrics['total_return'],
-                                metrics.get('annualized_return', 0),
-                                metrics['sharpe'],
-                                sortino,
-                                calmar,
-                                metrics['max_dd'],
-                                metrics['volatility'],
-                                max_dd_duration,
-                                np.percentile(portfolio_returns, 5) if portfolio_returns is not None and len(portfolio_returns) > 0 else 0,
-                                portfolio_returns[portfolio_returns <= np.percentile(portfolio_returns, 5)].mean() if portfolio_returns is not None and len(portfolio_returns) > 0 else 0
-                            ]
-                        })
-                        metrics_df.to_excel(writer, sheet_name='Metrics', index=False)
+                # Excel 导出（点击下载时才组装并写出工作簿；回调在工作线程中运行，会话状态须在渲染时取出）
+                full_result = st.session_state.get('bt_full_result')
+                weights_history = full_result.weights_history if full_result is not None else None
+                
+                def excel_report_bytes() -> bytes:
+                    # 净值数据
+                    nav_df = pd.DataFrame({
+                        'Date': df.index,
+                        'Portfolio Value': nav,
+                        'Drawdown': dd
+                    })
+                    excel_sheets = [('NAV Data', nav_df, False)]
                     
+                    # 权重历史（如果有）
+                    if weights_history is not None:
+                        excel_sheets.append(('Weights History', weights_history.rename_axis('Date'), True))
+                    
+                    # 指标汇总
+                    metrics_df = pd.DataFrame({
+                        'Metric': ['Total Return', 'Annualized Return', 'Sharpe Ratio', 'Sortino Ratio', 
+                                  'Calmar Ratio', 'Max Drawdown', 'Volatility', 'Max DD Duration (days)',
+                                  'VaR (95%)', 'CVaR (95%)'],
+                        'Value': [
+                            metrics['total_return'],
+                            metrics.get('annualized_return', 0),
+                            metrics['sharpe'],
+                            sortino,
+                            calmar,
+                            metrics['max_dd'],
+                            metrics['volatility'],
+                            max_dd_duration,
+                            *(var_cvar(portfolio_returns.to_numpy()) if portfolio_returns is not None and len(portfolio_returns) > 0 else (0, 0))
+                        ]
+                    })
+                    excel_sheets.append(('Metrics', metrics_df, False))
+                    return build_excel_report(excel_sheets)
+                
+                if xlsxwriter is None and importlib.util.find_spec('openpyxl') is None:
+                    st.info("Please install xlsxwriter or openpyxl: pip install xlsxwriter")
+                else:
                     st.download_button(
                         label="📊 Download Excel Report",
-                        data=output.getvalue(),
+                        data=excel_report_bytes,
                         file_name=f"backtest_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                        mime="application/vnd.openpyxl-officedocument.spreadsheetml.sheet",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                         use_container_width=True
                     )
-                except Exception as e:
-                    st.error(f"Excel export failed: {str(e)}")
-                    st.info("Please install openpyxl: pip install openpyxl")
             
             with col_exp2:
-                # CSV 导出
-                csv_data = pd.DataFrame({
-                    'Date': res.df.index,
-                    'Portfolio Value': res.df['Portfolio'] if 'Portfolio' in res.df.columns else res.df.iloc[:, 0],
-                    'Drawdown': res.df['Drawdown']
-                })
-                csv_str = csv_data.to_csv(index=False)
+                # CSV 导出（点击下载时才生成；相同数据命中缓存）
                 st.download_button(
                     label="📄 Download CSV Data",
-                    data=csv_str,
+                    data=lambda: nav_csv_bytes(df.index.to_numpy(), nav.to_numpy(), dd),
                     file_name=f"backtest_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                     mime="text/csv",
                     use_container_width=True
@@ -3560,8 +3810,8 @@ if mode == "BACKTEST (Historical)":
                             "params": {"samples": len(st.session_state["bootstrap_returns"])}
                         }
                     
-                    # 生成报告
-                    report_markdown = generate_backtest_report_markdown(
+                    # 报告参数在脚本线程中取好；正文在点击下载时才由 Streamlit 在工作线程中生成，标签页渲染不再等待
+                    report_kwargs = dict(
                         strategy_name=strategy_name_global,
                         initial_capital=st.session_state.get("settings_initial_capital", 1000000),
                         leverage=st.session_state.get("settings_leverage", 1.0),
@@ -3570,13 +3820,14 @@ if mode == "BACKTEST (Historical)":
                         sortino=sortino,
                         calmar=calmar,
                         max_dd_duration=max_dd_duration,
-                        portfolio_returns=portfolio_returns.values if portfolio_returns is not None and hasattr(portfolio_returns, 'values') else (portfolio_returns if isinstance(portfolio_returns, np.ndarray) else None),
-                        input_model_info=input_model_info
+                        portfolio_returns=None if portfolio_returns is None else np.asarray(portfolio_returns),
+                        input_model_info=input_model_info,
+                        input_model_choice=input_model_choice
                     )
                     
                     st.download_button(
                         label="📝 Download Full Report (Markdown)",
-                        data=report_markdown.encode('utf-8'),
+                        data=lambda: generate_backtest_report_markdown(**report_kwargs).encode('utf-8'),
                         file_name=f"backtest_full_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
                         mime="text/markdown",
                         use_container_width=True,
@@ -3592,93 +3843,20 @@ if mode == "BACKTEST (Historical)":
         st.markdown("---")
         st.markdown("### 🎯 回测结论与决策建议")
         
-        # 生成综合评估
+        # 生成综合评估（评分、优势、关注点一次算好并缓存，下面只负责渲染）
+        conclusion = backtest_conclusion(
+            float(metrics['total_return']), float(metrics['sharpe']), float(metrics['max_dd']),
+            float(metrics['volatility']), float(sortino), float(calmar)
+        )
         conclusion_col1, conclusion_col2 = st.columns([2, 1])
         
         with conclusion_col1:
             # 综合评分（0-100）
-            score = 0
-            score_details = []
-            
-            # 收益评分（30分）
-            if metrics['total_return'] > 0.2:
-                ret_score = 30
-                ret_comment = "优秀"
-            elif metrics['total_return'] > 0.1:
-                ret_score = 20
-                ret_comment = "良好"
-            elif metrics['total_return'] > 0:
-                ret_score = 10
-                ret_comment = "一般"
-            else:
-                ret_score = 0
-                ret_comment = "亏损"
-            score += ret_score
-            score_details.append(f"收益表现：{ret_comment} (+{ret_score}分)")
-            
-            # 风险调整收益评分（30分）
-            sharpe_score = min(30, max(0, int(metrics['sharpe'] * 10)))
-            if metrics['sharpe'] > 1.5:
-                sharpe_comment = "优秀"
-            elif metrics['sharpe'] > 1.0:
-                sharpe_comment = "良好"
-            elif metrics['sharpe'] > 0.5:
-                sharpe_comment = "一般"
-            else:
-                sharpe_comment = "较差"
-            score += sharpe_score
-            score_details.append(f"风险调整收益：{sharpe_comment} (+{sharpe_score}分)")
-            
-            # 风险控制评分（20分）
-            if metrics['max_dd'] > -0.1:
-                risk_score = 20
-                risk_comment = "优秀"
-            elif metrics['max_dd'] > -0.2:
-                risk_score = 15
-                risk_comment = "良好"
-            elif metrics['max_dd'] > -0.3:
-                risk_score = 10
-                risk_comment = "一般"
-            else:
-                risk_score = 5
-                risk_comment = "较差"
-            score += risk_score
-            score_details.append(f"风险控制：{risk_comment} (+{risk_score}分)")
-            
-            # 稳定性评分（20分）
-            vol_score = max(0, 20 - int(metrics['volatility'] * 100))
-            if metrics['volatility'] < 0.1:
-                vol_comment = "非常稳定"
-            elif metrics['volatility'] < 0.15:
-                vol_comment = "较稳定"
-            elif metrics['volatility'] < 0.2:
-                vol_comment = "中等波动"
-            else:
-                vol_comment = "高波动"
-            score += vol_score
-            score_details.append(f"波动性：{vol_comment} (+{vol_score}分)")
-            
-            # 总体评价
-            if score >= 80:
-                overall_rating = "优秀 ⭐⭐⭐⭐⭐"
-                rating_color = "#3FB950"
-                recommendation = "强烈推荐"
-            elif score >= 65:
-                overall_rating = "良好 ⭐⭐⭐⭐"
-                rating_color = "#58A6FF"
-                recommendation = "推荐"
-            elif score >= 50:
-                overall_rating = "一般 ⭐⭐⭐"
-                rating_color = "#D29922"
-                recommendation = "可考虑"
-            elif score >= 35:
-                overall_rating = "较差 ⭐⭐"
-                rating_color = "#F85149"
-                recommendation = "需改进"
-            else:
-                overall_rating = "差 ⭐"
-                rating_color = "#F85149"
-                recommendation = "不推荐"
+            score = conclusion["score"]
+            score_details = conclusion["details"]
+            overall_rating = conclusion["rating"]
+            rating_color = conclusion["color"]
+            recommendation = conclusion["recommendation"]
             
             # 显示评分卡片
             st.markdown(f"""
@@ -3712,56 +3890,12 @@ if mode == "BACKTEST (Historical)":
         
         with advice_col1:
             st.markdown("##### ✅ 策略优势")
-            advantages = []
-            
-            if metrics['sharpe'] > 1.5:
-                advantages.append("**风险调整后收益优秀** - Sharpe比率超过1.5，说明策略在控制风险的同时获得了良好收益")
-            elif metrics['sharpe'] > 1.0:
-                advantages.append("**风险调整后收益良好** - Sharpe比率超过1.0，策略表现优于市场平均水平")
-            
-            if metrics['max_dd'] > -0.15:
-                advantages.append("**回撤控制良好** - 最大回撤小于15%，风险控制能力较强")
-            
-            if sortino > 1.5:
-                advantages.append("**下行风险控制优秀** - Sortino比率较高，说明策略在下跌时表现更好")
-            
-            if calmar > 1.0:
-                advantages.append("**收益回撤比优秀** - Calmar比率超过1.0，说明收益能力远强于最大损失")
-            
-            if metrics['volatility'] < 0.15:
-                advantages.append("**波动率较低** - 组合波动性较小，适合稳健型投资者")
-            
-            if not advantages:
-                advantages.append("策略表现中规中矩，无明显突出优势")
-            
-            for adv in advantages:
+            for adv in conclusion["advantages"]:
                 st.markdown(f"- {adv}")
         
         with advice_col2:
             st.markdown("##### ⚠️ 需要关注")
-            concerns = []
-            
-            if metrics['total_return'] < 0:
-                concerns.append("**出现亏损** - 总收益率为负，需要重新评估策略或市场环境")
-            elif metrics['total_return'] < 0.05:
-                concerns.append("**收益偏低** - 总收益率低于5%，可能不如无风险资产")
-            
-            if metrics['sharpe'] < 0.5:
-                concerns.append("**风险调整收益较差** - Sharpe比率低于0.5，风险收益比不理想")
-            
-            if metrics['max_dd'] < -0.3:
-                concerns.append("**回撤较大** - 最大回撤超过30%，风险较高，需要评估承受能力")
-            
-            if metrics['volatility'] > 0.25:
-                concerns.append("**波动率较高** - 组合波动性较大，可能不适合风险厌恶型投资者")
-            
-            if sortino < 0.5:
-                concerns.append("**下行风险控制不足** - Sortino比率较低，下跌时损失可能较大")
-            
-            if not concerns:
-                concerns.append("策略表现良好，无明显风险点")
-            
-            for concern in concerns:
+            for concern in conclusion["concerns"]:
                 st.markdown(f"- {concern}")
         
         # 策略适用性评估
@@ -3772,89 +3906,27 @@ if mode == "BACKTEST (Historical)":
         
         with suitability_col1:
             st.markdown("##### 📊 适合的投资者类型")
-            investor_types = []
-            
-            if metrics['volatility'] < 0.12 and metrics['max_dd'] > -0.15:
-                investor_types.append("✅ **风险厌恶型** - 低波动、低回撤")
-            
-            if metrics['sharpe'] > 1.0 and metrics['total_return'] > 0.1:
-                investor_types.append("✅ **平衡型** - 收益风险平衡")
-            
-            if metrics['total_return'] > 0.15 and metrics['sharpe'] > 1.2:
-                investor_types.append("✅ **成长型** - 追求较高收益")
-            
-            if not investor_types:
-                investor_types.append("⚠️ 需要根据个人风险偏好谨慎评估")
-            
-            for it in investor_types:
+            for it in conclusion["investor_types"]:
                 st.markdown(it)
         
         with suitability_col2:
             st.markdown("##### 📈 市场环境适应性")
-            market_conditions = []
-            
-            if metrics['sharpe'] > 1.0:
-                market_conditions.append("✅ **趋势市场** - 表现良好")
-            
-            if sortino > metrics['sharpe']:
-                market_conditions.append("✅ **震荡市场** - 下行风险控制好")
-            
-            if metrics['volatility'] < 0.15:
-                market_conditions.append("✅ **波动市场** - 稳定性好")
-            
-            if not market_conditions:
-                market_conditions.append("⚠️ 需要结合具体市场环境分析")
-            
-            for mc in market_conditions:
+            for mc in conclusion["market_conditions"]:
                 st.markdown(mc)
         
         with suitability_col3:
             st.markdown("##### 🔄 优化建议")
-            optimizations = []
-            
-            if metrics['sharpe'] < 1.0:
-                optimizations.append("💡 考虑调整策略参数以提高风险调整收益")
-            
-            if metrics['max_dd'] < -0.2:
-                optimizations.append("💡 增加风险控制措施，降低最大回撤")
-            
-            if metrics['volatility'] > 0.2:
-                optimizations.append("💡 考虑增加低波动资产以降低组合波动")
-            
-            if calmar < 0.5:
-                optimizations.append("💡 优化收益回撤比，提高策略效率")
-            
-            if not optimizations:
-                optimizations.append("✅ 策略表现良好，可继续使用")
-            
-            for opt in optimizations:
+            for opt in conclusion["optimizations"]:
                 st.markdown(opt)
         
         # 最终结论
         st.markdown("---")
         st.markdown("#### 📝 最终结论")
         
-        conclusion_text = f"""
-        **策略表现总结：**
-        
-        本次回测显示，{strategy_name_global}策略在测试期间取得了{'良好' if score >= 65 else '一般' if score >= 50 else '较差'}的表现。
-        
-        **核心发现：**
-        - 总收益率为 **{metrics['total_return']:.2%}**，{'表现优秀' if metrics['total_return'] > 0.15 else '表现良好' if metrics['total_return'] > 0.05 else '表现一般' if metrics['total_return'] > 0 else '出现亏损'}
-        - 风险调整后收益（Sharpe比率）为 **{metrics['sharpe']:.2f}**，{'优于市场平均水平' if metrics['sharpe'] > 1.0 else '低于市场平均水平'}
-        - 最大回撤为 **{metrics['max_dd']:.2%}**，{'风险控制良好' if metrics['max_dd'] > -0.15 else '风险控制一般' if metrics['max_dd'] > -0.25 else '风险较高'}
-        - 组合波动率为 **{metrics['volatility']:.2%}**，{'波动性较低' if metrics['volatility'] < 0.15 else '波动性中等' if metrics['volatility'] < 0.25 else '波动性较高'}
-        
-        **决策建议：**
-        {'✅ 该策略表现优秀，建议继续使用或适当增加配置' if score >= 80 else '✅ 该策略表现良好，可以继续使用' if score >= 65 else '⚠️ 该策略表现一般，建议优化参数或考虑其他策略' if score >= 50 else '❌ 该策略表现较差，建议重新评估或更换策略'}
-        
-        **风险提示：**
-        - 历史表现不代表未来收益
-        - 回测结果基于历史数据，实际投资可能面临不同市场环境
-        - 建议结合个人风险承受能力做出最终决策
-        """
-        
-        st.info(conclusion_text)
+        st.info(CONCLUSION_TMPL.format_map({**conclusion["words"], "strategy": strategy_name_global}))
+
+    if 'bt_result' in st.session_state:
+        render_backtest_results()
 
 # ------------------------------------------
 # SCENARIO B: 蒙特卡洛模拟 (Projection)
@@ -3891,7 +3963,6 @@ elif mode == "PROJECTION (Monte Carlo)":
     
     # 操作步骤指引
     st.markdown("### 📋 操作步骤")
-    step_col1, step_col2, step_col3, step_col4, step_col5 = st.columns(5)
     
     # 智能判断当前步骤
     if 'mc_result' in st.session_state:
@@ -3905,10 +3976,6 @@ elif mode == "PROJECTION (Monte Carlo)":
     else:
         current_step = 1  # 初始状态，需要选择策略
     
-    step_style_active = "background-color: rgba(210, 153, 34, 0.2); border: 2px solid #D29922; padding: 10px; border-radius: 8px; text-align: center;"
-    step_style_done = "background-color: rgba(63, 185, 80, 0.1); border: 2px solid #3FB950; padding: 10px; border-radius: 8px; text-align: center;"
-    step_style_pending = "background-color: rgba(139, 148, 158, 0.1); border: 2px solid #8B949E; padding: 10px; border-radius: 8px; text-align: center; opacity: 0.6;"
-    
     # 步骤状态判断
     step1_done = strategy_name_global and strategy_name_global in InvestSimBridge.get_available_strategies()
     step2_done = initial_capital > 0
@@ -3916,50 +3983,11 @@ elif mode == "PROJECTION (Monte Carlo)":
     step4_done = 'mc_result' in st.session_state or st.session_state.get("user_has_run_projection", False)
     step5_done = 'mc_result' in st.session_state
     
-    with step_col1:
-        if step1_done:
-            style = step_style_done if current_step > 1 else step_style_active
-            icon = "✅" if current_step > 1 else "🔄"
-        else:
-            style = step_style_active
-            icon = "📍"
-        st.markdown(f'<div style="{style}"><strong>{icon} 步骤 1</strong><br>选择策略</div>', unsafe_allow_html=True)
-    
-    with step_col2:
-        if step2_done:
-            style = step_style_done if current_step > 2 else (step_style_active if current_step == 2 else step_style_done)
-            icon = "✅" if current_step > 2 else ("🔄" if current_step == 2 else "✅")
-        else:
-            style = step_style_pending
-            icon = "⏳"
-        st.markdown(f'<div style="{style}"><strong>{icon} 步骤 2</strong><br>配置参数</div>', unsafe_allow_html=True)
-    
-    with step_col3:
-        if step3_done:
-            style = step_style_done if current_step > 3 else (step_style_active if current_step == 3 else step_style_done)
-            icon = "✅" if current_step > 3 else ("🔄" if current_step == 3 else "✅")
-        else:
-            style = step_style_pending
-            icon = "⏳"
-        st.markdown(f'<div style="{style}"><strong>{icon} 步骤 3</strong><br>设置模拟</div>', unsafe_allow_html=True)
-    
-    with step_col4:
-        if step4_done:
-            style = step_style_done if current_step > 4 else (step_style_active if current_step == 4 else step_style_done)
-            icon = "✅" if current_step > 4 else ("🔄" if current_step == 4 else "✅")
-        else:
-            style = step_style_pending
-            icon = "⏳"
-        st.markdown(f'<div style="{style}"><strong>{icon} 步骤 4</strong><br>运行模拟</div>', unsafe_allow_html=True)
-    
-    with step_col5:
-        if step5_done:
-            style = step_style_done
-            icon = "✅"
-        else:
-            style = step_style_pending
-            icon = "⏳"
-        st.markdown(f'<div style="{style}"><strong>{icon} 步骤 5</strong><br>查看结果</div>', unsafe_allow_html=True)
+    render_step_indicator(
+        current_step,
+        [step1_done, step2_done, step3_done, step4_done, step5_done],
+        ["选择策略", "配置参数", "设置模拟", "运行模拟", "查看结果"],
+    )
     
     st.markdown("---")
     
@@ -3977,6 +4005,8 @@ elif mode == "PROJECTION (Monte Carlo)":
         with col_file:
             uploaded_file_projection = st.file_uploader("Upload Historical Data (CSV)", type=['csv'], 
                                                          key="projection_upload", label_visibility="collapsed")
+            # 本页各处（预览、数据信息、分布预览、参数拟合）都按这份字节命中同一组缓存
+            projection_file_bytes = uploaded_file_projection.getvalue() if uploaded_file_projection else None
             if not uploaded_file_projection:
                 st.caption("💡 Using default parameters for return distribution.")
                 st.caption("📝 **提示**：上传历史数据可以更准确地拟合收益分布，特别是使用Bootstrap模式时")
@@ -3984,7 +4014,7 @@ elif mode == "PROJECTION (Monte Carlo)":
                 st.success("✅ 数据已上传，将用于拟合收益分布")
                 # 预览数据
                 try:
-                    preview_df = pd.read_csv(uploaded_file_projection, index_col=0, parse_dates=True, nrows=5)
+                    preview_df = load_market_data_cached(projection_file_bytes)
                     st.caption(f"📊 数据预览：{len(preview_df.columns)} 个资产，前5行数据")
                 except:
                     st.warning("⚠️ 数据格式可能不正确，请检查CSV格式")
@@ -3992,7 +4022,7 @@ elif mode == "PROJECTION (Monte Carlo)":
         with col_data_info:
             if uploaded_file_projection:
                 try:
-                    data_info = pd.read_csv(uploaded_file_projection, index_col=0, parse_dates=True)
+                    data_info = load_market_data_cached(projection_file_bytes)
                     st.markdown("**数据信息**")
                     st.caption(f"资产数量: {len(data_info.columns)}")
                     st.caption(f"数据点: {len(data_info)}")
@@ -4032,34 +4062,13 @@ elif mode == "PROJECTION (Monte Carlo)":
                 }
             elif input_model_choice_from_modeling == "Bootstrap" and st.session_state.get("bootstrap_returns") is not None:
                 has_input_modeling = True
-                bootstrap_returns = st.session_state.get("bootstrap_returns")
-                # 处理不同的数据类型
-                if isinstance(bootstrap_returns, np.ndarray):
-                    if len(bootstrap_returns) > 0:
-                        input_modeling_info = {
-                            "type": "Bootstrap",
-                            "params": {"historical_returns": bootstrap_returns.tolist() if hasattr(bootstrap_returns, 'tolist') else bootstrap_returns.tolist()},
-                            "source": "输入建模"
-                        }
-                elif isinstance(bootstrap_returns, (list, tuple)):
-                    if len(bootstrap_returns) > 0:
-                        input_modeling_info = {
-                            "type": "Bootstrap",
-                            "params": {"historical_returns": list(bootstrap_returns)},
-                            "source": "输入建模"
-                        }
-                else:
-                    # 尝试转换
-                    try:
-                        bootstrap_array = np.array(bootstrap_returns)
-                        if len(bootstrap_array) > 0:
-                            input_modeling_info = {
-                                "type": "Bootstrap",
-                                "params": {"historical_returns": bootstrap_array.tolist()},
-                                "source": "输入建模"
-                            }
-                    except:
-                        pass
+                hist = as_return_samples(st.session_state["bootstrap_returns"])
+                if hist.size > 0:
+                    input_modeling_info = {
+                        "type": "Bootstrap",
+                        "params": {"historical_returns": hist},
+                        "source": "输入建模"
+                    }
         
         input_choices = ["Normal", "Student-t", "Bootstrap"]
         
@@ -4173,32 +4182,33 @@ elif mode == "PROJECTION (Monte Carlo)":
                 if uploaded_file_projection is not None or st.session_state.get("bootstrap_returns") is not None:
                     try:
                         if uploaded_file_projection is not None:
-                            market_data = InvestSimBridge.load_market_data(uploaded_file_projection)
-                            returns = market_data.pct_change().dropna()
-                            sample_returns = returns.values.flatten()
-                            sample_returns = sample_returns[~np.isnan(sample_returns)]
+                            sample_returns = pooled_returns_cached(projection_file_bytes)
                         else:
                             sample_returns = st.session_state.get("bootstrap_returns", np.array([]))
                         
                         if len(sample_returns) > 0:
-                            mean_ret = np.mean(sample_returns)
-                            std_ret = np.std(sample_returns)
+                            moments = returns_moments(sample_returns)
+                            mean_ret = moments["mean"]
+                            std_ret = moments["std"]
                             
-                            # 生成正态分布曲线
-                            x = np.linspace(sample_returns.min(), sample_returns.max(), 100)
+                            # 服务端分箱后只把柱子发给前端；正态曲线按箱宽换算成频数，与柱高同一尺度
+                            counts, edges = returns_histogram(sample_returns)
+                            bin_width = edges[1] - edges[0]
+                            x = np.linspace(edges[0], edges[-1], 100)
                             y = (1 / (std_ret * np.sqrt(2 * np.pi))) * np.exp(-0.5 * ((x - mean_ret) / std_ret) ** 2)
                             
                             fig_normal = go.Figure()
-                            fig_normal.add_trace(go.Histogram(
-                                x=sample_returns,
+                            fig_normal.add_trace(go.Bar(
+                                x=edges[:-1] + bin_width / 2,
+                                y=counts,
+                                width=bin_width,
                                 name="历史收益率",
                                 opacity=0.6,
-                                nbinsx=50,
                                 marker_color=COLORS["blue"]
                             ))
                             fig_normal.add_trace(go.Scatter(
                                 x=x,
-                                y=y * len(sample_returns) * (x[1] - x[0]),
+                                y=y * len(sample_returns) * bin_width,
                                 name="正态分布拟合",
                                 line=dict(color=COLORS["gold"], width=2)
                             ))
@@ -4243,23 +4253,7 @@ elif mode == "PROJECTION (Monte Carlo)":
                 
                 # 可视化t分布 vs 正态分布
                 try:
-                    x = np.linspace(-0.1, 0.1, 200)
-                    normal_y = (1 / (0.02 * np.sqrt(2 * np.pi))) * np.exp(-0.5 * (x / 0.02) ** 2)
-                    t_y = (1 / (0.02 * np.sqrt(5 * np.pi))) * (1 + (x / 0.02) ** 2 / 5) ** (-3)
-                    
-                    fig_t = go.Figure()
-                    fig_t.add_trace(go.Scatter(x=x, y=normal_y, name="正态分布", line=dict(color=COLORS["blue"])))
-                    fig_t.add_trace(go.Scatter(x=x, y=t_y, name="Student-t分布 (df=5)", line=dict(color=COLORS["gold"])))
-                    fig_t.update_layout(
-                        title="正态分布 vs Student-t分布（厚尾对比）",
-                        xaxis_title="收益率",
-                        yaxis_title="概率密度",
-                        template="plotly_dark",
-                        height=300,
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        plot_bgcolor='rgba(0,0,0,0)',
-                    )
-                    st.plotly_chart(fig_t, use_container_width=True)
+                    st.plotly_chart(t_vs_normal_figure(), use_container_width=True)
                     st.caption("💡 t分布的尾部更厚，能更好地捕捉极端事件")
                 except:
                     pass
@@ -4298,30 +4292,32 @@ elif mode == "PROJECTION (Monte Carlo)":
                 if uploaded_file_projection is not None or st.session_state.get("bootstrap_returns") is not None:
                     try:
                         if uploaded_file_projection is not None:
-                            market_data = InvestSimBridge.load_market_data(uploaded_file_projection)
-                            returns = market_data.pct_change().dropna()
-                            bootstrap_returns = returns.values.flatten()
-                            bootstrap_returns = bootstrap_returns[~np.isnan(bootstrap_returns)]
+                            bootstrap_returns = pooled_returns_cached(projection_file_bytes)
                         else:
                             bootstrap_returns = st.session_state.get("bootstrap_returns", np.array([]))
                         
                         if len(bootstrap_returns) > 0:
+                            moments = returns_moments(bootstrap_returns)
                             col_stat1, col_stat2, col_stat3, col_stat4 = st.columns(4)
                             with col_stat1:
-                                st.metric("数据点数", f"{len(bootstrap_returns):,}")
+                                st.metric("数据点数", f"{moments['n']:,}")
                             with col_stat2:
-                                st.metric("均值", f"{np.mean(bootstrap_returns):.4f}")
+                                st.metric("均值", f"{moments['mean']:.4f}")
                             with col_stat3:
-                                st.metric("标准差", f"{np.std(bootstrap_returns):.4f}")
+                                st.metric("标准差", f"{moments['std']:.4f}")
                             with col_stat4:
-                                st.metric("偏度", f"{float(pd.Series(bootstrap_returns).skew()):.2f}")
+                                st.metric("偏度", f"{moments['skew']:.2f}")
                             
                             # 显示历史收益率分布
+                            # 与正态预览共用同一份缓存的分箱结果
+                            counts, edges = returns_histogram(bootstrap_returns)
+                            bin_width = edges[1] - edges[0]
                             fig_bootstrap = go.Figure()
-                            fig_bootstrap.add_trace(go.Histogram(
-                                x=bootstrap_returns,
+                            fig_bootstrap.add_trace(go.Bar(
+                                x=edges[:-1] + bin_width / 2,
+                                y=counts,
+                                width=bin_width,
                                 name="历史收益率分布",
-                                nbinsx=50,
                                 marker_color=COLORS["green"]
                             ))
                             fig_bootstrap.update_layout(
@@ -4376,8 +4372,7 @@ elif mode == "PROJECTION (Monte Carlo)":
             checklist_status.append(False)
         
         # 显示检查清单
-        for item in checklist_items:
-            st.markdown(f"- {item}")
+        st.markdown("\n".join(f"- {item}" for item in checklist_items))
         
         # 状态提示
         if all(checklist_status):
@@ -4420,8 +4415,7 @@ elif mode == "PROJECTION (Monte Carlo)":
                 elif uploaded_file_projection is not None:
                     # 如果上传了数据，尝试从数据中拟合参数
                     try:
-                        market_data = InvestSimBridge.load_market_data(uploaded_file_projection)
-                        returns = market_data.pct_change().dropna()
+                        returns = market_returns_cached(projection_file_bytes)
                         mean_return = returns.mean().mean()
                         vol_return = returns.std().mean()
                         dist_params = {"mean": mean_return, "vol": vol_return}
@@ -4448,22 +4442,16 @@ elif mode == "PROJECTION (Monte Carlo)":
                 # 优先使用输入建模的Bootstrap数据
                 bootstrap_returns = st.session_state.get("bootstrap_returns")
                 if bootstrap_returns is not None and len(bootstrap_returns) > 0:
-                    if isinstance(bootstrap_returns, np.ndarray):
-                        dist_params = {"historical_returns": bootstrap_returns.tolist()}
-                    else:
-                        dist_params = {"historical_returns": bootstrap_returns}
+                    dist_params = {"historical_returns": as_return_samples(bootstrap_returns)}
                     used_input_modeling = True
                     st.success(f"✅ **使用输入建模的Bootstrap数据**（{len(bootstrap_returns):,} 个历史收益率样本，来自标的物价格数据）")
                     st.info("💡 将使用此历史收益率分布生成未来收益率，模拟标的物价格走向，然后评估策略表现。")
                 elif uploaded_file_projection is not None:
                     # 如果上传了数据，尝试从数据中提取
                     try:
-                        market_data = InvestSimBridge.load_market_data(uploaded_file_projection)
-                        returns = market_data.pct_change().dropna()
-                        bootstrap_returns = returns.values.flatten()
-                        bootstrap_returns = bootstrap_returns[~np.isnan(bootstrap_returns)]
+                        bootstrap_returns = pooled_returns_cached(projection_file_bytes)
                         if len(bootstrap_returns) > 0:
-                            dist_params = {"historical_returns": bootstrap_returns.tolist()}
+                            dist_params = {"historical_returns": as_return_samples(bootstrap_returns)}
                             st.info(f"✅ 从上传的数据中提取Bootstrap样本（{len(bootstrap_returns):,} 个）")
                         else:
                             raise ValueError("No valid returns found")
@@ -4550,13 +4538,13 @@ elif mode == "PROJECTION (Monte Carlo)":
                 elif dist_name == "empirical_bootstrap":
                     hist_returns = params.get("historical_returns", [])
                     if len(hist_returns) > 0:
-                        hist_arr = np.array(hist_returns)
+                        hist_moments = returns_moments(np.asarray(hist_returns))
                         st.markdown(f"""
                         **参数：**
                         - 历史数据点数：{len(hist_returns):,}
-                        - 历史均值：{np.mean(hist_arr):.6f} ({np.mean(hist_arr)*252:.2%} 年化)
-                        - 历史标准差：{np.std(hist_arr):.6f} ({np.std(hist_arr)*np.sqrt(252):.2%} 年化)
-                        - 历史偏度：{float(pd.Series(hist_arr).skew()):.2f}
+                        - 历史均值：{hist_moments["mean"]:.6f} ({hist_moments["mean"]*252:.2%} 年化)
+                        - 历史标准差：{hist_moments["std"]:.6f} ({hist_moments["std"]*np.sqrt(252):.2%} 年化)
+                        - 历史偏度：{hist_moments["skew"]:.2f}
                         """)
             
             with model_info_col2:
@@ -4599,9 +4587,8 @@ elif mode == "PROJECTION (Monte Carlo)":
         
         res = st.session_state['mc_result']
         final_values = res['paths'][-1]
-        median_val = np.median(final_values)
-        p05_val = np.percentile(final_values, 5)
-        p95_val = np.percentile(final_values, 95)
+        # 终值分位数直接取分位路径的最后一列
+        p05_val, p25_val, median_val, p75_val, p95_val = res['fan'][:, -1]
         breakeven_balance = initial_capital + annual_cont * sim_years
         gain = (median_val / breakeven_balance) - 1
         
@@ -4660,7 +4647,7 @@ elif mode == "PROJECTION (Monte Carlo)":
                 """)
             
             st.caption("💡 **Path Simulation**: Shows projected wealth paths with confidence intervals. Wider fan = more uncertainty.")
-        st.plotly_chart(plot_monte_carlo_fan(res['dates'], res['paths'], res['median']), use_container_width=True)
+        st.plotly_chart(plot_monte_carlo_fan(res['dates'], res['fan']), use_container_width=True)
         st.caption(describe_input_model(res.get("input_model")))
         
         with chart_tabs[1]:  # Distribution Analysis
@@ -4721,10 +4708,9 @@ elif mode == "PROJECTION (Monte Carlo)":
             
             # 正态分布拟合
             try:
-                from scipy import stats  # pyright: ignore[reportMissingImports]
-                mu, sigma = stats.norm.fit(final_values)
+                mu, sigma = scipy_stats.norm.fit(final_values)
                 x_norm = np.linspace(final_values.min(), final_values.max(), 100)
-                y_norm = stats.norm.pdf(x_norm, mu, sigma) * len(final_values) * (final_values.max() - final_values.min()) / 50
+                y_norm = scipy_stats.norm.pdf(x_norm, mu, sigma) * len(final_values) * (final_values.max() - final_values.min()) / 50
                 fig_dist.add_trace(go.Scatter(
                     x=x_norm,
                     y=y_norm,
@@ -4753,8 +4739,6 @@ elif mode == "PROJECTION (Monte Carlo)":
             
             with col_dist2:
                 st.markdown("**分位数**")
-                p25_val = np.percentile(final_values, 25)
-                p75_val = np.percentile(final_values, 75)
                 st.metric("25%", f"${p25_val:,.0f}")
                 st.metric("75%", f"${p75_val:,.0f}")
                 st.metric("95%", f"${p95_val:,.0f}")
@@ -4762,9 +4746,8 @@ elif mode == "PROJECTION (Monte Carlo)":
             with col_dist3:
                 st.markdown("**分布特征**")
                 try:
-                    from scipy import stats  # pyright: ignore[reportMissingImports]
-                    skewness = stats.skew(final_values)
-                    kurtosis = stats.kurtosis(final_values)
+                    skewness = scipy_stats.skew(final_values)
+                    kurtosis = scipy_stats.kurtosis(final_values)
                     st.metric("Skewness", f"{skewness:.2f}")
                     st.metric("Kurtosis", f"{kurtosis:.2f}")
                     cv = std_val / mean_val if mean_val > 0 else 0
@@ -4901,11 +4884,8 @@ elif mode == "PROJECTION (Monte Carlo)":
             
             st.caption("💡 **Scenario Analysis**: Shows different percentile paths to understand various possible outcomes.")
             
-            # 计算不同分位数的路径
-            p05_path = np.percentile(res['paths'], 5, axis=1)
-            p25_path = np.percentile(res['paths'], 25, axis=1)
-            p75_path = np.percentile(res['paths'], 75, axis=1)
-            p95_path = np.percentile(res['paths'], 95, axis=1)
+            # 不同分位数的路径（模拟结束时已算好）
+            p05_path, p25_path, _, p75_path, p95_path = res['fan']
             
             fig_scenario = go.Figure()
             
@@ -5216,7 +5196,7 @@ elif mode == "PROJECTION (Monte Carlo)":
 - 总收益率：{metrics.get('total_return', 0):.2%}
 - 年化收益率：{metrics.get('annualized_return', 0):.2%}
 - Sharpe比率：{metrics.get('sharpe', 0):.2f}
-- 最大回撤：{metrics.get('max_drawdown', 0):.2%}
+- 最大回撤：{metrics.get('max_dd', 0):.2%}
 - 波动率：{metrics.get('volatility', 0):.2%}
 - VaR (95%)：{metrics.get('var_95', 0):.2%}
 - CVaR (95%)：{metrics.get('cvar_95', 0):.2%}
@@ -5438,7 +5418,6 @@ elif mode == "PROJECTION (Monte Carlo)":
                     st.success("✅ 报告已生成！点击上方按钮下载完整流程报告。")
                     
                 except Exception as e:
-                    import traceback
                     st.error(f"报告生成失败：{str(e)}")
                     st.caption(f"错误详情：{traceback.format_exc()}")
             else:
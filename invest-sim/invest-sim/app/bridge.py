@@ -58,6 +58,7 @@ class InvestSimBridge:
     _DEFAULT_SIM_YEARS = 10
     _DEFAULT_SIM_REBAL_FREQ = 12
     _DEFAULT_BT_REBAL_FREQ = 21  # about monthly on daily data
+    _FAN_PERCENTILES = (5, 25, 50, 75, 95)  # fan-chart bands; index 2 is the median path
 
     @classmethod
     def get_available_strategies(cls) -> List[str]:
@@ -89,12 +90,24 @@ class InvestSimBridge:
         result = simulator.run()
         return cls._format_forward_result(result)
 
+    @staticmethod
+    def fan_bands(paths: np.ndarray) -> np.ndarray:
+        """Returns the 5/25/50/75/95 fan bands of a (trials, steps) path matrix in one pass; row 2 is the median."""
+        return np.percentile(paths, InvestSimBridge._FAN_PERCENTILES, axis=0)
+
     @classmethod
     def run_backtest(cls, params: Dict[str, Any], market_data: pd.DataFrame) -> BacktestBridgeResult:
+        return cls.run_backtest_with_result(params, market_data)[0]
+
+    @classmethod
+    def run_backtest_with_result(
+        cls, params: Dict[str, Any], market_data: pd.DataFrame
+    ) -> tuple[BacktestBridgeResult, Any]:
+        """Runs the backtest once and returns both the UI summary and the raw engine result."""
         config = cls._build_backtest_config(params, market_data)
         backtester = Backtester(config)
         result = backtester.run(market_data)
-        return cls._format_backtest_result(result, risk_free=params.get("risk_free", 0.0))
+        return cls._format_backtest_result(result, risk_free=params.get("risk_free", 0.0)), result
 
     # ------------------------------------------------------------------
     # Internal helpers
@@ -201,12 +214,13 @@ class InvestSimBridge:
     def _format_forward_result(result) -> Dict[str, Any]:
         dates = InvestSimBridge._projection_dates(result.timeline_years)
         paths = result.trajectories.T  # shape: (periods, trials)
-        median_path = np.median(result.trajectories, axis=0)
+        fan = InvestSimBridge.fan_bands(result.trajectories)
         risk_metrics = result.risk_metrics()
         return {
             "dates": dates,
             "paths": paths,
-            "median": median_path,
+            "median": fan[2],
+            "fan": fan,
             "quantiles": result.quantiles(),
             "risk_metrics": risk_metrics,
             "input_model": result.input_model,
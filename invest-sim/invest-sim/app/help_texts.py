@@ -0,0 +1,257 @@
+"""回测结果页各标签页及侧边栏帮助面板的说明文字（静态 Markdown）"""
+
+METRIC_DEFINITIONS_MD = """
+**Total Return**: Cumulative return over the entire backtest period  
+**Sharpe Ratio**: Risk-adjusted return (higher is better, typically >1 is good)  
+**Sortino Ratio**: Downside risk-adjusted return (only penalizes negative volatility)  
+**Calmar Ratio**: Annual return divided by maximum drawdown (higher is better)  
+**Max Drawdown**: Largest peak-to-trough decline (lower is better)  
+**Volatility**: Annualized standard deviation of returns (measures risk)
+"""
+
+NAV_CURVE_MD = """
+**净值（Net Asset Value, NAV）** 是投资组合的总价值，反映你的投资表现。
+
+**这个图表展示什么？**
+- 📈 **主图**：显示投资组合价值随时间的变化曲线
+- 📉 **侧边小图**：显示回撤情况（从峰值下降的幅度）
+
+**如何解读？**
+- **上升趋势**：组合价值增长，投资表现良好
+- **下降趋势**：组合价值减少，可能处于市场下跌期
+- **波动幅度**：曲线越平滑，风险越小；波动越大，风险越高
+
+**关键观察点：**
+- ✅ **最终价值 vs 初始价值**：判断总体盈亏
+- ✅ **增长趋势**：是否持续向上
+- ✅ **波动特征**：是否频繁大幅波动
+- ✅ **回撤幅度**：侧边图显示最大回撤
+
+**实际应用：**
+- 评估策略的长期表现
+- 识别最佳和最差表现时期
+- 对比不同策略的效果
+"""
+
+DRAWDOWN_MD = """
+**回撤（Drawdown）** 是指投资组合价值从历史最高点下降的幅度，是衡量风险的重要指标。
+
+**回撤如何计算？**
+- 找到每个时间点的历史最高净值（峰值）
+- 计算当前净值相对于峰值的下降百分比
+- 公式：回撤 = (当前净值 - 历史峰值) / 历史峰值
+
+**这个图表展示什么？**
+- 📉 **红色填充区域**：显示回撤的深度和持续时间
+- 📊 **回撤值**：负值表示下降，0%表示在历史高点
+- ⏱️ **持续时间**：回撤持续的天数
+
+**如何解读？**
+- **最大回撤**：整个回测期间的最大跌幅（越小越好）
+- **回撤持续时间**：从峰值到恢复的时间（越短越好）
+- **平均回撤**：所有回撤期的平均值
+- **>5%回撤次数**：严重回撤发生的频率
+
+**为什么重要？**
+- ⚠️ **风险控制**：了解最坏情况下的损失
+- 📊 **心理承受**：评估能否承受最大回撤
+- 🔄 **恢复能力**：观察组合从回撤中恢复的速度
+- 📈 **策略优化**：通过回撤数据改进策略
+
+**实际例子：**
+- 如果最大回撤是 -20%，意味着在最坏情况下，你的投资可能损失20%
+- 如果回撤持续100天，意味着需要100天才能恢复到之前的峰值
+"""
+
+RETURNS_DISTRIBUTION_MD = """
+**收益率分布** 显示投资组合每日收益率的统计特征，帮助理解收益的分布规律和风险特征。
+
+**这个图表展示什么？**
+- 📊 **直方图（金色）**：显示不同收益率区间的出现频率
+- 📈 **正态分布拟合线（蓝色虚线）**：理论上的正态分布曲线
+- 📉 **对比分析**：实际分布 vs 理论分布
+
+**关键统计指标：**
+- **平均日收益（Mean）**：所有日收益率的平均值
+- **标准差（Std Dev）**：收益率的波动程度，越大风险越高
+- **偏度（Skewness）**：
+  - 接近0：分布对称
+  - >0：右偏，有更多正收益（好）
+  - <0：左偏，有更多负收益（风险）
+- **峰度（Kurtosis）**：
+  - 接近3：接近正态分布
+  - >3：尖峰，极端收益更多（高风险）
+  - <3：平峰，收益更分散
+
+**如何解读？**
+- **理想分布**：接近正态分布，偏度接近0，峰度接近3
+- **右偏分布**：更多正收益，但可能有极端负收益
+- **左偏分布**：更多负收益，风险较高
+- **尖峰分布**：极端收益（大涨大跌）较多
+
+**实际应用：**
+- ✅ 评估收益的稳定性
+- ✅ 识别异常收益模式
+- ✅ 预测未来收益概率
+- ✅ 优化风险管理策略
+
+**风险提示：**
+- 如果分布严重左偏或峰度很高，说明策略可能存在极端风险
+- 正态分布拟合可以帮助识别实际分布与理论的偏差
+"""
+
+ASSET_WEIGHTS_MD = """
+**资产权重（Asset Weights）** 表示你的投资组合中每个资产占总投资的比例。
+
+**这个图表展示什么？**
+- 📊 **堆叠面积图**：显示每个资产在组合中的权重如何随时间变化
+- 📈 **Y轴（0-100%）**：表示权重百分比，总和始终为100%
+- 📅 **X轴**：时间轴，显示回测期间
+
+**如何解读？**
+- **固定权重策略**：各资产权重应该保持相对稳定，线条平直
+- **目标风险策略**：权重会根据市场波动自动调整，线条会有波动
+- **自适应再平衡**：权重只在偏离目标时调整，会有阶梯状变化
+
+**为什么重要？**
+- ✅ 检查策略是否按预期执行
+- ✅ 监控再平衡频率是否合理
+- ✅ 发现权重异常波动
+- ✅ 评估策略的稳定性
+"""
+
+ROLLING_ANALYSIS_MD = """
+**滚动分析** 使用一个固定大小的"时间窗口"来计算指标，窗口随时间向前移动，展示指标的变化趋势。
+
+**滚动窗口是什么？**
+- 假设窗口大小是60天
+- 第1-60天：计算这60天的指标
+- 第2-61天：窗口向前移动1天，重新计算
+- 第3-62天：继续移动...
+- 这样可以得到每个时间点的"最近N天"的指标值
+
+**这个图表展示什么？**
+- 📈 **滚动Sharpe比率**：风险调整后收益的变化趋势
+- 📊 **滚动波动率**：风险水平的变化
+- 📉 **滚动年化收益**：收益能力的变化
+- ⚠️ **VaR/CVaR**：风险价值指标
+
+**如何调整窗口大小？**
+- **小窗口（30-60天）**：反映短期趋势，更敏感，波动大
+- **中等窗口（60-120天）**：平衡短期和长期，推荐使用
+- **大窗口（180-252天）**：反映长期趋势，更平滑，但滞后
+
+**关键指标解释：**
+- **滚动Sharpe比率**：
+  - >1：风险调整后表现良好
+  - <0：表现不佳，甚至不如无风险资产
+  - 趋势上升：策略表现改善
+- **滚动波动率**：
+  - 上升：风险增加
+  - 下降：风险降低
+  - 稳定：风险可控
+- **VaR (95%)**：在95%置信度下，预期最大损失
+- **CVaR (95%)**：当损失超过VaR时，平均损失是多少
+
+**实际应用：**
+- ✅ 识别策略表现的周期性变化
+- ✅ 发现风险水平的波动
+- ✅ 评估策略在不同市场环境下的表现
+- ✅ 优化再平衡时机
+
+**相关性分析：**
+- 如果显示相关性矩阵，可以查看资产之间的关联程度
+- 相关性接近+1：资产同向运动（分散化效果差）
+- 相关性接近-1：资产反向运动（分散化效果好）
+- 相关性接近0：资产独立运动（理想状态）
+"""
+
+EXPORT_MD = """
+**导出功能** 允许你将回测结果保存到本地文件，方便进一步分析和报告。
+
+**📊 Excel 导出（推荐）**
+
+Excel文件包含多个工作表，数据更完整：
+
+1. **NAV Data（净值数据表）**
+   - Date：日期
+   - Portfolio Value：组合净值
+   - Drawdown：回撤值
+   - 用途：绘制净值曲线、计算自定义指标
+
+2. **Weights History（权重历史表）**
+   - Date：日期
+   - 各资产列：每个资产在不同时间的权重
+   - 用途：分析资产配置变化、验证再平衡效果
+
+3. **Metrics（指标汇总表）**
+   - Metric：指标名称
+   - Value：指标数值
+   - 包含：总收益率、年化收益、Sharpe、Sortino、Calmar、最大回撤、波动率、VaR、CVaR等
+   - 用途：快速查看所有关键指标、制作报告
+
+**📄 CSV 导出（简单格式）**
+
+CSV文件格式简单，易于导入其他工具：
+- 包含：日期、组合净值、回撤
+- 格式：逗号分隔，可用Excel、Python、R等打开
+- 用途：快速数据交换、简单分析
+
+**使用建议：**
+- ✅ **制作报告**：使用Excel，包含完整数据
+- ✅ **进一步分析**：使用Excel，可以处理多个工作表
+- ✅ **数据共享**：使用CSV，兼容性好
+- ✅ **程序处理**：使用CSV，易于读取
+
+**文件命名：**
+- 自动包含时间戳，避免覆盖
+- 格式：`backtest_report_YYYYMMDD_HHMMSS.xlsx`
+- 格式：`backtest_data_YYYYMMDD_HHMMSS.csv`
+
+**注意事项：**
+- Excel导出需要安装xlsxwriter（推荐，内存占用低）或openpyxl库
+- 如果导出失败，请检查是否有足够权限
+- 大文件可能需要较长时间生成
+"""
+
+# 侧边栏帮助面板
+HELP_MD = """
+**📊 BACKTEST MODE（回测模式）:**
+- **目的**：分析历史数据，得到标的物价格的输入建模（Input Model）并选择策略
+- 上传CSV文件（包含日期列和资产价格）
+- 选择策略并配置参数
+- **自动进行输入建模**：系统会从标的物价格数据中提取收益率分布特征
+- 查看策略的历史表现指标
+- 通过6个详细图表分析回测结果
+
+**🔮 PROJECTION MODE（预测模式）:**
+- **目的**：使用回测中得到的Input Model模拟未来价格走向，评估策略在未来表现
+- **自动使用回测结果**：使用回测中选择的策略和Input Model
+- 配置预测时间期限和模拟次数
+- 查看未来收益的概率分布
+- 获得策略在未来市场环境下的表现评估
+
+**💡 TIPS:**
+- Use synthetic data if no file uploaded
+- Adjust rebalance frequency for different strategies
+- Export results to Excel for further analysis
+
+**📚 策略选择建议：**
+- 新手：Equal Weight 或 Fixed Weights
+- 风险厌恶：Minimum Variance 或 Risk Parity
+- 追求收益：Momentum 或 Target Risk
+- 降低成本：Adaptive Rebalance
+"""
+
+COMPARE_MD = """
+| 策略 | 复杂度 | 风险控制 | 收益潜力 | 交易成本 |
+|------|--------|----------|----------|----------|
+| Fixed Weights | ⭐ 低 | ⭐⭐ 中 | ⭐⭐ 中 | ⭐⭐ 中 |
+| Target Risk | ⭐⭐ 中 | ⭐⭐⭐ 高 | ⭐⭐ 中 | ⭐⭐ 中 |
+| Adaptive Rebalance | ⭐ 低 | ⭐⭐ 中 | ⭐⭐ 中 | ⭐⭐⭐ 低 |
+| Equal Weight | ⭐ 低 | ⭐⭐ 中 | ⭐⭐ 中 | ⭐⭐ 中 |
+| Risk Parity | ⭐⭐ 中 | ⭐⭐⭐ 高 | ⭐⭐ 中 | ⭐⭐ 中 |
+| Minimum Variance | ⭐⭐⭐ 高 | ⭐⭐⭐ 高 | ⭐ 低 | ⭐⭐ 中 |
+| Momentum | ⭐⭐ 中 | ⭐ 低 | ⭐⭐⭐ 高 | ⭐⭐ 中 |
+| Mean Reversion | ⭐⭐ 中 | ⭐⭐ 中 | ⭐⭐ 中 | ⭐⭐ 中 |
+"""
@@ -14,6 +14,7 @@ def generate_returns(
     size: int | tuple[int, ...],
     params: dict,
     rng: Optional[np.random.Generator] = None,
+    dtype: type = np.float64,
 ) -> np.ndarray:
     """生成指定分布的资产收益。
 
@@ -23,6 +24,7 @@ def generate_returns(
         params: 分布参数字典
             - 对于 "normal": 需要 "mean" 和 "vol" 键
         rng: 可选的随机数生成器。如果为 None，使用全局 np.random
+        dtype: 输出精度，np.float64 或 np.float32（大规模模拟可用 float32 减半内存）
 
     Returns:
         生成的收益数组
@@ -38,8 +40,11 @@ def generate_returns(
         vol = params["vol"]
 
         if rng is not None:
-            return rng.normal(loc=mean, scale=vol, size=size)
-        return np.random.normal(loc=mean, scale=vol, size=size)
+            samples = rng.standard_normal(size=size, dtype=dtype)
+            samples *= vol
+            samples += mean
+            return samples
+        return np.random.normal(loc=mean, scale=vol, size=size).astype(dtype, copy=False)
 
     if dist_name == "student_t":
         df = float(params.get("df", 5.0))
@@ -48,23 +53,28 @@ def generate_returns(
         scale = float(params.get("scale", params.get("vol", 0.02)))
         mean = float(params.get("mean", 0.0))
         generator = rng or np.random.default_rng()
-        z = generator.standard_normal(size=size)
-        chi2 = generator.chisquare(df, size=size)
-        t_samples = z / np.sqrt(chi2 / df)
-        return mean + scale * t_samples
+        z = generator.standard_normal(size=size, dtype=dtype)
+        chi2 = generator.chisquare(df, size=size)  # chisquare 只有 float64，结果写回 z
+        # t = z / sqrt(chi2/df)，再做 mean + scale*t；全部原地计算，不产生同尺寸临时数组
+        np.divide(chi2, df, out=chi2)
+        np.sqrt(chi2, out=chi2)
+        np.divide(z, chi2, out=z)
+        z *= scale
+        z += mean
+        return z
 
     if dist_name == "empirical_bootstrap":
         if "historical_returns" not in params:
             raise ValueError('empirical_bootstrap 分布需要 "historical_returns" 参数')
-        hist = np.asarray(params["historical_returns"], dtype=float)
+        # 样本池按输出精度抽取（float32 时每个样本只搬运4字节）
+        hist = np.asarray(params["historical_returns"]).ravel().astype(dtype, copy=False)
         if hist.size == 0:
             raise ValueError("historical_returns 不能为空")
         generator = rng or np.random.default_rng()
-        target_shape = size if isinstance(size, tuple) else (size,)
-        num_samples = int(np.prod(target_shape))
-        idx = generator.integers(0, hist.size, size=num_samples)
-        samples = hist[idx]
-        return samples.reshape(target_shape)
+        # 等权有放回抽样 = 均匀整数下标 + 花式索引；下标用 int32，索引缓冲减半
+        idx_dtype = np.int32 if hist.size <= np.iinfo(np.int32).max else np.int64
+        idx = generator.integers(0, hist.size, size=size, dtype=idx_dtype)
+        return hist[idx]
 
     raise ValueError(f"不支持的分布类型: {dist_name}")
 
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Any, Optional, Sequence
 
@@ -12,6 +15,21 @@ from .data_models import SimulationConfig
 from .strategies import Strategy, build_strategy
 
 
+# 收益分块抽样共用的线程池：首次需要并行时创建，之后各次模拟（及各会话）复用，不再每次运行新建
+_SAMPLING_POOL: Optional[ThreadPoolExecutor] = None
+_SAMPLING_POOL_LOCK = threading.Lock()
+
+
+def _sampling_pool() -> ThreadPoolExecutor:
+    global _SAMPLING_POOL
+    with _SAMPLING_POOL_LOCK:
+        if _SAMPLING_POOL is None:
+            _SAMPLING_POOL = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1, thread_name_prefix="forward-sampling"
+            )
+        return _SAMPLING_POOL
+
+
 @dataclass(frozen=True)
 class ForwardSimulationResult:
     """前瞻性模拟结果封装。"""
@@ -80,6 +98,10 @@ class ForwardSimulator:
     """Monte Carlo 投资组合前瞻性模拟器（基于假设参数预测未来收益）。"""
 
     PERIODS_PER_YEAR = 12
+    # 预抽样收益张量 (periods, trials, assets) 的存储精度；增长因子与组合价值仍按 float64 计算
+    RETURNS_DTYPE = np.float32
+    # 收益按固定期数分块抽样，每块使用独立派生的随机流；块划分与 CPU 数无关，结果只取决于 seed
+    SAMPLE_BLOCK_PERIODS = 60
 
     def __init__(
         self,
@@ -115,28 +137,24 @@ class ForwardSimulator:
         trajectories[:, 0] = self.config.initial_balance
         asset_values = trajectories[:, [0]] * weights  # (trials, assets)
 
-        periodic_contribution = self.config.contribution_plan.periodic_contribution
+        cashflows = self._contribution_schedule(periods)
+        returns = self._sample_asset_returns(periods)
+        step_growth = np.empty((self.config.num_trials, self.num_assets), dtype=float)
+        # 资产数很少（通常 2~5 个），按行求和 sum(axis=1) 的内层循环太短；用矩阵-向量乘积走 BLAS
+        ones = np.ones(self.num_assets)
 
         for step in range(1, periods + 1):
             # 注入定期投入
-            if periodic_contribution > 0:
-                asset_values += (
-                    periodic_contribution * weights
-                )  # 假设按目标权重分摊投入
-
-            # 为每个资产生成收益
-            asset_returns = np.zeros((self.config.num_trials, self.num_assets))
-            for i in range(self.num_assets):
-                dist_name, dist_params = self._distribution_for_asset(i)
-                asset_returns[:, i] = generate_returns(
-                    dist_name=dist_name,
-                    size=self.config.num_trials,
-                    params=dist_params,
-                    rng=self.rng,
-                )
-            asset_values *= 1.0 + asset_returns
+            contribution = cashflows[step - 1]
+            if contribution > 0:
+                asset_values += contribution * weights  # 假设按目标权重分摊投入
 
-            portfolio_values = asset_values.sum(axis=1)
+            # 增长因子 1+r 逐期按 float64 计算后复利：收益以 float32 存储，但 1+r 在 float32 下会被量化到约 6e-8
+            # 协方差对平移不变，可直接用增长因子计算
+            np.add(returns[step - 1], 1.0, out=step_growth, dtype=float)  # (trials, assets)；dtype 指定 float64 内核
+            asset_values *= step_growth
+
+            portfolio_values = asset_values @ ones
             trajectories[:, step] = portfolio_values
 
             if step % self.config.rebalance_frequency == 0:
@@ -149,7 +167,7 @@ class ForwardSimulator:
                 average_weight = current_weights.mean(axis=0)
                 covariance = None
                 if self.config.num_trials > 1:
-                    covariance = np.cov(asset_returns, rowvar=False)
+                    covariance = np.cov(step_growth, rowvar=False)
                 weights = self.strategy.rebalance(average_weight, covariance=covariance)
                 asset_values = portfolio_values[:, None] * weights
 
@@ -160,6 +178,54 @@ class ForwardSimulator:
             timeline, trajectories, weights_history, self.config, sanitized_model
         )
 
+    def _contribution_schedule(self, periods: int) -> np.ndarray:
+        """每个模拟期的投入金额向量，shape: (periods,)。
+
+        按 ContributionPlan.frequency 落在对应月份：每月一次即每期投入，
+        每季一次为每 3 期一次；一年多于 12 次时同月的多笔合并投入。
+        """
+        plan = self.config.contribution_plan
+        # 截至第 t 期累计应投入的次数（整数运算，避免浮点取整误差）
+        cumulative_count = np.arange(periods + 1) * plan.frequency // self.PERIODS_PER_YEAR
+        return np.diff(cumulative_count) * plan.periodic_contribution
+
+    def _sample_asset_returns(self, periods: int) -> np.ndarray:
+        """一次性生成全部期数的资产收益，shape: (periods, trials, assets)。
+
+        沿期数按 SAMPLE_BLOCK_PERIODS 分块，每块用 self.rng 派生的独立子随机流，对每个资产调用一次
+        generate_returns（size=(块期数, trials)），代替逐期逐资产的小批量抽样；逐期循环只剩广播运算。
+        张量按 RETURNS_DTYPE（float32）存储，是模拟中最大的数组，内存与带宽减半。
+        多核时各块在共用线程池中并行抽样：每块按资产生成一个块大小的临时数组，
+        再复制进预分配张量的对应切片（切片沿资产维跨步，随机数无法直接写入）；
+        numpy 随机数填充时释放 GIL，无需多进程回传整个张量。
+        """
+        all_returns = np.empty(
+            (periods, self.config.num_trials, self.num_assets), dtype=self.RETURNS_DTYPE
+        )
+        distributions = [self._distribution_for_asset(i) for i in range(self.num_assets)]
+        starts = range(0, periods, self.SAMPLE_BLOCK_PERIODS)
+        # 每块一个独立子随机流，避免各块抽到重复序列
+        block_rngs = self.rng.spawn(len(starts))
+
+        def fill_block(start: int, rng: np.random.Generator) -> None:
+            stop = min(start + self.SAMPLE_BLOCK_PERIODS, periods)
+            for i, (dist_name, dist_params) in enumerate(distributions):
+                all_returns[start:stop, :, i] = generate_returns(
+                    dist_name=dist_name,
+                    size=(stop - start, self.config.num_trials),
+                    params=dist_params,
+                    rng=rng,
+                    dtype=self.RETURNS_DTYPE,
+                )
+
+        workers = min(os.cpu_count() or 1, len(starts))
+        if workers > 1:
+            list(_sampling_pool().map(fill_block, starts, block_rngs))
+        else:
+            for start, rng in zip(starts, block_rngs):
+                fill_block(start, rng)
+        return all_returns
+
     def _annual_to_periodic(self, annual_returns: np.ndarray) -> np.ndarray:
         """将年化收益转为月收益。"""
         return np.power(1.0 + annual_returns, 1 / self.PERIODS_PER_YEAR) - 1.0
@@ -171,7 +237,10 @@ class ForwardSimulator:
         raw_params = model.get("params") or {}
         cleaned_params: dict[str, Any] = {}
         for key, value in raw_params.items():
-            if isinstance(value, np.ndarray):
+            if key == "historical_returns":
+                # Bootstrap 样本池保持紧凑的 ndarray，不展开成 Python 浮点列表
+                cleaned_params[key] = np.asarray(value)
+            elif isinstance(value, np.ndarray):
                 cleaned_params[key] = value.tolist()
             elif isinstance(value, (np.generic,)):
                 cleaned_params[key] = value.item()
@@ -192,6 +261,10 @@ class ForwardSimulator:
         user_params = self.input_model.get("params") or {}
         resolved_params = base_params.copy()
         for key, value in user_params.items():
+            if key == "historical_returns":
+                # Bootstrap 样本池为所有资产共用的一维序列，不按资产拆分
+                resolved_params[key] = np.asarray(value)
+                continue
             resolved_params[key] = self._select_param_value(value, asset_index)
         return dist_name, resolved_params
 
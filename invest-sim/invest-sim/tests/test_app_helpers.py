@@ -0,0 +1,319 @@
+import io
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("streamlit")
+scipy_stats = pytest.importorskip("scipy.stats")
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+
+
+@pytest.fixture(scope="module")
+def app():
+    # app.py 是 Streamlit 脚本：裸模式下导入会执行一遍页面，这里只取其中的纯计算函数
+    sys.path.insert(0, str(APP_DIR))
+    import app as app_module
+
+    return app_module
+
+
+@pytest.fixture(scope="module")
+def fat_tailed_returns() -> np.ndarray:
+    return np.random.default_rng(7).standard_t(4, 2000) * 0.01 + 0.0003
+
+
+def test_ks_test_sorted_matches_kstest(app, fat_tailed_returns) -> None:
+    sorted_returns = np.sort(fat_tailed_returns)
+    n = len(sorted_returns)
+    rank = np.arange(1, n + 1)
+    dist = scipy_stats.norm(fat_tailed_returns.mean(), fat_tailed_returns.std())
+
+    ks_stat, ks_pvalue = app.ks_test_sorted(dist.cdf(sorted_returns), (rank - 1) / n, rank / n)
+    expected = scipy_stats.kstest(fat_tailed_returns, dist.cdf)
+
+    assert ks_stat == pytest.approx(expected.statistic, rel=1e-12)
+    assert ks_pvalue == pytest.approx(expected.pvalue, rel=1e-9)
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")  # scipy>=1.17 要求 anderson 指定 method，统计量不受影响
+def test_anderson_darling_sorted_matches_anderson(app, fat_tailed_returns) -> None:
+    # scipy.stats.anderson 对正态分布用样本均值与 ddof=1 标准差
+    sorted_returns = np.sort(fat_tailed_returns)
+    dist = scipy_stats.norm(fat_tailed_returns.mean(), fat_tailed_returns.std(ddof=1))
+    expected = scipy_stats.anderson(fat_tailed_returns, "norm").statistic
+
+    assert app.anderson_darling_sorted(dist.cdf(sorted_returns)) == pytest.approx(expected, rel=1e-9)
+    with_logs = app.anderson_darling_sorted(
+        dist.cdf(sorted_returns), dist.logcdf(sorted_returns), dist.logsf(sorted_returns)
+    )
+    assert with_logs == pytest.approx(expected, rel=1e-9)
+
+
+def test_closed_form_log_likelihoods_match_scipy(app, fat_tailed_returns) -> None:
+    x = fat_tailed_returns
+    cases = [
+        (app.normal_log_likelihood(x, 0.0003, 0.012), scipy_stats.norm.logpdf(x, 0.0003, 0.012)),
+        (app.student_t_log_likelihood(x, 4.5, 0.0002, 0.009), scipy_stats.t.logpdf(x, 4.5, 0.0002, 0.009)),
+        (app.laplace_log_likelihood(x, 0.0001, 0.008), scipy_stats.laplace.logpdf(x, 0.0001, 0.008)),
+        (app.cauchy_log_likelihood(x, 0.0001, 0.006), scipy_stats.cauchy.logpdf(x, 0.0001, 0.006)),
+    ]
+    for closed_form, logpdf in cases:
+        assert closed_form == pytest.approx(np.sum(logpdf), rel=1e-10)
+
+
+def test_fit_student_t_reaches_scipy_mle(app, fat_tailed_returns) -> None:
+    x = fat_tailed_returns
+    df, loc, scale = app.fit_student_t(x, x.mean(), x.std())
+    ref_df, ref_loc, ref_scale = scipy_stats.t.fit(x)
+
+    assert (df, loc, scale) == pytest.approx((ref_df, ref_loc, ref_scale), rel=1e-2, abs=1e-5)
+    ll = app.student_t_log_likelihood(x, df, loc, scale)
+    ref_ll = app.student_t_log_likelihood(x, ref_df, ref_loc, ref_scale)
+    assert ll >= ref_ll - 1e-6 * abs(ref_ll)
+
+
+def test_laplace_fit_is_closed_form_mle(app, fat_tailed_returns) -> None:
+    fit_results = app.fit_all_distributions(fat_tailed_returns)[0]
+    params = fit_results["Laplace"]["params"]
+    ref_loc, ref_scale = scipy_stats.laplace.fit(fat_tailed_returns)
+
+    assert params["loc"] == pytest.approx(ref_loc, rel=1e-9)
+    assert params["scale"] == pytest.approx(ref_scale, rel=1e-9)
+
+
+def test_kde_log_likelihood_matches_dense_gaussian_kernel_sum(app) -> None:
+    x = np.random.default_rng(3).normal(0.0005, 0.01, 300)
+    bandwidth = x.std(ddof=1) * len(x) ** (-1 / 5)  # Scott 带宽（一维）
+    dense_pdf = scipy_stats.norm.pdf(x[:, None], loc=x[None, :], scale=bandwidth).mean(axis=1)
+
+    assert app.kde_log_likelihood(x) == pytest.approx(np.sum(np.log(dense_pdf)), rel=1e-10)
+
+
+def _reference_fit_scores(fit_results: dict, n_samples: int) -> dict:
+    """逐分布循环的综合评分：KS p值0.25 + AIC 0.25 + BIC 0.15 + 对数似然0.15 + AD统计量0.2
+
+    区间取全部成功拟合中的有限值（AD统计量即各参数分布的有限值，Bootstrap无AD）。
+    """
+    succeeded = [r for r in fit_results.values() if r.get("success")]
+
+    def _normed(result, key, higher_is_better):
+        values = [r[key] for r in succeeded if r.get(key) is not None and np.isfinite(r[key])]
+        lo, hi = min(values), max(values)
+        normed = (result[key] - lo) / (hi - lo) if hi > lo else 1.0
+        return normed if higher_is_better else 1 - normed
+
+    scores = {}
+    for name, result in fit_results.items():
+        if not result.get("success"):
+            continue
+        if name == "Bootstrap":
+            scores[name] = min(1.0, n_samples / 1000) * 0.5
+            continue
+        score = 0.25 * (result.get("ks_pvalue") or 0.0)
+        for key, weight, higher_is_better in (
+            ("aic", 0.25, False), ("bic", 0.15, False), ("log_likelihood", 0.15, True), ("ad_stat", 0.2, False)
+        ):
+            if result.get(key) is not None and np.isfinite(result[key]):
+                score += weight * _normed(result, key, higher_is_better)
+        scores[name] = score
+    return scores
+
+
+def test_fit_scores_match_reference_ranking(app, fat_tailed_returns) -> None:
+    fit_results, metrics_df, best_dist, _, _ = app.fit_all_distributions(fat_tailed_returns)
+    expected = _reference_fit_scores(fit_results, len(fat_tailed_returns))
+
+    # AD 项确实参与评分：参数分布有有限的 AD 统计量，且各分布取值不同
+    ad_stats = metrics_df.loc[metrics_df.index != "Bootstrap", "ad_stat"].dropna()
+    assert np.isfinite(ad_stats).any() and ad_stats.nunique() > 1
+    assert metrics_df["score"].dropna().to_dict() == pytest.approx(expected, rel=1e-9)
+    assert best_dist == max(expected, key=expected.get)
+
+
+@pytest.mark.parametrize("returns", [
+    np.random.default_rng(11).normal(0.0004, 0.012, 997),
+    np.round(np.random.default_rng(12).normal(0.0, 0.01, 401), 3),  # 大量并列值，分位点落在并列值上
+    np.array([0.01]),
+])
+def test_var_cvar_matches_percentile_and_tail_mean(app, returns) -> None:
+    var, cvar = app.var_cvar(returns)
+    expected_var = np.percentile(returns, 5)
+
+    assert var == pytest.approx(expected_var, rel=1e-12)
+    assert cvar == pytest.approx(returns[returns <= expected_var].mean(), rel=1e-12)
+
+
+@pytest.mark.parametrize("window", [2, 20, 250, 500, 501, 800])
+def test_rolling_metrics_match_pandas_rolling(app, window) -> None:
+    pd = pytest.importorskip("pandas")
+    returns = np.random.default_rng(5).normal(0.002, 0.01, 500) + 0.05  # 均值偏离0，检验前缀和的数值稳定性
+    sharpe, vol, ret = app.rolling_metrics(returns, window)
+
+    rolling = pd.Series(returns).rolling(window)
+    expected_ret = (rolling.mean() * 252).to_numpy()[window - 1:]
+    expected_vol = (rolling.std() * np.sqrt(252)).to_numpy()[window - 1:]
+
+    assert len(ret) == len(vol) == len(sharpe) == max(len(returns) - window + 1, 0)
+    np.testing.assert_allclose(ret, expected_ret, rtol=1e-9)
+    np.testing.assert_allclose(vol, expected_vol, rtol=1e-7)
+    np.testing.assert_allclose(sharpe, expected_ret / expected_vol, rtol=1e-7)
+
+
+def test_correlation_matrix_matches_dataframe_corr(app) -> None:
+    pd = pytest.importorskip("pandas")
+    rng = np.random.default_rng(9)
+    base = rng.normal(0.0, 0.01, (600, 1))
+    returns = np.hstack([base + rng.normal(0.0, 0.005, (600, 3)) + 0.02, np.full((600, 1), 0.0137)])
+    columns = ("A", "B", "C", "Flat")
+
+    result = app.correlation_matrix(returns, columns)
+    expected = pd.DataFrame(returns, columns=list(columns)).corr()
+    pd.testing.assert_frame_equal(result, expected, rtol=1e-9)
+
+    with_gaps = returns.copy()
+    with_gaps[::7, 1] = np.nan
+    with_gaps[:, 2] = np.nan
+    result = app.correlation_matrix(with_gaps, columns)
+    expected = pd.DataFrame(with_gaps, columns=list(columns)).corr()
+    pd.testing.assert_frame_equal(result, expected, rtol=1e-9)
+
+
+def _reference_lttb(y: np.ndarray, n_out: int) -> list:
+    """逐点循环的经典 LTTB（x 取位置下标），用作向量化实现的对照"""
+    n = len(y)
+    every = (n - 2) / (n_out - 2)
+    kept, a = [0], 0
+    for i in range(n_out - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        nxt_start, nxt_end = end, min(int((i + 2) * every) + 1, n)
+        avg_x = sum(range(nxt_start, nxt_end)) / (nxt_end - nxt_start)
+        avg_y = sum(y[nxt_start:nxt_end]) / (nxt_end - nxt_start)
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((a - avg_x) * (y[j] - y[a]) - (a - j) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    return kept + [n - 1]
+
+
+def test_lttb_indices_match_reference(app) -> None:
+    y = np.cumsum(np.random.default_rng(4).normal(0.0, 1.0, 5003))
+    keep = app.lttb_indices(y, 500)
+
+    assert keep.tolist() == _reference_lttb(y.tolist(), 500)
+    assert np.all(np.diff(keep) > 0)
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 499, 500])
+def test_lttb_indices_keeps_short_series(app, n) -> None:
+    np.testing.assert_array_equal(app.lttb_indices(np.arange(n, dtype=float), 500), np.arange(n))
+
+
+def test_build_excel_report_writes_nan_as_blank(app) -> None:
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("openpyxl")
+    frame = pd.DataFrame({"Metric": ["Sharpe", "Calmar", "Sortino"], "Value": [1.25, np.nan, np.inf]})
+
+    content = app.build_excel_report([("Metrics", frame, False)])
+    read_back = pd.read_excel(io.BytesIO(content), sheet_name="Metrics")
+
+    assert read_back["Metric"].tolist() == ["Sharpe", "Calmar", "Sortino"]
+    assert read_back["Value"].iloc[0] == 1.25
+    assert pd.isna(read_back["Value"].iloc[1])
+    assert read_back["Value"].iloc[2] == np.inf  # 与 to_excel 一样写成字符串 "inf"，读回为浮点无穷
+
+
+@pytest.mark.parametrize("returns", [
+    np.random.default_rng(13).standard_t(4, 1500) * 0.01,
+    np.array([0.01, -0.02, 0.005, 0.03]),
+    np.full(50, 0.002),  # 常数序列：pandas 记偏度、峰度为 0
+])
+def test_returns_moments_match_pandas(app, returns) -> None:
+    pd = pytest.importorskip("pandas")
+    moments = app.returns_moments(returns)
+    series = pd.Series(returns)
+
+    assert moments["mean"] == pytest.approx(series.mean(), rel=1e-12)
+    assert moments["std"] == pytest.approx(series.std(ddof=0), rel=1e-12, abs=1e-18)
+    assert moments["skew"] == pytest.approx(series.skew(), rel=1e-9, abs=1e-12)
+    assert moments["kurt"] == pytest.approx(series.kurt(), rel=1e-9, abs=1e-12)
+
+
+def test_fitting_helpers_promote_float32_samples(app, fat_tailed_returns) -> None:
+    # 回测得到的 bootstrap_returns 为 float32：拟合结果应与先转 float64 的输入一致
+    as_float32 = fat_tailed_returns.astype(np.float32)
+    as_float64 = as_float32.astype(np.float64)
+
+    fit32 = app.fit_input_models(as_float32)
+    fit64 = app.fit_input_models(as_float64)
+    assert fit32["best"] == fit64["best"]
+    for name in ("Normal", "Student-t"):
+        assert fit32["fit_results"][name]["params"] == pytest.approx(fit64["fit_results"][name]["params"], rel=1e-12)
+        assert fit32["fit_results"][name]["log_likelihood"] == pytest.approx(
+            fit64["fit_results"][name]["log_likelihood"], rel=1e-12
+        )
+    assert fit32["fit_results"]["Bootstrap"]["params"]["historical_returns"].dtype == np.float32
+
+    metrics32 = app.fit_all_distributions(as_float32)[1]
+    metrics64 = app.fit_all_distributions(as_float64)[1]
+    np.testing.assert_allclose(
+        metrics32["log_likelihood"].to_numpy(dtype=float), metrics64["log_likelihood"].to_numpy(dtype=float), rtol=1e-12
+    )
+
+
+def test_fan_chart_accepts_projection_and_derivatives_paths(app) -> None:
+    # 预测页：桥接层一次算好的扇形分位带
+    projection = app.InvestSimBridge.run_forward_simulation({"duration": 2, "num_trials": 200, "seed": 1})
+    fan = projection["fan"]
+    assert fan.shape == (5, len(projection["dates"]))
+    np.testing.assert_array_equal(fan[2], projection["median"])
+    np.testing.assert_allclose(fan, np.percentile(projection["paths"], (5, 25, 50, 75, 95), axis=1))
+    fig = app.plot_monte_carlo_fan(projection["dates"], fan)
+    np.testing.assert_array_equal(fig.data[2].y, projection["median"])
+
+    # 衍生品实验室：与 OptionMarginSimulator.run_monte_carlo 相同的 (路径数, 天数+1) 权益矩阵
+    days = 20
+    pnl = np.random.default_rng(3).normal(0.0, 400.0, (50, days))
+    equity_paths = 50_000.0 + np.concatenate([np.zeros((50, 1)), np.cumsum(pnl, axis=1)], axis=1)
+    fan = app.InvestSimBridge.fan_bands(equity_paths)
+    assert fan.shape == (5, days + 1)
+    np.testing.assert_allclose(fan, np.percentile(equity_paths, (5, 25, 50, 75, 95), axis=0))
+    assert np.all(np.diff(fan, axis=0) >= 0)
+    fig = app.plot_monte_carlo_fan(np.arange(days + 1), fan)
+    np.testing.assert_array_equal(fig.data[2].y, fan[2])
+
+
+@pytest.mark.parametrize("metrics, sortino, calmar", [
+    ({"total_return": 0.25, "sharpe": 1.6, "max_dd": -0.1, "volatility": 0.1}, 2.0, 1.2),
+    ({"total_return": -0.05, "sharpe": 0.3, "max_dd": -0.35, "volatility": 0.3}, 0.4, 0.3),
+    ({"total_return": 0.05, "sharpe": 1.0, "max_dd": -0.15, "volatility": 0.15}, 1.0, 0.5),  # 各档阈值边界
+])
+def test_backtest_report_reuses_result_page_conclusion(app, metrics, sortino, calmar) -> None:
+    report = app.generate_backtest_report_markdown(
+        "Fixed Weights", 1_000_000, 1.0, 0.02, metrics, sortino, calmar, 30, None
+    )
+    conclusion = app.backtest_conclusion(
+        metrics["total_return"], metrics["sharpe"], metrics["max_dd"], metrics["volatility"], sortino, calmar
+    )
+
+    words = conclusion["words"]
+
+    # 第六节保留报告自己的小节结构与四条风险提示，分档措辞与结果页共用
+    section = report[report.index("## 六、最终结论与决策建议"):report.index("## 七、附录")]
+    headings = [line for line in section.splitlines() if line.startswith("###")]
+    assert headings == ["### 6.1 策略表现总结", "### 6.2 决策建议", "### 6.3 风险提示"]
+    assert "本次回测显示，**Fixed Weights**策略在测试期间取得了" + words["overall_word"] + "的表现。" in section
+    for word_key in ("ret_word", "sharpe_word", "dd_word", "vol_word"):
+        assert "，" + words[word_key] + "\n" in section
+    assert "### 6.2 决策建议\n\n" + words["advice"] + "\n\n### 6.3 风险提示" in section
+    risk_bullets = [line for line in section.splitlines() if line.startswith("- ⚠️ **")]
+    assert [line.split("**")[1] for line in risk_bullets] == ["历史表现不代表未来收益", "市场环境变化", "风险承受能力", "分散投资"]
+    assert section.rstrip().endswith("---")
+    for key in ("advantages", "concerns", "investor_types", "market_conditions", "optimizations"):
+        for line in conclusion[key]:
+            assert line in report
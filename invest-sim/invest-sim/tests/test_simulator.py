@@ -1,9 +1,12 @@
 from pathlib import Path
 
 import numpy as np
+import pytest
 
-from invest_sim.data_models import Asset, SimulationConfig
+from invest_sim.backend.input_modeling.distributions import generate_returns
+from invest_sim.data_models import Asset, ContributionPlan, SimulationConfig
 from invest_sim.config import load_config
+from invest_sim import forward_simulator
 from invest_sim.forward_simulator import ForwardSimulator
 
 
@@ -68,3 +71,157 @@ def test_forward_simulator_accepts_custom_input_model() -> None:
     assert np.allclose(result.trajectories[:, -1], expected)
     assert result.input_model is not None
     assert result.input_model["dist_name"] == "normal"
+
+
+def test_forward_simulator_compounds_growth_in_float64() -> None:
+    # 每期 1e-7 的收益在 float32 中 1+r 会被量化成 1，复利必须按 float64 进行
+    config = SimulationConfig(
+        years=10,
+        initial_balance=1_000_000,
+        num_trials=3,
+        rebalance_frequency=12,
+        assets=[Asset(name="Cash", expected_return=0.0, volatility=0.01, weight=1.0)],
+    )
+    input_model = {"dist_name": "normal", "params": {"mean": 1e-7, "vol": 0.0}}
+    result = ForwardSimulator(config, seed=1, input_model=input_model).run()
+
+    periods = config.years * ForwardSimulator.PERIODS_PER_YEAR
+    r = float(np.float32(1e-7))  # 收益本身按 float32 存储
+    assert np.allclose(result.trajectories[:, -1], config.initial_balance * (1 + r) ** periods, rtol=1e-12, atol=0)
+
+
+def _two_asset_config(**overrides) -> SimulationConfig:
+    payload = {
+        "years": 2,
+        "initial_balance": 10_000,
+        "num_trials": 400,
+        "rebalance_frequency": 12,
+        "assets": [
+            Asset(name="Equity", expected_return=0.08, volatility=0.16, weight=0.6),
+            Asset(name="Bonds", expected_return=0.03, volatility=0.05, weight=0.4),
+        ],
+    }
+    payload.update(overrides)
+    return SimulationConfig(**payload)
+
+
+def test_sample_asset_returns_shape_dtype_and_seed() -> None:
+    config = _two_asset_config()
+    periods = config.years * ForwardSimulator.PERIODS_PER_YEAR
+    samples = ForwardSimulator(config, seed=7)._sample_asset_returns(periods)
+
+    assert samples.shape == (periods, config.num_trials, len(config.assets))
+    assert samples.dtype == ForwardSimulator.RETURNS_DTYPE
+    np.testing.assert_array_equal(samples, ForwardSimulator(config, seed=7)._sample_asset_returns(periods))
+    assert not np.array_equal(samples, ForwardSimulator(config, seed=8)._sample_asset_returns(periods))
+
+    # 每个资产按自身的月度均值/波动率抽样
+    simulator = ForwardSimulator(config, seed=7)
+    np.testing.assert_allclose(samples.mean(axis=(0, 1)), simulator.monthly_return_mean, atol=2e-3)
+    np.testing.assert_allclose(samples.std(axis=(0, 1)), simulator.monthly_volatility, rtol=0.03)
+
+    first = ForwardSimulator(config, seed=7).run().trajectories
+    np.testing.assert_array_equal(first, ForwardSimulator(config, seed=7).run().trajectories)
+
+
+def test_bootstrap_pool_is_shared_across_assets() -> None:
+    config = _two_asset_config()
+    pool = [-0.03, -0.01, 0.0, 0.015, 0.04]
+    input_model = {"dist_name": "empirical_bootstrap", "params": {"historical_returns": pool}}
+    simulator = ForwardSimulator(config, seed=3, input_model=input_model)
+    samples = simulator._sample_asset_returns(12)
+
+    pool32 = np.asarray(pool, dtype=ForwardSimulator.RETURNS_DTYPE)
+    for asset in range(len(config.assets)):
+        assert np.isin(samples[:, :, asset], pool32).all()
+        assert set(np.unique(samples[:, :, asset])) == set(pool32)
+
+    result = simulator.run()
+    assert np.isfinite(result.trajectories).all()
+    assert result.input_model["dist_name"] == "empirical_bootstrap"
+
+
+@pytest.mark.parametrize("dist_name, params", [
+    ("normal", {"mean": 0.005, "vol": 0.04}),
+    ("student_t", {"mean": 0.005, "scale": 0.03, "df": 4.0}),
+    ("empirical_bootstrap", {"historical_returns": np.array([-0.02, 0.0, 0.01, 0.03])}),
+])
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_generate_returns_honours_dtype_and_size(dist_name, params, dtype) -> None:
+    samples = generate_returns(dist_name, (60, 500), params, rng=np.random.default_rng(1), dtype=dtype)
+
+    assert samples.shape == (60, 500)
+    assert samples.dtype == dtype
+    assert np.isfinite(samples).all()
+    again = generate_returns(dist_name, (60, 500), params, rng=np.random.default_rng(1), dtype=dtype)
+    np.testing.assert_array_equal(samples, again)
+
+
+def test_bootstrap_draws_uniformly_from_pool() -> None:
+    pool = np.linspace(-0.05, 0.05, 21)
+    params = {"historical_returns": pool}
+    samples = generate_returns("empirical_bootstrap", (200, 500), params, rng=np.random.default_rng(5), dtype=np.float32)
+
+    assert samples.shape == (200, 500)
+    assert samples.dtype == np.float32
+    pool32 = pool.astype(np.float32)
+    assert np.isin(samples, pool32).all()
+
+    # 等权有放回抽样：每个样本点的出现次数 ~ Binomial(n, 1/21)，放宽到 5 个标准差
+    counts = np.array([(samples == value).sum() for value in pool32])
+    expected = samples.size / pool.size
+    assert counts.sum() == samples.size
+    assert np.all(np.abs(counts - expected) < 5 * np.sqrt(expected))
+
+    # float64 输出保留样本池的原始数值
+    samples64 = generate_returns("empirical_bootstrap", 1000, params, rng=np.random.default_rng(5))
+    assert samples64.dtype == np.float64
+    assert np.isin(samples64, pool).all()
+
+
+@pytest.mark.parametrize("frequency, months", [
+    (12, list(range(1, 13))),
+    (4, [3, 6, 9, 12]),
+    (1, [12]),
+])
+def test_contributions_total_annual_amount_for_each_frequency(frequency, months) -> None:
+    config = SimulationConfig(
+        years=3,
+        initial_balance=10_000,
+        num_trials=5,
+        rebalance_frequency=12,
+        assets=[Asset(name="Cash", expected_return=0.0, volatility=0.01, weight=1.0)],
+        contribution_plan=ContributionPlan(annual_contribution=1_200, frequency=frequency),
+    )
+    input_model = {"dist_name": "normal", "params": {"mean": 0.0, "vol": 0.0}}
+    simulator = ForwardSimulator(config, seed=1, input_model=input_model)
+
+    periods = config.years * ForwardSimulator.PERIODS_PER_YEAR
+    schedule = simulator._contribution_schedule(periods)
+    paying_months = np.flatnonzero(schedule[:12]) + 1
+    assert paying_months.tolist() == months
+    np.testing.assert_allclose(schedule.reshape(config.years, 12).sum(axis=1), 1_200)
+
+    result = simulator.run()
+    np.testing.assert_allclose(result.trajectories[:, -1], config.initial_balance + 1_200 * config.years)
+
+
+@pytest.mark.parametrize("dist_name, params", [
+    ("normal", None),
+    ("empirical_bootstrap", {"historical_returns": np.linspace(-0.04, 0.05, 37)}),
+])
+def test_block_sampling_is_independent_of_thread_count(monkeypatch, dist_name, params) -> None:
+    # 15 年 = 180 期，跨 3 个抽样块；块的随机流只取决于 seed，与线程数及调度顺序无关
+    config = _two_asset_config(years=15, num_trials=300)
+    input_model = {"dist_name": dist_name, "params": params} if params else None
+    periods = config.years * ForwardSimulator.PERIODS_PER_YEAR
+    assert periods > 2 * ForwardSimulator.SAMPLE_BLOCK_PERIODS
+
+    monkeypatch.setattr(forward_simulator.os, "cpu_count", lambda: 1)
+    serial = ForwardSimulator(config, seed=21, input_model=input_model)._sample_asset_returns(periods)
+
+    monkeypatch.setattr(forward_simulator.os, "cpu_count", lambda: 8)
+    for _ in range(5):
+        threaded = ForwardSimulator(config, seed=21, input_model=input_model)._sample_asset_returns(periods)
+        np.testing.assert_array_equal(threaded, serial)
+    assert forward_simulator._sampling_pool() is forward_simulator._sampling_pool()